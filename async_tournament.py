@@ -0,0 +1,529 @@
+#
+# async_tournament.py -- asyncio counterpart of tournament.py
+#
+# Offers the same functions as tournament.py as coroutines, running the same
+# queries (see queries.py) over a pool of aiopg connections, so a single
+# event loop can serve many concurrent requests without thread executors.
+#
+# Unlike the rest of the project this module needs Python 3.7 or later and
+# the aiopg package.
+
+import asyncio
+import contextlib
+
+import aiopg
+import psycopg2
+
+import pairing
+import queries
+import records
+import storage
+import tiebreaks
+from tournament import DSN, NOTIFY_CHANNEL
+
+
+class AsyncTournamentStore(object):
+    """Tournament data access backed by an aiopg connection pool.
+
+    The asyncio counterpart of `tournament.TournamentStore`; its coroutines
+    behave like the functions of tournament.py with the same name.
+
+    Args:
+        dsn: libpq connection string of the tournament database.
+        minsize: Connections the pool keeps open once created.
+        maxsize: Upper bound of open connections.
+        cache: An optional `cache.TournamentCache` to serve standings and
+            pairing data from.  Writes through this store invalidate it.
+    """
+
+    def __init__(self, dsn=DSN, minsize=1, maxsize=10, cache=None):
+        self.dsn = dsn
+        self.minsize = minsize
+        self.maxsize = maxsize
+        self.cache = cache
+        self._pool = None
+        self._lock = None
+
+    async def _get_pool(self):
+        if self._pool is None:
+            if self._lock is None:
+                self._lock = asyncio.Lock()
+            async with self._lock:
+                if self._pool is None:
+                    self._pool = await aiopg.create_pool(
+                        self.dsn, minsize=self.minsize, maxsize=self.maxsize)
+        return self._pool
+
+    @contextlib.asynccontextmanager
+    async def _cursor(self):
+        """Lends out a cursor on a pooled connection, in autocommit mode."""
+        pool = await self._get_pool()
+        async with pool.acquire() as db:
+            async with db.cursor() as curs:
+                yield curs
+
+    @contextlib.asynccontextmanager
+    async def _transaction(self):
+        """Lends out a cursor inside a transaction, committed on exit."""
+        async with self._cursor() as curs:
+            await curs.execute("BEGIN;")
+            try:
+                yield curs
+            except BaseException:
+                await curs.execute("ROLLBACK;")
+                raise
+            await curs.execute("COMMIT;")
+
+    async def close(self):
+        """Close every connection held by the pool."""
+        if self._pool is not None:
+            self._pool.close()
+            await self._pool.wait_closed()
+            self._pool = None
+
+    async def _notify(self, curs, tournament_id):
+        payload = '*' if tournament_id is None else str(tournament_id)
+        await curs.execute(queries.NOTIFY, (NOTIFY_CHANNEL, payload))
+
+    def _changed(self, tournament_id):
+        if self.cache is not None:
+            self.cache.invalidate(tournament_id)
+
+    async def _write(self, tournament_id, sql, params=None):
+        """Runs a statement that changes a tournament, or all if None."""
+        try:
+            async with self._transaction() as curs:
+                await curs.execute(sql, params)
+                await self._notify(curs, tournament_id)
+            self._changed(tournament_id)
+        except psycopg2.DatabaseError as e:
+            print('Error %s' % e)
+
+    async def delete_matches(self, tournament_id):
+        """See `tournament.delete_matches`."""
+        await self._write(tournament_id, queries.DELETE_MATCHES,
+                          {'t_id': tournament_id})
+
+    async def delete_tournament(self, tournament_id):
+        """See `tournament.delete_tournament`."""
+        await self._write(tournament_id, queries.DELETE_TOURNAMENT,
+                          {'t_id': tournament_id})
+
+    async def delete_players(self):
+        """See `tournament.delete_players`."""
+        await self._write(None, queries.DELETE_PLAYERS)
+
+    async def delete_tournament_players(self, tournament_id):
+        """See `tournament.delete_tournament_players`."""
+        await self._write(tournament_id, queries.DELETE_TOURNAMENT_PLAYERS,
+                          {'t_id': tournament_id})
+
+    async def count_players(self, tournament_id):
+        """See `tournament.count_players`."""
+        try:
+            async with self._cursor() as curs:
+                await curs.execute(queries.COUNT_PLAYERS, (tournament_id,))
+                result = await curs.fetchone()
+                return result[0]
+        except psycopg2.DatabaseError as e:
+            print('Error %s' % e)
+
+    async def register_player(self, name):
+        """See `tournament.register_player`."""
+        try:
+            async with self._transaction() as curs:
+                await curs.execute(queries.REGISTER_PLAYER, (name,))
+                player_id = await curs.fetchone()
+            return player_id[0]
+        except psycopg2.DatabaseError as e:
+            print('Error %s' % e)
+
+    async def register_players(self, names, tournament_id=None):
+        """See `tournament.register_players`."""
+        names = list(names)
+        if not names:
+            return []
+        try:
+            async with self._transaction() as curs:
+                await curs.execute(queries.RESERVE_PLAYER_IDS, (len(names),))
+                player_ids = [row[0] for row in await curs.fetchall()]
+                sql = queries.INSERT_PLAYERS
+                if tournament_id is not None:
+                    sql += queries.ENROLL_PLAYERS
+                await curs.execute(sql, {'t_id': tournament_id,
+                                         'ids': player_ids, 'names': names})
+                if tournament_id is not None:
+                    await self._notify(curs, tournament_id)
+            if tournament_id is not None:
+                self._changed(tournament_id)
+            return player_ids
+        except psycopg2.DatabaseError as e:
+            print('Error %s' % e)
+
+    async def register_tournament(self, tournament_name):
+        """See `tournament.register_tournament`."""
+        try:
+            async with self._transaction() as curs:
+                await curs.execute(queries.REGISTER_TOURNAMENT,
+                                   (tournament_name,))
+                tournament_id = await curs.fetchone()
+            return tournament_id[0]
+        except psycopg2.DatabaseError as e:
+            print('Error %s' % e)
+            return None
+
+    async def register_player_in_tournament(self, tournament_id, player_id):
+        """See `tournament.register_player_in_tournament`."""
+        await self._write(tournament_id,
+                          queries.REGISTER_PLAYER_IN_TOURNAMENT,
+                          {'t_id': tournament_id, 'p_id': player_id})
+
+    async def player_standings(self, tournament_id):
+        """See `tournament.player_standings`."""
+        if self.cache is not None:
+            data = await self.pairing_data(tournament_id)
+            return data[0] if data is not None else None
+        try:
+            async with self._cursor() as curs:
+                await curs.execute(queries.PLAYER_STANDINGS, (tournament_id,))
+                return await curs.fetchall()
+        except psycopg2.DatabaseError as e:
+            print('Error %s' % e)
+
+    async def report_match(self, tournament_id, winner, loser):
+        """See `tournament.report_match`."""
+        await self._write(tournament_id, queries.REPORT_MATCH,
+                          {'t_id': tournament_id, 'winner': winner,
+                           'loser': loser})
+
+    async def report_matches(self, tournament_id, results):
+        """See `tournament.report_matches`."""
+        results = list(results)
+        if not results:
+            return []
+        try:
+            async with self._transaction() as curs:
+                await curs.execute(queries.RESERVE_MATCH_IDS, (len(results),))
+                match_ids = [row[0] for row in await curs.fetchall()]
+                await curs.execute(queries.REPORT_MATCHES,
+                                   queries.report_matches_params(
+                                       tournament_id, match_ids, results))
+                await self._notify(curs, tournament_id)
+            self._changed(tournament_id)
+            return match_ids
+        except psycopg2.DatabaseError as e:
+            print('Error %s' % e)
+
+    async def match_history(self, tournament_id):
+        """See `tournament.match_history`."""
+        try:
+            async with self._cursor() as curs:
+                await curs.execute(queries.MATCH_HISTORY, (tournament_id,))
+                return await curs.fetchall()
+        except psycopg2.DatabaseError as e:
+            print('Error %s' % e)
+
+    async def players_with_bye_games(self, tournament_id):
+        """See `tournament.players_with_bye_games`."""
+        try:
+            async with self._cursor() as curs:
+                await curs.execute(queries.PLAYERS_WITH_BYE_GAMES,
+                                   (tournament_id,))
+                return [x[0] for x in await curs.fetchall()]
+        except psycopg2.DatabaseError as e:
+            print('Error %s' % e)
+
+    async def _round_write(self, sql, tournament_id, missing=None):
+        """Opens or closes a round; returns its number.
+
+        `missing` is printed as an error when there is no such round.
+        """
+        try:
+            async with self._transaction() as curs:
+                await curs.execute(sql, {'t_id': tournament_id})
+                result = await curs.fetchone()
+                await self._notify(curs, tournament_id)
+            if result is not None:
+                return result[0]
+            if missing is not None:
+                print('Error %s' % missing)
+        except psycopg2.DatabaseError as e:
+            print('Error %s' % e)
+
+    async def open_round(self, tournament_id):
+        """See `tournament.open_round`."""
+        return await self._round_write(
+            queries.OPEN_ROUND, tournament_id,
+            'a round of tournament %s is still open' % tournament_id)
+
+    async def close_round(self, tournament_id):
+        """See `tournament.close_round`."""
+        return await self._round_write(queries.CLOSE_ROUND, tournament_id)
+
+    async def current_round(self, tournament_id):
+        """See `tournament.current_round`."""
+        try:
+            async with self._cursor() as curs:
+                await curs.execute(queries.CURRENT_ROUND, (tournament_id,))
+                result = await curs.fetchone()
+                return result[0] if result is not None else None
+        except psycopg2.DatabaseError as e:
+            print('Error %s' % e)
+
+    async def rounds(self, tournament_id):
+        """See `tournament.rounds`."""
+        try:
+            async with self._cursor() as curs:
+                await curs.execute(queries.ROUNDS, (tournament_id,))
+                return await curs.fetchall()
+        except psycopg2.DatabaseError as e:
+            print('Error %s' % e)
+
+    async def round_results(self, tournament_id, round):
+        """See `tournament.round_results`."""
+        try:
+            async with self._cursor() as curs:
+                await curs.execute(queries.ROUND_RESULTS,
+                                   {'t_id': tournament_id, 'round': round})
+                return await curs.fetchall()
+        except psycopg2.DatabaseError as e:
+            print('Error %s' % e)
+
+    async def unpaired_players(self, tournament_id, round):
+        """See `tournament.unpaired_players`."""
+        try:
+            async with self._cursor() as curs:
+                await curs.execute(queries.UNPAIRED_PLAYERS,
+                                   {'t_id': tournament_id, 'round': round})
+                return [x[0] for x in await curs.fetchall()]
+        except psycopg2.DatabaseError as e:
+            print('Error %s' % e)
+
+    async def standings_at(self, tournament_id, round):
+        """See `tournament.standings_at`."""
+        try:
+            async with self._cursor() as curs:
+                await curs.execute(queries.STANDINGS_AT,
+                                   {'t_id': tournament_id, 'round': round})
+                return await curs.fetchall()
+        except psycopg2.DatabaseError as e:
+            print('Error %s' % e)
+
+    async def standings_diff(self, tournament_id, from_round, to_round):
+        """See `tournament.standings_diff`."""
+        earlier = await self.standings_at(tournament_id, from_round)
+        later = await self.standings_at(tournament_id, to_round)
+        if earlier is None or later is None:
+            return None
+        return storage.diff_standings(earlier, later)
+
+    async def pairing_data(self, tournament_id):
+        """See `tournament.pairing_data`."""
+        if self.cache is None:
+            return await self._read_pairing_data(tournament_id)
+        data = await self.compact_pairing_data(tournament_id)
+        if data is None:
+            return None
+        return records.expand_pairing_data(data)
+
+    async def compact_pairing_data(self, tournament_id):
+        """See `storage.TournamentBackend.compact_pairing_data`."""
+        data = None
+        if self.cache is not None:
+            data = self.cache.get(tournament_id)
+        if data is None:
+            version = self.cache.version() if self.cache is not None \
+                else None
+            parts = await self._read_pairing_data(tournament_id)
+            if parts is None:
+                return None
+            data = records.compact_pairing_data(*parts)
+            if self.cache is not None:
+                self.cache.put(tournament_id, data, version)
+        return data
+
+    async def _read_pairing_data(self, tournament_id):
+        try:
+            async with self._cursor() as curs:
+                await curs.execute(queries.PAIRING_DATA,
+                                   {'t_id': tournament_id})
+                return queries.split_pairing_data(await curs.fetchall())
+        except psycopg2.DatabaseError as e:
+            print('Error %s' % e)
+
+    async def ranked_standings(self, tournament_id,
+                               order=tiebreaks.TIEBREAKS):
+        """See `tournament.ranked_standings`."""
+        try:
+            async with self._cursor() as curs:
+                await curs.execute(queries.RANKING_DATA,
+                                   {'t_id': tournament_id})
+                standings, results, _ = \
+                    queries.split_pairing_data(await curs.fetchall())
+        except psycopg2.DatabaseError as e:
+            print('Error %s' % e)
+            return None
+        return tiebreaks.rank(standings, results, order)
+
+    async def swiss_pairings(self, tournament_id, mode="greedy"):
+        """See `tournament.swiss_pairings`."""
+        pair_players = pairing.PAIRING_MODES.get(mode)
+        if pair_players is None:
+            raise ValueError("Unknown pairing mode %r" % (mode,))
+        standings, played_players, players_with_byes = \
+            await self.compact_pairing_data(tournament_id)
+        return pair_players(standings, played_players, players_with_byes)
+
+
+_store = None
+
+
+async def configure(dsn=DSN, minsize=1, maxsize=10, cache=None):
+    """Replaces the store used by the module-level coroutines.
+
+    The connections of the previous store are closed.  See
+    `AsyncTournamentStore` for the meaning of the arguments.
+
+    Returns:
+        store: The new `AsyncTournamentStore`
+    """
+    global _store
+    if _store is not None:
+        await _store.close()
+    _store = AsyncTournamentStore(dsn, minsize, maxsize, cache)
+    return _store
+
+
+def get_store():
+    """Returns the store used by the module-level coroutines."""
+    global _store
+    if _store is None:
+        _store = AsyncTournamentStore()
+    return _store
+
+
+async def delete_matches(tournament_id):
+    """See `tournament.delete_matches`."""
+    return await get_store().delete_matches(tournament_id)
+
+
+async def delete_tournament(tournament_id):
+    """See `tournament.delete_tournament`."""
+    return await get_store().delete_tournament(tournament_id)
+
+
+async def delete_players():
+    """See `tournament.delete_players`."""
+    return await get_store().delete_players()
+
+
+async def delete_tournament_players(tournament_id):
+    """See `tournament.delete_tournament_players`."""
+    return await get_store().delete_tournament_players(tournament_id)
+
+
+async def count_players(tournament_id):
+    """See `tournament.count_players`."""
+    return await get_store().count_players(tournament_id)
+
+
+async def register_player(name):
+    """See `tournament.register_player`."""
+    return await get_store().register_player(name)
+
+
+async def register_players(names, tournament_id=None):
+    """See `tournament.register_players`."""
+    return await get_store().register_players(names, tournament_id)
+
+
+async def register_tournament(tournament_name):
+    """See `tournament.register_tournament`."""
+    return await get_store().register_tournament(tournament_name)
+
+
+async def register_player_in_tournament(tournament_id, player_id):
+    """See `tournament.register_player_in_tournament`."""
+    return await get_store().register_player_in_tournament(tournament_id,
+                                                           player_id)
+
+
+async def player_standings(tournament_id):
+    """See `tournament.player_standings`."""
+    return await get_store().player_standings(tournament_id)
+
+
+async def report_match(tournament_id, winner, loser):
+    """See `tournament.report_match`."""
+    return await get_store().report_match(tournament_id, winner, loser)
+
+
+async def report_matches(tournament_id, results):
+    """See `tournament.report_matches`."""
+    return await get_store().report_matches(tournament_id, results)
+
+
+async def match_history(tournament_id):
+    """See `tournament.match_history`."""
+    return await get_store().match_history(tournament_id)
+
+
+async def players_with_bye_games(tournament_id):
+    """See `tournament.players_with_bye_games`."""
+    return await get_store().players_with_bye_games(tournament_id)
+
+
+async def open_round(tournament_id):
+    """See `tournament.open_round`."""
+    return await get_store().open_round(tournament_id)
+
+
+async def close_round(tournament_id):
+    """See `tournament.close_round`."""
+    return await get_store().close_round(tournament_id)
+
+
+async def current_round(tournament_id):
+    """See `tournament.current_round`."""
+    return await get_store().current_round(tournament_id)
+
+
+async def rounds(tournament_id):
+    """See `tournament.rounds`."""
+    return await get_store().rounds(tournament_id)
+
+
+async def round_results(tournament_id, round):
+    """See `tournament.round_results`."""
+    return await get_store().round_results(tournament_id, round)
+
+
+async def unpaired_players(tournament_id, round):
+    """See `tournament.unpaired_players`."""
+    return await get_store().unpaired_players(tournament_id, round)
+
+
+async def standings_at(tournament_id, round):
+    """See `tournament.standings_at`."""
+    return await get_store().standings_at(tournament_id, round)
+
+
+async def standings_diff(tournament_id, from_round, to_round):
+    """See `tournament.standings_diff`."""
+    return await get_store().standings_diff(tournament_id, from_round,
+                                            to_round)
+
+
+async def pairing_data(tournament_id):
+    """See `tournament.pairing_data`."""
+    return await get_store().pairing_data(tournament_id)
+
+
+async def ranked_standings(tournament_id, order=tiebreaks.TIEBREAKS):
+    """See `tournament.ranked_standings`."""
+    return await get_store().ranked_standings(tournament_id, order)
+
+
+async def swiss_pairings(tournament_id, mode="greedy"):
+    """See `tournament.swiss_pairings`."""
+    return await get_store().swiss_pairings(tournament_id, mode)
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+#
+# Test cases for async_tournament.py
+# Checks the coroutines against the synchronous functions of tournament.py
+# on the same database.  Needs Python 3 and aiopg.
+
+import asyncio
+
+import tournament
+from async_tournament import *
+
+
+async def test_register_and_count(tournament_id):
+    ids = await register_players(["Twilight Sparkle", "Fluttershy",
+                                  "Applejack", "Pinkie Pie"], tournament_id)
+    if len(ids) != 4:
+        raise ValueError("register_players() should return every new id.")
+    player_id = await register_player("Rarity")
+    await register_player_in_tournament(tournament_id, player_id)
+    if await count_players(tournament_id) != 5:
+        raise ValueError("After registering, count_players() should be 5.")
+    print("1. Players can be registered and counted.")
+    return ids + [player_id]
+
+
+async def test_report_and_standings(tournament_id, ids):
+    await report_match(tournament_id, ids[0], ids[1])
+    await report_matches(tournament_id, [(ids[2], ids[3]), (ids[4], None)])
+    standings = await player_standings(tournament_id)
+    if standings != tournament.player_standings(tournament_id):
+        raise ValueError("Standings should match the synchronous ones.")
+    if [row[2] for row in standings] != [1, 1, 1, 0, 0]:
+        raise ValueError("Each reported winner should have one win.")
+    print("2. Reported matches show up in the standings.")
+
+
+async def test_pairings(tournament_id):
+    for mode in pairing.PAIRING_MODES:
+        pairings = await swiss_pairings(tournament_id, mode)
+        if pairings != tournament.swiss_pairings(tournament_id, mode):
+            raise ValueError("Pairings should match the synchronous ones.")
+    if await match_history(tournament_id) != \
+            tournament.match_history(tournament_id):
+        raise ValueError("Match history should match the synchronous one.")
+    print("3. Pairings match the synchronous ones.")
+
+
+async def test_rounds(tournament_id, ids):
+    if await open_round(tournament_id) != 1:
+        raise ValueError("The first round should be round 1.")
+    if await open_round(tournament_id) is not None:
+        raise ValueError("No round should open while one is open.")
+    await report_matches(tournament_id, [(ids[1], ids[2])])
+    if await round_results(tournament_id, 1) != [(ids[1], ids[2])] or \
+            await unpaired_players(tournament_id, 1) != \
+            tournament.unpaired_players(tournament_id, 1):
+        raise ValueError("Round results should match the synchronous ones.")
+    if await close_round(tournament_id) != 1 or \
+            await current_round(tournament_id) is not None or \
+            await rounds(tournament_id) != [(1, True)]:
+        raise ValueError("Closing the round should leave none open.")
+    if await standings_at(tournament_id, 1) != \
+            await player_standings(tournament_id) or \
+            await standings_diff(tournament_id, 0, 1) != \
+            tournament.standings_diff(tournament_id, 0, 1):
+        raise ValueError("Closing the round should snapshot the standings.")
+    print("4. Rounds can be opened, looked up, closed and replayed.")
+
+
+async def test_delete(tournament_id):
+    await delete_matches(tournament_id)
+    if any(row[3] for row in await player_standings(tournament_id)):
+        raise ValueError("After deleting matches nobody has played.")
+    await delete_tournament(tournament_id)
+    if await count_players(tournament_id) != 0:
+        raise ValueError("A deleted tournament should have no players.")
+    print("5. Matches and tournaments can be deleted.")
+
+
+async def main():
+    tournament_id = await register_tournament("Async tournament")
+    try:
+        ids = await test_register_and_count(tournament_id)
+        await test_report_and_standings(tournament_id, ids)
+        await test_pairings(tournament_id)
+        await test_rounds(tournament_id, ids)
+        await test_delete(tournament_id)
+    finally:
+        await get_store().close()
+        tournament.get_store().close()
+    print("Success!  All tests pass!")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,6 @@
+"""Benchmarks for the tournament project.
+
+Each module is a script, run from the project folder, e.g.:
+
+    python -m benchmarks.pool
+"""
@@ -0,0 +1,110 @@
+"""Concurrent report_match + player_standings: asyncio against threads.
+
+Each client reports a result and then reads the standings, over and over.
+The async clients share one event loop and an `AsyncTournamentStore`; the
+sync clients are threads sharing a `TournamentStore` with the same number
+of connections.  Needs Python 3 and aiopg.
+"""
+
+import asyncio
+import random
+import threading
+import time
+
+import async_tournament
+import tournament
+from benchmarks import common
+
+
+def percentile(latencies, fraction):
+    """Returns the latency below which `fraction` of them fall."""
+    ordered = sorted(latencies)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def report_latencies(label, latencies, seconds):
+    common.report(label, seconds, len(latencies))
+    print('%-40s p50 %8.2f ms   p99 %8.2f ms' %
+          ('', percentile(latencies, 0.50) * 1000,
+           percentile(latencies, 0.99) * 1000))
+
+
+def run_sync(store, tournament_id, workload):
+    latencies = []
+    lock = threading.Lock()
+
+    def client(results):
+        for winner, loser in results:
+            start = time.time()
+            store.report_match(tournament_id, winner, loser)
+            store.player_standings(tournament_id)
+            elapsed = time.time() - start
+            with lock:
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=client, args=(results,))
+               for results in workload]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, time.time() - start
+
+
+async def run_async(store, tournament_id, workload):
+    latencies = []
+
+    async def client(results):
+        for winner, loser in results:
+            start = time.time()
+            await store.report_match(tournament_id, winner, loser)
+            await store.player_standings(tournament_id)
+            latencies.append(time.time() - start)
+
+    # Open the pool first, as the sync store has its connections by now.
+    await store.count_players(tournament_id)
+    start = time.time()
+    await asyncio.gather(*[client(results) for results in workload])
+    return latencies, time.time() - start
+
+
+def main():
+    p = common.parser(__doc__.splitlines()[0])
+    p.add_argument('--clients', type=int, default=50)
+    p.add_argument('--requests', type=int, default=20,
+                   help='report + standings pairs per client')
+    p.add_argument('--players', type=int, default=200)
+    p.add_argument('--connections', type=int, default=10)
+    args = p.parse_args()
+
+    store = tournament.TournamentStore(args.dsn, maxconn=args.connections)
+    async_store = async_tournament.AsyncTournamentStore(
+        args.dsn, maxsize=args.connections)
+    tournament_id = store.register_tournament("Async load benchmark")
+    ids = store.register_players(
+        ["Player %d" % i for i in range(args.players)], tournament_id)
+    rng = random.Random(0)
+    workload = [[tuple(rng.sample(ids, 2)) for _ in range(args.requests)]
+                for _ in range(args.clients)]
+    label = '%d clients x %d requests' % (args.clients, args.requests)
+    loop = asyncio.new_event_loop()
+
+    try:
+        for _ in range(args.repeat):
+            latencies, seconds = run_sync(store, tournament_id, workload)
+            report_latencies('threads, %s' % label, latencies, seconds)
+            store.delete_matches(tournament_id)
+            latencies, seconds = loop.run_until_complete(
+                run_async(async_store, tournament_id, workload))
+            report_latencies('asyncio, %s' % label, latencies, seconds)
+            store.delete_matches(tournament_id)
+    finally:
+        loop.run_until_complete(async_store.close())
+        loop.close()
+        store.delete_tournament(tournament_id)
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Runs the same tournament on every storage backend.
+
+Each backend registers the players, then plays a number of rounds: pair
+them, report every result with `report_match`, and read the standings.
+"""
+
+from __future__ import absolute_import, print_function
+
+import random
+import time
+
+import tournament
+from benchmarks import common
+from memory_store import MemoryTournamentStore
+from sqlite_store import SQLiteTournamentStore
+
+BACKENDS = ('postgres', 'sqlite', 'memory')
+
+
+def make_store(name, dsn):
+    if name == 'postgres':
+        return tournament.TournamentStore(dsn)
+    if name == 'sqlite':
+        return SQLiteTournamentStore()
+    return MemoryTournamentStore()
+
+
+def play(store, players, rounds, rng):
+    """Plays a tournament; returns the seconds spent on each operation."""
+    spent = dict.fromkeys(('register', 'pair', 'report', 'standings'), 0.0)
+    start = time.time()
+    tournament_id = store.register_tournament("Backend benchmark")
+    store.register_players(["Player %d" % i for i in range(players)],
+                           tournament_id)
+    spent['register'] += time.time() - start
+    try:
+        for _ in range(rounds):
+            start = time.time()
+            pairs = store.swiss_pairings(tournament_id)
+            spent['pair'] += time.time() - start
+            start = time.time()
+            for id1, _, id2, _ in pairs:
+                if id2 is not None and rng.random() < 0.5:
+                    id1, id2 = id2, id1
+                store.report_match(tournament_id, id1, id2)
+            spent['report'] += time.time() - start
+            start = time.time()
+            store.player_standings(tournament_id)
+            spent['standings'] += time.time() - start
+    finally:
+        store.delete_tournament(tournament_id)
+    return spent
+
+
+def main():
+    p = common.parser(__doc__.splitlines()[0])
+    p.add_argument('--players', type=int, default=1000)
+    p.add_argument('--rounds', type=int, default=5)
+    p.add_argument('--backends', nargs='+', choices=BACKENDS,
+                   default=list(BACKENDS))
+    args = p.parse_args()
+
+    for name in args.backends:
+        store = make_store(name, args.dsn)
+        best = None
+        try:
+            for _ in range(args.repeat):
+                spent = play(store, args.players, args.rounds,
+                             random.Random(0))
+                if best is None or sum(spent.values()) < sum(best.values()):
+                    best = spent
+        finally:
+            store.close()
+        counts = {'register': args.players,
+                  'pair': args.rounds,
+                  'report': args.rounds * (args.players // 2),
+                  'standings': args.rounds}
+        for operation in ('register', 'pair', 'report', 'standings'):
+            common.report('%s %s' % (name, operation), best[operation],
+                          counts[operation])
+        common.report('%s total' % name, sum(best.values()),
+                      args.rounds)
+
+
+if __name__ == '__main__':
+    main()
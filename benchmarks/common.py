@@ -0,0 +1,36 @@
+"""Helpers shared by the benchmark scripts."""
+
+from __future__ import absolute_import, print_function
+
+import argparse
+import time
+
+import tournament
+
+
+def parser(description):
+    """Returns an argument parser with the options every benchmark takes."""
+    p = argparse.ArgumentParser(description=description)
+    p.add_argument('--dsn', default=tournament.DSN,
+                   help='libpq connection string (default: %(default)s)')
+    p.add_argument('--repeat', type=int, default=3,
+                   help='runs per measurement, the best one is kept')
+    return p
+
+
+def best_of(repeat, func, *args):
+    """Runs `func` `repeat` times and returns the fastest time in seconds."""
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        func(*args)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def report(label, seconds, operations):
+    """Prints one result line: total time and operations per second."""
+    rate = operations / seconds if seconds else float('inf')
+    print('%-40s %9.3f s %12.1f ops/s' % (label, seconds, rate))
@@ -0,0 +1,78 @@
+"""Exporting a large match history: streamed against `fetchall`.
+
+Each way runs in a process of its own, which reports the peak resident
+memory it reached, so the two measurements do not mix.
+"""
+
+from __future__ import absolute_import, print_function
+
+import argparse
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+
+import export
+import queries
+import tournament
+from benchmarks import common
+
+
+def child(way, dsn, tournament_id, itersize):
+    """Exports the history one way and prints 'seconds peak_kb'."""
+    store = tournament.configure(dsn, maxconn=1)
+    with open(os.devnull, 'w') as out:
+        start = time.time()
+        if way == 'stream':
+            rows = store.iter_match_history(tournament_id, itersize)
+        else:
+            with store.connection(readonly=True) as db:
+                curs = db.cursor()
+                curs.execute(queries.ALL_MATCHES, (tournament_id,))
+                rows = curs.fetchall()
+        export.write_rows(rows, export.HISTORY_FIELDS, out, 'jsonl')
+        seconds = time.time() - start
+    print(seconds, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+def main():
+    p = common.parser(__doc__.splitlines()[0])
+    p.add_argument('--matches', type=int, default=1000000)
+    p.add_argument('--players', type=int, default=5000)
+    p.add_argument('--itersize', type=int, default=tournament.ITERSIZE)
+    p.add_argument('--child', nargs=2, metavar=('WAY', 'TOURNAMENT'),
+                   help=argparse.SUPPRESS)
+    args = p.parse_args()
+    if args.child:
+        child(args.child[0], args.dsn, int(args.child[1]), args.itersize)
+        return
+
+    store = tournament.TournamentStore(args.dsn)
+    tournament_id = store.register_tournament("Export benchmark")
+    try:
+        ids = store.register_players(
+            ["Player %d" % i for i in range(args.players)], tournament_id)
+        rng = random.Random(0)
+        for start in range(0, args.matches, 100000):
+            count = min(100000, args.matches - start)
+            store.report_matches(tournament_id,
+                                 [tuple(rng.sample(ids, 2))
+                                  for _ in range(count)])
+        for way in ('fetchall', 'stream'):
+            output = subprocess.check_output(
+                [sys.executable, '-m', 'benchmarks.export', '--dsn',
+                 args.dsn, '--itersize', str(args.itersize),
+                 '--child', way, str(tournament_id)])
+            seconds, peak_kb = output.split()
+            common.report('%s (%d matches)' % (way, args.matches),
+                          float(seconds), args.matches)
+            print('%-40s peak %8.1f MB' % ('', int(peak_kb) / 1024.0))
+    finally:
+        store.delete_tournament(tournament_id)
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
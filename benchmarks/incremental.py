@@ -0,0 +1,54 @@
+"""Pairing round after round: read from scratch against pairing states.
+
+Plays a tournament round by round on PostgreSQL.  Each round is paired
+both ways: reading the standings and the whole match history again, and
+from the pairing state kept up to date with the results reported.
+"""
+
+from __future__ import absolute_import, print_function
+
+import random
+import time
+
+import pairing
+import tournament
+from benchmarks import common
+
+
+def main():
+    p = common.parser(__doc__.splitlines()[0])
+    p.add_argument('--players', type=int, default=20000)
+    p.add_argument('--rounds', type=int, default=9)
+    args = p.parse_args()
+
+    store = tournament.TournamentStore(args.dsn,
+                                       states=pairing.PairingStates())
+    tournament_id = store.register_tournament("Incremental benchmark")
+    rng = random.Random(0)
+    try:
+        store.register_players(["Player %d" % i for i in range(args.players)],
+                               tournament_id)
+        for round_number in range(1, args.rounds + 1):
+            states, store.states = store.states, None
+            start = time.time()
+            expected = store.swiss_pairings(tournament_id)
+            common.report('round %d, from scratch' % round_number,
+                          time.time() - start, args.players)
+            store.states = states
+            start = time.time()
+            pairs = store.swiss_pairings(tournament_id)
+            common.report('round %d, from the state' % round_number,
+                          time.time() - start, args.players)
+            if pairs != expected:
+                raise AssertionError("Pairings differ.")
+            store.report_matches(
+                tournament_id,
+                [(id1, id2) if id2 is None or rng.random() < 0.5
+                 else (id2, id1) for id1, _, id2, _ in pairs])
+    finally:
+        store.delete_tournament(tournament_id)
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Overhead of metrics.py, disabled and enabled.
+
+Times a cheap query through the store directly, which is not instrumented,
+and through the module-level function with metrics disabled and enabled;
+then a round of pairing with metrics disabled and enabled.
+"""
+
+from __future__ import absolute_import, print_function
+
+import random
+
+import metrics
+import pairing
+import tournament
+from benchmarks import common
+from benchmarks.pairing import simulate
+
+
+def calls(func, count, *args):
+    for _ in range(count):
+        func(*args)
+
+
+def main():
+    p = common.parser(__doc__.splitlines()[0])
+    p.add_argument('--calls', type=int, default=5000)
+    p.add_argument('--players', type=int, default=100000)
+    args = p.parse_args()
+
+    store = tournament.configure(args.dsn, maxconn=1)
+    tournament_id = store.register_tournament("Instrumentation benchmark")
+    try:
+        store.register_players(["Player %d" % i for i in range(100)],
+                               tournament_id)
+        for label, func, enable in (
+                ('store.count_players', store.count_players, False),
+                ('count_players, disabled', tournament.count_players, False),
+                ('count_players, enabled', tournament.count_players, True)):
+            if enable:
+                metrics.enable()
+            try:
+                seconds = common.best_of(args.repeat, calls, func,
+                                         args.calls, tournament_id)
+            finally:
+                metrics.disable()
+            common.report(label, seconds, args.calls)
+    finally:
+        store.delete_tournament(tournament_id)
+        store.close()
+
+    data = simulate(args.players, 7, random.Random(0))
+    for label, enable in (('pair_players, disabled', False),
+                          ('pair_players, enabled', True)):
+        if enable:
+            metrics.enable()
+        try:
+            seconds = common.best_of(args.repeat, pairing.pair_players,
+                                     *data)
+        finally:
+            metrics.disable()
+        common.report('%s (%d players)' % (label, args.players), seconds, 1)
+    print()
+    print(metrics.to_prometheus(), end='')
+
+
+if __name__ == '__main__':
+    main()
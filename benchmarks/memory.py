@@ -0,0 +1,76 @@
+"""Memory per player and per match: lists of tuples against records.py.
+
+Measures the standings and the match history of a simulated field in both
+forms, as tracemalloc counts them, and times a round of pairing on each.
+Every measured structure is unpickled afresh, so it shares no objects with
+the rest of the process, as when read from the database.  Needs Python 3.
+"""
+
+import gc
+import pickle
+import random
+import time
+import tracemalloc
+
+import pairing
+import records
+from benchmarks import common
+from benchmarks.pairing import simulate
+
+
+def traced_size(build):
+    """Returns what `build` returns and the bytes it still holds."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        value = build()
+        gc.collect()
+        return value, tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    p = common.parser(__doc__.splitlines()[0])
+    p.add_argument('--sizes', type=int, nargs='+',
+                   default=[10000, 100000])
+    p.add_argument('--rounds', type=int, default=7,
+                   help='rounds played before measuring')
+    args = p.parse_args()
+
+    rng = random.Random(0)
+    print('%-40s %14s %14s' % ('', 'bytes/player', 'bytes/match'))
+    for size in args.sizes:
+        standings, history, byes = simulate(size, args.rounds, rng)
+        standings_blob = pickle.dumps(standings, 2)
+        history_blob = pickle.dumps(history, 2)
+
+        tuples, standings_bytes = traced_size(
+            lambda: pickle.loads(standings_blob))
+        matches, history_bytes = traced_size(
+            lambda: pickle.loads(history_blob))
+        print('%-40s %14.1f %14.1f' % (
+            'tuples (%d players)' % size, standings_bytes / size,
+            history_bytes / len(history)))
+        table, standings_bytes = traced_size(
+            lambda: records.StandingsTable(pickle.loads(standings_blob)))
+        played, history_bytes = traced_size(
+            lambda: records.MatchHistory(pickle.loads(history_blob)))
+        print('%-40s %14.1f %14.1f' % (
+            'records (%d players)' % size, standings_bytes / size,
+            history_bytes / len(history)))
+
+        for label, data in (('tuples', (tuples, matches, byes)),
+                            ('records', (table, played, byes))):
+            seconds = common.best_of(args.repeat, pairing.pair_players,
+                                     *data)
+            common.report('pair_players on %s (%d players)' % (label, size),
+                          seconds, 1)
+        start = time.time()
+        records.MatchHistory(history)
+        common.report('MatchHistory from tuples (%d players)' % size,
+                      time.time() - start, len(history))
+
+
+if __name__ == '__main__':
+    main()
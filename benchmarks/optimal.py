@@ -0,0 +1,67 @@
+"""Checks optimal pairing against a per-round latency budget.
+
+Plays a number of simulated rounds on a large field, then times one round of
+`pairing.pair_players_optimal` next to the greedy `pairing.pair_players`:
+once on the field as it is, where the greedy walk already pairs nearly
+everybody, and once after the bottom of the standings has met each other,
+so the greedy walk dead-ends and the optimal pairing has to repair it.
+Exits with status 1 when an optimal round takes longer than the budget.
+"""
+
+from __future__ import absolute_import, print_function
+
+import itertools
+import random
+import sys
+
+import pairing
+from benchmarks import common
+from benchmarks.pairing import simulate
+
+
+def unpaired(players, pairs):
+    """Returns how many players have no opponent in `pairs`."""
+    return players - 2 * sum(1 for p in pairs if p[2] is not None)
+
+
+def dead_end(standings, history, players):
+    """Returns the history with the last `players` having met each other."""
+    bottom = [row[0] for row in standings[-players:]]
+    return history + list(itertools.combinations(bottom, 2))
+
+
+def main():
+    p = common.parser(__doc__.splitlines()[0])
+    p.add_argument('--players', type=int, default=10000)
+    p.add_argument('--rounds', type=int, default=10,
+                   help='rounds already played before the timed round')
+    p.add_argument('--dead-end', type=int, default=400,
+                   help='players at the bottom that already met each other')
+    p.add_argument('--budget', type=float, default=1.0,
+                   help='seconds one optimal round may take')
+    args = p.parse_args()
+
+    standings, history, byes = simulate(args.players, args.rounds,
+                                        random.Random(0))
+    over = False
+    for field, played in (('simulated', history),
+                          ('dead end', dead_end(standings, history,
+                                                args.dead_end))):
+        for name in ('greedy', 'optimal'):
+            pair_players = pairing.PAIRING_MODES[name]
+            seconds = common.best_of(args.repeat, pair_players, standings,
+                                     played, byes)
+            pairs = pair_players(standings, played, byes)
+            common.report('%s, %s (%d players, %d unpaired)' % (
+                field, name, args.players, unpaired(args.players, pairs)),
+                seconds, 1)
+        if seconds > args.budget:
+            print('Optimal pairing of the %s field took %.3f s, over the'
+                  ' %.3f s budget.' % (field, seconds, args.budget))
+            over = True
+    if over:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
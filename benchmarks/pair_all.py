@@ -0,0 +1,75 @@
+"""`pair_all` against one `swiss_pairings` call per tournament.
+
+Every tournament first plays a number of simulated rounds, reported to the
+database, so the round being paired has a realistic history.
+"""
+
+from __future__ import absolute_import, print_function
+
+import multiprocessing
+import random
+
+import tournament
+from benchmarks import common
+from benchmarks.pairing import simulate
+
+
+def load_tournament(store, name, players, rounds, rng):
+    """Registers a tournament and reports `rounds` simulated rounds."""
+    tournament_id = store.register_tournament(name)
+    ids = store.register_players(["Player %d" % i for i in range(players)],
+                                 tournament_id)
+    standings, history, byes = simulate(players, rounds, rng)
+    # simulate() numbers the players from 1.
+    results = [(ids[w - 1], ids[l - 1]) for w, l in history]
+    results += [(ids[b - 1], None) for b in byes]
+    store.report_matches(tournament_id, results)
+    return tournament_id
+
+
+def main():
+    p = common.parser(__doc__.splitlines()[0])
+    p.add_argument('--tournaments', type=int, default=50)
+    p.add_argument('--players', type=int, default=2000)
+    p.add_argument('--rounds', type=int, default=5,
+                   help='rounds already played before the paired round')
+    p.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+    p.add_argument('--mode', default='greedy')
+    args = p.parse_args()
+
+    store = tournament.TournamentStore(args.dsn)
+    rng = random.Random(0)
+    tournament_ids = [load_tournament(store, "Pair all %d" % i,
+                                      args.players, args.rounds, rng)
+                      for i in range(args.tournaments)]
+
+    def serial():
+        for tournament_id in tournament_ids:
+            store.swiss_pairings(tournament_id, args.mode)
+
+    timings = {}
+
+    def batched(workers):
+        store.pair_all(tournament_ids, args.mode, workers, timings)
+
+    label = '%d tournaments of %d players' % (args.tournaments, args.players)
+    try:
+        common.report('swiss_pairings each, %s' % label,
+                      common.best_of(args.repeat, serial),
+                      args.tournaments)
+        for workers in sorted(set([1, args.workers])):
+            common.report('pair_all, %d workers, %s' % (workers, label),
+                          common.best_of(args.repeat, batched, workers),
+                          args.tournaments)
+        seconds = sorted(timings.values())
+        print('%-40s median %7.1f ms   max %7.1f ms' %
+              ('pairing time per tournament',
+               seconds[len(seconds) // 2] * 1000, seconds[-1] * 1000))
+    finally:
+        for tournament_id in tournament_ids:
+            store.delete_tournament(tournament_id)
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
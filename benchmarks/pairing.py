@@ -0,0 +1,57 @@
+"""Times `pairing.pair_players` for one round at several field sizes.
+
+Each field first plays a number of simulated rounds with random results, so
+the round being timed has a realistic history to avoid rematches against.
+No database is needed.
+"""
+
+from __future__ import absolute_import, print_function
+
+import random
+
+import pairing
+from benchmarks import common
+
+
+def simulate(players, rounds, rng):
+    """Returns (standings, history, byes) after `rounds` random rounds."""
+    wins = dict((i, 0) for i in range(1, players + 1))
+    history = []
+    byes = []
+    for _ in range(rounds):
+        standings = sorted(((i, "Player %d" % i, w, 0)
+                            for i, w in wins.items()),
+                           key=lambda row: -row[2])
+        for id1, _, id2, _ in pairing.pair_players(standings, history,
+                                                    byes):
+            if id2 is None:
+                byes.append(id1)
+                wins[id1] += 1
+                continue
+            if rng.random() < 0.5:
+                id1, id2 = id2, id1
+            wins[id1] += 1
+            history.append((id1, id2))
+    standings = sorted(((i, "Player %d" % i, w, 0) for i, w in wins.items()),
+                       key=lambda row: -row[2])
+    return standings, history, byes
+
+
+def main():
+    p = common.parser(__doc__.splitlines()[0])
+    p.add_argument('--sizes', type=int, nargs='+',
+                   default=[100, 1000, 10000, 50000])
+    p.add_argument('--rounds', type=int, default=5,
+                   help='rounds already played before the timed round')
+    args = p.parse_args()
+
+    rng = random.Random(0)
+    for size in args.sizes:
+        standings, history, byes = simulate(size, args.rounds, rng)
+        seconds = common.best_of(args.repeat, pairing.pair_players,
+                                 standings, history, byes)
+        common.report('pair_players (%d players)' % size, seconds, 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Per-call connections against the pooled `TournamentStore`.
+
+Times `report_match` and `player_standings` once with a connection opened
+and closed for every call, the way the module used to work, and once with
+connections taken from the pool.
+"""
+
+from __future__ import absolute_import, print_function
+
+import contextlib
+
+import psycopg2
+
+import tournament
+from benchmarks import common
+
+
+class UnpooledStore(tournament.TournamentStore):
+    """A store that connects to the database for every single call."""
+
+    @contextlib.contextmanager
+    def connection(self, readonly=False):
+        db = psycopg2.connect(self.dsn)
+        try:
+            yield db
+        finally:
+            db.close()
+
+
+def setup(store, players):
+    tournament_id = store.register_tournament("Pool benchmark")
+    ids = [store.register_player("Player %d" % i) for i in range(players)]
+    for player_id in ids:
+        store.register_player_in_tournament(tournament_id, player_id)
+    return tournament_id, ids
+
+
+def report_matches(store, tournament_id, ids, calls):
+    for i in range(calls):
+        store.report_match(tournament_id, ids[i % len(ids)],
+                           ids[(i + 1) % len(ids)])
+
+
+def read_standings(store, tournament_id, calls):
+    for _ in range(calls):
+        store.player_standings(tournament_id)
+
+
+def main():
+    p = common.parser(__doc__.splitlines()[0])
+    p.add_argument('--calls', type=int, default=500,
+                   help='calls per measurement')
+    p.add_argument('--players', type=int, default=64)
+    args = p.parse_args()
+
+    pooled = tournament.TournamentStore(args.dsn)
+    unpooled = UnpooledStore(args.dsn)
+    tournament_id, ids = setup(pooled, args.players)
+    try:
+        for name, store in (('per-call connect', unpooled),
+                            ('pooled', pooled)):
+            seconds = common.best_of(args.repeat, report_matches, store,
+                                     tournament_id, ids, args.calls)
+            common.report('report_match (%s)' % name, seconds, args.calls)
+            seconds = common.best_of(args.repeat, read_standings, store,
+                                     tournament_id, args.calls)
+            common.report('player_standings (%s)' % name, seconds,
+                          args.calls)
+    finally:
+        pooled.delete_tournament(tournament_id)
+        pooled.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Imports entrants from a CSV file with `register_players`.
+
+Writes a CSV file with one name per row, then times reading it and
+registering every player in a new tournament in one call.  With --compare
+the same import is also timed with `register_player` and
+`register_player_in_tournament` for every row.
+"""
+
+from __future__ import absolute_import, print_function
+
+import csv
+import os
+import tempfile
+
+import tournament
+from benchmarks import common
+
+
+def write_csv(path, players):
+    with open(path, 'w') as f:
+        writer = csv.writer(f)
+        for i in range(players):
+            writer.writerow(["Player %d" % i])
+
+
+def read_names(path):
+    with open(path) as f:
+        return [row[0] for row in csv.reader(f)]
+
+
+def main():
+    p = common.parser(__doc__.splitlines()[0])
+    p.add_argument('--players', type=int, default=100000)
+    p.add_argument('--compare', action='store_true',
+                   help='also time one call per player (slow)')
+    args = p.parse_args()
+
+    store = tournament.TournamentStore(args.dsn)
+    fd, path = tempfile.mkstemp(suffix='.csv')
+    os.close(fd)
+    write_csv(path, args.players)
+    tournament_ids = []
+
+    def bulk():
+        tournament_id = store.register_tournament("Register benchmark")
+        tournament_ids.append(tournament_id)
+        store.register_players(read_names(path), tournament_id)
+
+    def per_call():
+        tournament_id = store.register_tournament("Register benchmark")
+        tournament_ids.append(tournament_id)
+        for name in read_names(path):
+            store.register_player_in_tournament(
+                tournament_id, store.register_player(name))
+
+    runs = [('register_players', bulk)]
+    if args.compare:
+        runs.append(('register_player per row', per_call))
+    try:
+        for name, func in runs:
+            seconds = common.best_of(args.repeat, func)
+            common.report('%s (%d players)' % (name, args.players),
+                          seconds, args.players)
+    finally:
+        os.remove(path)
+        for tournament_id in tournament_ids:
+            store.delete_tournament(tournament_id)
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Read and write throughput with reads on the primary or on replicas.
+
+Client threads report a result, then read the standings, the match
+history, the byes and the player count of the tournament, over and over.
+They share a store reading from the primary, from the replicas given with
+--replica, and from the replicas with read-your-writes.  Start a replica
+as in the README; on one machine the servers share its CPUs, so the gain
+shows best with the replicas on other hosts.
+"""
+
+from __future__ import absolute_import, print_function
+
+import threading
+import time
+
+import tournament
+from benchmarks import common
+
+
+def client(store, tournament_id, ids, seconds, counts):
+    reads = writes = 0
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        store.report_match(tournament_id, ids[writes % len(ids)],
+                           ids[(writes + 1) % len(ids)])
+        writes += 1
+        store.player_standings(tournament_id)
+        store.match_history(tournament_id)
+        store.players_with_bye_games(tournament_id)
+        store.count_players(tournament_id)
+        reads += 4
+    counts.append((reads, writes))
+
+
+def run(store, tournament_id, ids, clients, seconds):
+    counts = []
+    threads = [threading.Thread(target=client,
+                                args=(store, tournament_id, ids, seconds,
+                                      counts))
+               for _ in range(clients)]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - start
+    return (elapsed, sum(reads for reads, _ in counts),
+            sum(writes for _, writes in counts))
+
+
+def main():
+    p = common.parser(__doc__.splitlines()[0])
+    p.add_argument('--replica', action='append', default=[],
+                   help='libpq connection string of a replica; repeat for'
+                        ' more')
+    p.add_argument('--clients', type=int, default=8)
+    p.add_argument('--seconds', type=float, default=5.0)
+    p.add_argument('--players', type=int, default=200)
+    args = p.parse_args()
+    if not args.replica:
+        p.error("give at least one --replica")
+
+    setup = tournament.TournamentStore(args.dsn)
+    tournament_id = setup.register_tournament("Replica benchmark")
+    try:
+        ids = setup.register_players(
+            ["Player %d" % i for i in range(args.players)], tournament_id)
+        for label, replicas, read_your_writes in (
+                ('primary only', [], False),
+                ('%d replica(s)' % len(args.replica), args.replica, False),
+                ('%d replica(s), read your writes' % len(args.replica),
+                 args.replica, True)):
+            store = tournament.TournamentStore(
+                args.dsn, maxconn=args.clients, replicas=replicas,
+                read_your_writes=read_your_writes)
+            try:
+                seconds, reads, writes = run(store, tournament_id, ids,
+                                             args.clients, args.seconds)
+            finally:
+                store.close()
+            common.report('%s, reads' % label, seconds, reads)
+            common.report('%s, writes' % label, seconds, writes)
+    finally:
+        setup.delete_tournament(tournament_id)
+        setup.close()
+
+
+if __name__ == '__main__':
+    main()
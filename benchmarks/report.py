@@ -0,0 +1,46 @@
+"""Bulk `report_matches` against one `report_match` call per result."""
+
+from __future__ import absolute_import, print_function
+
+import random
+
+import tournament
+from benchmarks import common
+
+
+def main():
+    p = common.parser(__doc__.splitlines()[0])
+    p.add_argument('--results', type=int, default=10000)
+    p.add_argument('--players', type=int, default=200)
+    args = p.parse_args()
+
+    store = tournament.TournamentStore(args.dsn)
+    tournament_id = store.register_tournament("Report benchmark")
+    ids = [store.register_player("Player %d" % i)
+           for i in range(args.players)]
+    for player_id in ids:
+        store.register_player_in_tournament(tournament_id, player_id)
+    rng = random.Random(0)
+    results = [tuple(rng.sample(ids, 2)) for _ in range(args.results)]
+
+    def per_call():
+        for winner, loser in results:
+            store.report_match(tournament_id, winner, loser)
+
+    def bulk():
+        store.report_matches(tournament_id, results)
+
+    try:
+        for name, func in (('report_match per result', per_call),
+                           ('report_matches', bulk)):
+            seconds = common.best_of(args.repeat, func)
+            common.report('%s (%d results)' % (name, args.results),
+                          seconds, args.results)
+            store.delete_matches(tournament_id)
+    finally:
+        store.delete_tournament(tournament_id)
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
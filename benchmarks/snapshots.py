@@ -0,0 +1,90 @@
+"""Standings after a past round: snapshot against aggregating the matches.
+
+Plays a tournament of random pairings round by round, closing each round,
+then reads the standings after every round both from the snapshot taken
+when it closed and by counting the wins and matches of the rounds up to it.
+"""
+
+from __future__ import absolute_import, print_function
+
+import random
+
+import tournament
+from benchmarks import common
+
+# What answering the question took before snapshots: aggregating the
+# matches of the rounds up to the one asked for.
+AGGREGATE = """
+    WITH played AS (
+        SELECT
+            winner_id,
+            loser_id
+        FROM
+            tournament_matches JOIN matches
+            ON tournament_matches.m_id = matches.id
+        WHERE
+            tournament_matches.t_id = %(t_id)s
+            AND tournament_matches.round <= %(round)s),
+    counts AS (
+        SELECT winner_id AS p_id, 1 AS won FROM played
+        UNION ALL
+        SELECT loser_id, 0 FROM played WHERE loser_id IS NOT NULL)
+    SELECT
+        tournament_players.p_id,
+        player.fullname,
+        COALESCE(sum(won), 0)::int AS wins,
+        count(won)::int AS matches
+    FROM
+        tournament_players
+        JOIN player ON tournament_players.p_id = player.id
+        LEFT JOIN counts ON counts.p_id = tournament_players.p_id
+    WHERE
+        tournament_players.t_id = %(t_id)s
+    GROUP BY tournament_players.p_id, player.fullname
+    ORDER BY wins DESC, p_id;"""
+
+
+def aggregate(store, tournament_id, round):
+    with store.connection() as db:
+        curs = db.cursor()
+        curs.execute(AGGREGATE, {'t_id': tournament_id, 'round': round})
+        return curs.fetchall()
+
+
+def main():
+    p = common.parser(__doc__.splitlines()[0])
+    p.add_argument('--players', type=int, default=10000)
+    p.add_argument('--rounds', type=int, default=9)
+    args = p.parse_args()
+
+    store = tournament.TournamentStore(args.dsn)
+    tournament_id = store.register_tournament("Snapshot benchmark")
+    rng = random.Random(0)
+    try:
+        ids = store.register_players(
+            ["Player %d" % i for i in range(args.players)], tournament_id)
+        for _ in range(args.rounds):
+            store.open_round(tournament_id)
+            rng.shuffle(ids)
+            store.report_matches(tournament_id,
+                                 list(zip(ids[0::2], ids[1::2])))
+            store.close_round(tournament_id)
+        for round in range(1, args.rounds + 1):
+            if store.standings_at(tournament_id, round) != \
+                    aggregate(store, tournament_id, round):
+                raise AssertionError("Standings differ.")
+            common.report(
+                'round %d, snapshot' % round,
+                common.best_of(args.repeat, store.standings_at,
+                               tournament_id, round), args.players)
+            common.report(
+                'round %d, aggregating matches' % round,
+                common.best_of(args.repeat, aggregate, store,
+                               tournament_id, round), args.players)
+    finally:
+        store.delete_tournament(tournament_id)
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
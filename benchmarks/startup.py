@@ -0,0 +1,80 @@
+"""Start-up time of a process running one tournament operation.
+
+Times, in fresh interpreters, importing tournament.py cold and its first
+query, which imports psycopg2 and connects; then whole command lines:
+one `standings` per process against the same commands in one `batch`.
+"""
+
+from __future__ import absolute_import, print_function
+
+import subprocess
+import sys
+import time
+
+import tournament
+from benchmarks import common
+
+# Run in a fresh interpreter with the DSN and a tournament id as arguments;
+# prints the seconds the import and the first query took.
+CHILD = """
+import sys
+import time
+start = time.time()
+import tournament
+imported = time.time()
+tournament.configure(sys.argv[1], maxconn=1)
+tournament.count_players(int(sys.argv[2]))
+sys.stdout.write('%f %f' % (imported - start, time.time() - imported))
+"""
+
+
+def child_times(dsn, tournament_id):
+    output = subprocess.check_output(
+        [sys.executable, '-c', CHILD, dsn, str(tournament_id)])
+    return [float(seconds) for seconds in output.split()]
+
+
+def command_line(args, stdin=None):
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'tournament'] + args,
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    process.communicate(stdin)
+    if process.returncode != 0:
+        raise AssertionError("%s failed" % (args,))
+
+
+def main():
+    p = common.parser(__doc__.splitlines()[0])
+    p.add_argument('--commands', type=int, default=20)
+    args = p.parse_args()
+
+    store = tournament.TournamentStore(args.dsn)
+    tournament_id = store.register_tournament("Startup benchmark")
+    try:
+        store.register_players(["Player %d" % i for i in range(100)],
+                               tournament_id)
+        start = time.time()
+        subprocess.check_call([sys.executable, '-c', 'pass'])
+        common.report('interpreter', time.time() - start, 1)
+        times = [child_times(args.dsn, tournament_id)
+                 for _ in range(args.repeat)]
+        common.report('import tournament', min(t[0] for t in times), 1)
+        common.report('first query', min(t[1] for t in times), 1)
+
+        dsn = ['--dsn', args.dsn]
+        standings = ['standings', str(tournament_id)]
+        common.report('one command per process', common.best_of(
+            args.repeat, lambda: [command_line(dsn + standings)
+                                  for _ in range(args.commands)]),
+            args.commands)
+        lines = (' '.join(standings) + '\n') * args.commands
+        common.report('one batch', common.best_of(
+            args.repeat, command_line, dsn + ['batch'], lines.encode()),
+            args.commands)
+    finally:
+        store.delete_tournament(tournament_id)
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,376 @@
+"""Every public function of tournament.py, timed at several database scales.
+
+For each scale, tournaments of closed rounds are bulk loaded into the
+database with a few set-based statements: every player plays once a round,
+never against the same opponent twice, and the standings and their
+snapshots are computed from the matches.  The
+reads are then timed on one of those tournaments, and the writes on new
+tournaments of the same size, built before each run and not timed.
+
+Results are printed, and written as JSON with --output.  With --baseline,
+each time is compared with the one of a previous --output, and the script
+exits with status 1 if any got slower than --threshold times it.  Whatever
+the suite created is deleted at the end, and any leftovers of an
+interrupted run at the start; nothing else in the database is touched.
+"""
+
+from __future__ import absolute_import, print_function
+
+import json
+import platform
+import sys
+import time
+
+import tournament
+from benchmarks import common
+from benchmarks.teardown import settle
+
+# Name -> (tournaments, players per tournament, rounds).  Each round is
+# players / 2 matches, so 'large' holds a million matches.  Players are an
+# even number, and rounds fewer than players, for LOAD_MATCHES.
+SCALES = {
+    'small': (10, 50, 3),
+    'medium': (100, 200, 5),
+    'large': (2000, 100, 10),
+}
+
+# Every tournament and player the suite creates is named like this, so
+# CLEANUP finds them.
+TOURNAMENT_NAME = "Suite"
+PLAYER_NAME = "Suite player"
+
+LOAD_TOURNAMENTS = """
+    WITH loaded AS (
+        INSERT INTO tournament(name)
+            SELECT %(name)s FROM generate_series(1, %(t)s)
+        RETURNING id)
+    SELECT min(id) FROM loaded;"""
+
+LOAD_PLAYERS = """
+    WITH loaded AS (
+        INSERT INTO player(fullname)
+            SELECT %(name)s FROM generate_series(1, %(t)s * %(p)s)
+        RETURNING id)
+    SELECT min(id) FROM loaded;"""
+
+# The loads number players, tournaments and matches from the first id of
+# each (p0, t0 and m0) on, which holds as long as nobody else writes to the
+# database while they run.
+LOAD_ROUNDS = """
+    INSERT INTO tournament_players
+        SELECT %(t0)s + g / %(p)s, %(p0)s + g
+        FROM generate_series(0, %(t)s * %(p)s - 1) g;
+    INSERT INTO tournament_rounds(t_id, round, closed)
+        SELECT %(t0)s + t, r, true
+        FROM generate_series(0, %(t)s - 1) t, generate_series(1, %(r)s) r;
+    SELECT nextval('matches_id_seq');"""
+
+# Pairs by the circle method, so no pairing repeats: the last player stays
+# put and the others turn by one place each round.  Match k of round r pairs
+# the last player with player r - 1 when k is 0, and otherwise players
+# r - 1 + k and r - 1 - k, modulo the other players.  Every third match is
+# won by the second.
+LOAD_MATCHES = """
+    WITH pairs AS (
+        SELECT
+            g,
+            g / (%(p)s / 2 * %(r)s) AS t,
+            g %% (%(p)s / 2 * %(r)s) / (%(p)s / 2) + 1 AS round,
+            g %% (%(p)s / 2) AS k
+        FROM generate_series(0, %(m)s - 1) g),
+    players AS (
+        SELECT
+            g, t, round,
+            %(p0)s + t * %(p)s + CASE
+                WHEN k = 0 THEN %(p)s - 1
+                ELSE (round - 1 + k) %% (%(p)s - 1) END AS a,
+            %(p0)s + t * %(p)s + CASE
+                WHEN k = 0 THEN (round - 1) %% (%(p)s - 1)
+                ELSE (round - 1 - k + %(p)s - 1) %% (%(p)s - 1) END AS b
+        FROM pairs),
+    inserted AS (
+        INSERT INTO matches
+            SELECT
+                %(m0)s + g,
+                CASE WHEN g %% 3 = 0 THEN b ELSE a END,
+                CASE WHEN g %% 3 = 0 THEN a ELSE b END
+            FROM players)
+    INSERT INTO tournament_matches(t_id, m_id, round)
+        SELECT %(t0)s + t, %(m0)s + g, round FROM players;
+    SELECT setval('matches_id_seq', %(m0)s + %(m)s - 1);"""
+
+# The statistics of the tables the standings are computed from are those of
+# before the load, and would lead the planner astray.
+ANALYZE_MATCHES = """
+    ANALYZE matches;
+    ANALYZE tournament_matches;"""
+
+LOAD_STANDINGS = """
+    INSERT INTO tournament_standings(t_id, p_id, wins, losses, matches)
+        SELECT
+            t_id, p_id, sum(won), count(*) - sum(won), count(*)
+        FROM
+            tournament_matches JOIN matches
+            ON tournament_matches.m_id = matches.id,
+            LATERAL (VALUES (winner_id, 1), (loser_id, 0)) AS x(p_id, won)
+        WHERE
+            t_id >= %(t0)s AND m_id >= %(m0)s
+        GROUP BY t_id, p_id;
+    INSERT INTO tournament_round_standings
+        SELECT
+            t_id, round, p_id, wins, round - wins, 0, round
+        FROM (
+            SELECT
+                t_id, round, p_id,
+                sum(won) OVER (PARTITION BY t_id, p_id ORDER BY round)
+                    AS wins
+            FROM
+                tournament_matches JOIN matches
+                ON tournament_matches.m_id = matches.id,
+                LATERAL (VALUES (winner_id, 1), (loser_id, 0))
+                    AS x(p_id, won)
+            WHERE
+                t_id >= %(t0)s AND m_id >= %(m0)s) AS cumulative;"""
+
+CLEANUP = """
+    DELETE FROM matches WHERE id IN (
+        SELECT
+            m_id
+        FROM
+            tournament_matches JOIN tournament
+            ON tournament_matches.t_id = tournament.id
+        WHERE
+            tournament.name = %(t_name)s);
+    DELETE FROM tournament WHERE name = %(t_name)s;
+    DELETE FROM player WHERE fullname = %(p_name)s;"""
+
+
+def load(store, tournaments, players, rounds):
+    """Bulk loads tournaments of closed rounds; returns the first id."""
+    args = {'t': tournaments, 'p': players, 'r': rounds,
+            'm': tournaments * players // 2 * rounds}
+    with store.connection() as db:
+        curs = db.cursor()
+        curs.execute(LOAD_TOURNAMENTS, dict(args, name=TOURNAMENT_NAME))
+        args['t0'] = curs.fetchone()[0]
+        curs.execute(LOAD_PLAYERS, dict(args, name=PLAYER_NAME))
+        args['p0'] = curs.fetchone()[0]
+        curs.execute(LOAD_ROUNDS, args)
+        args['m0'] = curs.fetchone()[0]
+        curs.execute(LOAD_MATCHES, args)
+        curs.execute(ANALYZE_MATCHES)
+        curs.execute(LOAD_STANDINGS, args)
+        db.commit()
+    return args['t0']
+
+
+def cleanup(store):
+    with store.connection() as db:
+        db.cursor().execute(CLEANUP, {'t_name': TOURNAMENT_NAME,
+                                      'p_name': PLAYER_NAME})
+        db.commit()
+
+
+def new_tournament(players, rounds=0):
+    """Registers a tournament with `rounds` closed rounds of matches."""
+    tournament_id = tournament.register_tournament(TOURNAMENT_NAME)
+    ids = tournament.register_players([PLAYER_NAME] * players,
+                                      tournament_id)
+    for _ in range(rounds):
+        tournament.open_round(tournament_id)
+        tournament.report_matches(tournament_id,
+                                  [(p[0], p[2]) for p in
+                                   tournament.swiss_pairings(tournament_id)])
+        tournament.close_round(tournament_id)
+    return tournament_id, ids
+
+
+def consume(iterator_function, *args):
+    for _ in iterator_function(*args):
+        pass
+
+
+def cases(tournament_id, tournament_ids, players, rounds):
+    """Returns (name, setup) pairs; setup returns (function, args) to time.
+
+    delete_players is left out: it deletes every player, and only works on
+    an empty database.
+    """
+    def read(function, *args):
+        return lambda: (function, args)
+
+    def scratch_round():
+        t_id, ids = new_tournament(players)
+        return tournament.report_matches, (t_id, list(zip(ids[0::2],
+                                                          ids[1::2])))
+
+    def scratch(function, rounds=0, open_round=False):
+        def setup():
+            t_id, _ = new_tournament(players, rounds)
+            if open_round:
+                tournament.open_round(t_id)
+            return function, (t_id,)
+        return setup
+
+    def register_players():
+        t_id, _ = new_tournament(0)
+        return tournament.register_players, ([PLAYER_NAME] * players, t_id)
+
+    def register_player_in_tournament():
+        t_id, _ = new_tournament(0)
+        return (tournament.register_player_in_tournament,
+                (t_id, tournament.register_player(PLAYER_NAME)))
+
+    def report_match():
+        t_id, ids = new_tournament(players)
+        return tournament.report_match, (t_id, ids[0], ids[1])
+
+    return [
+        ('count_players', read(tournament.count_players, tournament_id)),
+        ('player_standings', read(tournament.player_standings,
+                                  tournament_id)),
+        ('match_history', read(tournament.match_history, tournament_id)),
+        ('players_with_bye_games', read(tournament.players_with_bye_games,
+                                        tournament_id)),
+        ('iter_standings', read(consume, tournament.iter_standings,
+                                tournament_id)),
+        ('iter_match_history', read(consume, tournament.iter_match_history,
+                                    tournament_id)),
+        ('pairing_data', read(tournament.pairing_data, tournament_id)),
+        ('swiss_pairings', read(tournament.swiss_pairings, tournament_id)),
+        ('swiss_pairings optimal', read(tournament.swiss_pairings,
+                                        tournament_id, 'optimal')),
+        ('ranked_standings', read(tournament.ranked_standings,
+                                  tournament_id)),
+        ('pairing_data_many', read(tournament.pairing_data_many,
+                                   tournament_ids)),
+        ('pair_all', read(tournament.pair_all, tournament_ids, 'greedy', 1)),
+        ('current_round', read(tournament.current_round, tournament_id)),
+        ('rounds', read(tournament.rounds, tournament_id)),
+        ('round_results', read(tournament.round_results, tournament_id,
+                               rounds)),
+        ('unpaired_players', read(tournament.unpaired_players,
+                                  tournament_id, rounds)),
+        ('standings_at', read(tournament.standings_at, tournament_id,
+                              rounds)),
+        ('standings_diff', read(tournament.standings_diff, tournament_id,
+                                1, rounds)),
+        ('register_tournament', read(tournament.register_tournament,
+                                     TOURNAMENT_NAME)),
+        ('register_player', read(tournament.register_player, PLAYER_NAME)),
+        ('register_players', register_players),
+        ('register_player_in_tournament', register_player_in_tournament),
+        ('report_match', report_match),
+        ('report_matches', scratch_round),
+        ('open_round', scratch(tournament.open_round)),
+        ('close_round', scratch(tournament.close_round, open_round=True)),
+        ('delete_matches', scratch(tournament.delete_matches, rounds)),
+        ('delete_tournament_players', scratch(
+            tournament.delete_tournament_players, rounds)),
+        ('delete_tournament', scratch(tournament.delete_tournament, rounds)),
+    ]
+
+
+def measure(setup, repeat):
+    """Returns the fastest of `repeat` runs of what `setup` returns."""
+    best = None
+    for _ in range(repeat):
+        function, args = setup()
+        start = time.time()
+        function(*args)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def run_scale(store, name, repeat):
+    tournaments, players, rounds = SCALES[name]
+    start = time.time()
+    t0 = load(store, tournaments, players, rounds)
+    settle(store)
+    result = {'tournaments': tournaments, 'players': players,
+              'rounds': rounds,
+              'matches': tournaments * players // 2 * rounds,
+              'load_seconds': time.time() - start, 'seconds': {}}
+    common.report('%s: load %d matches' % (name, result['matches']),
+                  result['load_seconds'], result['matches'])
+    # A tournament in the middle of the ones loaded, and ten of them.
+    tournament_id = t0 + tournaments // 2
+    tournament_ids = list(range(t0, t0 + min(10, tournaments)))
+    for case, setup in cases(tournament_id, tournament_ids, players,
+                             rounds):
+        seconds = measure(setup, repeat)
+        result['seconds'][case] = seconds
+        common.report('%s: %s' % (name, case), seconds, 1)
+    return result
+
+
+def regressions(results, baseline, threshold, min_seconds):
+    """Returns (scale, function, baseline, seconds) of what got slower.
+
+    A time regressed when it is more than `threshold` times the baseline
+    and more than `min_seconds` slower, so noise on quick calls does not
+    count.  Scales and functions missing from either are skipped.
+    """
+    found = []
+    for scale, result in sorted(results['scales'].items()):
+        before = baseline.get('scales', {}).get(scale, {}).get('seconds', {})
+        for case, seconds in sorted(result['seconds'].items()):
+            base = before.get(case)
+            if base is not None and seconds > base * threshold and \
+                    seconds - base > min_seconds:
+                found.append((scale, case, base, seconds))
+    return found
+
+
+def main():
+    p = common.parser(__doc__.splitlines()[0])
+    p.add_argument('--scales', nargs='+', choices=sorted(SCALES),
+                   default=['small', 'medium', 'large'])
+    p.add_argument('--output', help='file to write the results to, as JSON')
+    p.add_argument('--baseline', help='results of an earlier --output to'
+                                      ' compare with')
+    p.add_argument('--threshold', type=float, default=1.5,
+                   help='slowdown over the baseline that fails the run'
+                        ' (default: %(default)s times)')
+    p.add_argument('--min-seconds', type=float, default=0.001,
+                   help='slowdowns smaller than this never fail the run'
+                        ' (default: %(default)s)')
+    args = p.parse_args()
+
+    store = tournament.configure(args.dsn)
+    results = {'python': platform.python_version(),
+               'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+               'repeat': args.repeat, 'scales': {}}
+    try:
+        cleanup(store)
+        for name in args.scales:
+            try:
+                results['scales'][name] = run_scale(store, name, args.repeat)
+            finally:
+                cleanup(store)
+    finally:
+        store.close()
+
+    if args.output:
+        with open(args.output, 'w') as out:
+            json.dump(results, out, indent=2, sort_keys=True,
+                      separators=(',', ': '))
+            out.write('\n')
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        found = regressions(results, baseline, args.threshold,
+                            args.min_seconds)
+        for scale, case, base, seconds in found:
+            print('REGRESSION %s: %s took %.4f s, %.1f times %.4f s' %
+                  (scale, case, seconds, seconds / base, base))
+        if found:
+            sys.exit(1)
+        print('No regressions over %.1f times the baseline.' %
+              args.threshold)
+
+
+if __name__ == '__main__':
+    main()
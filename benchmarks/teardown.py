@@ -0,0 +1,84 @@
+"""Deleting a tournament, as the rest of the database grows.
+
+Tournaments of each size are built and deleted on top of background
+tournaments holding more and more matches.  The time to delete one should
+follow its own size, and stay the same whatever the background.
+"""
+
+from __future__ import absolute_import, print_function
+
+import random
+import time
+
+import tournament
+from benchmarks import common
+
+CHUNK = 100000
+
+
+def build(store, name, players, matches, rng):
+    """Registers a tournament with `matches` random matches; returns its id."""
+    tournament_id = store.register_tournament(name)
+    ids = store.register_players(["Player %d" % i for i in range(players)],
+                                 tournament_id)
+    for start in range(0, matches, CHUNK):
+        count = min(CHUNK, matches - start)
+        store.report_matches(tournament_id, [tuple(rng.sample(ids, 2))
+                                             for _ in range(count)])
+    return tournament_id
+
+
+def settle(store):
+    """Vacuums and analyzes, as autovacuum would after a bulk load."""
+    with store.connection() as db:
+        db.autocommit = True
+        try:
+            db.cursor().execute("VACUUM ANALYZE;")
+        finally:
+            db.autocommit = False
+
+
+def main():
+    p = common.parser(__doc__.splitlines()[0])
+    p.add_argument('--sizes', type=int, nargs='+',
+                   default=[1000, 10000, 100000],
+                   help='matches in the deleted tournament')
+    p.add_argument('--background', type=int, nargs='+',
+                   default=[100000, 1000000],
+                   help='matches in the rest of the database')
+    p.add_argument('--players', type=int, default=1000)
+    args = p.parse_args()
+
+    store = tournament.TournamentStore(args.dsn)
+    rng = random.Random(0)
+    background = []
+    loaded = 0
+    try:
+        for total in sorted(args.background):
+            while loaded < total:
+                count = min(CHUNK, total - loaded)
+                background.append(build(store, "Background", args.players,
+                                        count, rng))
+                loaded += count
+            settle(store)
+            for size in args.sizes:
+                best = None
+                for _ in range(args.repeat):
+                    tournament_id = build(store, "Teardown", args.players,
+                                          size, rng)
+                    start = time.time()
+                    store.delete_tournament(tournament_id)
+                    elapsed = time.time() - start
+                    if best is None or elapsed < best:
+                        best = elapsed
+                common.report('delete %d of %d matches' % (size,
+                                                           size + loaded),
+                              best, size)
+    finally:
+        for tournament_id in background:
+            store.delete_tournament(tournament_id)
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""Times `ranked_standings` for a large field, in memory and end to end.
+
+The field plays a number of simulated rounds first.  The in-memory timing
+covers `tiebreaks.rank` alone; the end-to-end timing also reads the
+standings and every match from the database.
+"""
+
+from __future__ import absolute_import, print_function
+
+import random
+
+import tiebreaks
+import tournament
+from benchmarks import common
+from benchmarks.pairing import simulate
+
+
+def main():
+    p = common.parser(__doc__.splitlines()[0])
+    p.add_argument('--players', type=int, default=10000)
+    p.add_argument('--rounds', type=int, default=15)
+    p.add_argument('--no-db', action='store_true',
+                   help='only time the in-memory ranking')
+    args = p.parse_args()
+
+    rng = random.Random(0)
+    standings, history, byes = simulate(args.players, args.rounds, rng)
+    standings = [(i, name, wins, args.rounds)
+                 for i, name, wins, _ in standings]
+    results = history + [(b, None) for b in byes]
+    label = '%d players, %d rounds' % (args.players, args.rounds)
+    common.report('tiebreaks.rank, %s' % label,
+                  common.best_of(args.repeat, tiebreaks.rank,
+                                 standings, results),
+                  args.players)
+    if args.no_db:
+        return
+
+    store = tournament.TournamentStore(args.dsn)
+    tournament_id = store.register_tournament("Tiebreak benchmark")
+    try:
+        ids = store.register_players([row[1] for row in standings],
+                                     tournament_id)
+        # simulate() numbers the players from 1.
+        store.report_matches(tournament_id,
+                             [(ids[w - 1], ids[l - 1] if l else None)
+                              for w, l in results])
+        common.report('ranked_standings, %s' % label,
+                      common.best_of(args.repeat, store.ranked_standings,
+                                     tournament_id),
+                      args.players)
+    finally:
+        store.delete_tournament(tournament_id)
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+#
+# cache.py -- in-process cache of tournament state for tournament.py
+#
+# Keeps what `tournament.pairing_data` returns for the most recently used
+# tournaments, in the compact form of records.py, so polling the standings
+# or pairings of a live tournament does not need the database until a
+# result changes it.
+
+import collections
+import sys
+import threading
+
+
+def _size_of(value):
+    """Returns an estimate of the bytes held by nested lists, tuples and
+    objects with __slots__.  Arrays count with their buffer."""
+    size = sys.getsizeof(value)
+    if isinstance(value, (list, tuple)):
+        for item in value:
+            size += _size_of(item)
+    elif hasattr(value, '__slots__'):
+        for name in value.__slots__:
+            size += _size_of(getattr(value, name, None))
+    return size
+
+
+class TournamentCache(object):
+    """Least recently used cache of (standings, history, byes) tuples.
+
+    tournament.py caches them as `records.compact_pairing_data` returns
+    them; any nested lists and tuples can be cached.
+
+    Entries are evicted, least recently used first, when either more than
+    `max_tournaments` tournaments or more than `max_bytes` bytes are cached.
+    All methods are safe to call from several threads.
+
+    Args:
+        max_tournaments: Number of tournaments to keep at most.
+        max_bytes: Estimated memory the entries may take at most.
+    """
+
+    def __init__(self, max_tournaments=64, max_bytes=64 * 1024 * 1024):
+        self.max_tournaments = max_tournaments
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = collections.OrderedDict()
+        self._bytes = 0
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def version(self):
+        """Returns a token to pass to `put`.
+
+        Take it before reading from the database.  If anything is
+        invalidated while the read is going on, `put` ignores the then
+        possibly stale result.
+        """
+        return self._version
+
+    def get(self, tournament_id):
+        """Returns the cached entry of a tournament, or None."""
+        with self._lock:
+            entry = self._entries.pop(tournament_id, None)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries[tournament_id] = entry
+            self.hits += 1
+            return entry[0]
+
+    def put(self, tournament_id, data, version):
+        """Caches the data of a tournament.
+
+        Args:
+            tournament_id: The tournament the data belongs to.
+            data: The (standings, history, byes) tuple to cache.
+            version: What `version` returned before the data was read.
+        """
+        size = _size_of(data)
+        with self._lock:
+            if version != self._version or size > self.max_bytes:
+                return
+            self._remove(tournament_id)
+            self._entries[tournament_id] = (data, size)
+            self._bytes += size
+            while len(self._entries) > self.max_tournaments or \
+                    self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, tournament_id=None):
+        """Drops the entry of a tournament, or every entry if None."""
+        with self._lock:
+            self._version += 1
+            if tournament_id is None:
+                self._entries.clear()
+                self._bytes = 0
+            else:
+                self._remove(tournament_id)
+
+    def _remove(self, tournament_id):
+        entry = self._entries.pop(tournament_id, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def stats(self):
+        """Returns a dict with the counters and the size of the cache."""
+        with self._lock:
+            return {'hits': self.hits,
+                    'misses': self.misses,
+                    'evictions': self.evictions,
+                    'tournaments': len(self._entries),
+                    'bytes': self._bytes}
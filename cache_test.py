@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+#
+# Test cases for cache.py
+# These do not need a database.
+
+from __future__ import print_function
+
+from cache import *
+
+
+def make_data(players):
+    standings = [(i, "Player %d" % i, 0, 0) for i in range(players)]
+    return standings, [], []
+
+
+def test_hits_and_misses():
+    cache = TournamentCache()
+    if cache.get(1) is not None:
+        raise ValueError("An empty cache should not return anything.")
+    data = make_data(4)
+    cache.put(1, data, cache.version())
+    if cache.get(1) != data:
+        raise ValueError("The cache should return what was put in.")
+    stats = cache.stats()
+    if stats['hits'] != 1 or stats['misses'] != 1:
+        raise ValueError("The cache should count hits and misses.")
+    print("1. Cached tournaments are returned and counted.")
+
+
+def test_invalidate():
+    cache = TournamentCache()
+    cache.put(1, make_data(4), cache.version())
+    cache.put(2, make_data(4), cache.version())
+    cache.invalidate(1)
+    if cache.get(1) is not None or cache.get(2) is None:
+        raise ValueError("Only the invalidated tournament should be gone.")
+    cache.invalidate()
+    if cache.get(2) is not None or cache.stats()['bytes'] != 0:
+        raise ValueError("Invalidating everything should empty the cache.")
+    print("2. Tournaments can be invalidated.")
+
+
+def test_stale_put_is_ignored():
+    cache = TournamentCache()
+    version = cache.version()
+    cache.invalidate(1)
+    cache.put(1, make_data(4), version)
+    if cache.get(1) is not None:
+        raise ValueError("Data read before an invalidation should not be"
+                         " cached.")
+    print("3. Data read before an invalidation is not cached.")
+
+
+def test_lru_eviction():
+    cache = TournamentCache(max_tournaments=2)
+    for tournament_id in (1, 2):
+        cache.put(tournament_id, make_data(4), cache.version())
+    cache.get(1)
+    cache.put(3, make_data(4), cache.version())
+    if cache.get(2) is not None or cache.get(1) is None:
+        raise ValueError("The least recently used tournament should go.")
+    cache.invalidate()
+    cache.put(1, make_data(4), cache.version())
+    cache = TournamentCache(max_bytes=cache.stats()['bytes'])
+    cache.put(1, make_data(4), cache.version())
+    cache.put(2, make_data(4), cache.version())
+    if cache.get(1) is not None or cache.stats()['evictions'] != 1:
+        raise ValueError("The cache should stay within its memory cap.")
+    print("4. Least recently used tournaments are evicted.")
+
+
+if __name__ == '__main__':
+    test_hits_and_misses()
+    test_invalidate()
+    test_stale_put_is_ignored()
+    test_lru_eviction()
+    print("Success!  All tests pass!")
@@ -0,0 +1,263 @@
+#
+# cli.py -- the command line of tournament.py
+#
+# Runs one operation per process, or, with `batch`, one per line of its
+# standard input over a single connection:
+#
+#     python -m tournament create "Spring Open"
+#     python -m tournament register 7 "Twilight Sparkle" "Rarity"
+#     python -m tournament report 7 12 13
+#     python -m tournament pair 7
+#     python -m tournament batch < round-3.txt
+#
+# Output is tab-separated, one row per line.  Only the chosen storage
+# backend is imported, and psycopg2 only once the first query runs.
+
+from __future__ import print_function
+
+import argparse
+import contextlib
+import shlex
+import sys
+
+import pairing
+import tournament
+
+
+class CommandError(Exception):
+    """A line of a batch that is not a command."""
+
+
+class _BatchParser(argparse.ArgumentParser):
+    """Parses the lines of a batch, raising instead of exiting."""
+
+    def error(self, message):
+        raise CommandError(message)
+
+
+def create(args, out):
+    tournament_id = tournament.register_tournament(args.name)
+    if tournament_id is None:
+        return False
+    print(tournament_id, file=out)
+    return True
+
+
+def register(args, out):
+    ids = tournament.register_players(args.names, args.tournament_id)
+    if ids is None:
+        return False
+    for player_id in ids:
+        print(player_id, file=out)
+    return True
+
+
+def report(args, out):
+    return report_results(args.tournament_id, [(args.winner, args.loser)],
+                          out)
+
+
+def report_results(tournament_id, results, out):
+    """Reports (winner, loser) results; prints the ids of their matches."""
+    match_ids = tournament.report_matches(tournament_id, results)
+    if match_ids is None:
+        return False
+    for match_id in match_ids:
+        print(match_id, file=out)
+    return True
+
+
+def standings(args, out):
+    if args.round is None:
+        rows = tournament.player_standings(args.tournament_id)
+    else:
+        rows = tournament.standings_at(args.tournament_id, args.round)
+    if rows is None:
+        return False
+    for row in rows:
+        write_row(row, out)
+    return True
+
+
+def pair(args, out):
+    pairs = tournament.swiss_pairings(args.tournament_id, args.mode)
+    if pairs is None:
+        return False
+    for row in pairs:
+        write_row(row, out)
+    return True
+
+
+def write_row(row, out):
+    """Prints a row tab-separated, None as an empty field."""
+    print('\t'.join('' if value is None else str(value) for value in row),
+          file=out)
+
+
+def batch(args, out, lines=None):
+    """Runs the commands of `lines`, by default of standard input.
+
+    Blank lines and lines starting with '#' are skipped.  Results of
+    `report` lines following each other for the same tournament are sent
+    in one `report_matches`; when that fails, they are sent again one by
+    one, so only the bad lines fail.  A command that fails is reported on
+    standard error with its line number, and the next one runs.
+
+    Returns:
+        Whether every command succeeded.
+    """
+    if lines is None:
+        lines = sys.stdin
+    parser = build_parser(_BatchParser, command_line=False)
+    ok = True
+    pending_id = None
+    pending = []
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            command = parser.parse_args(shlex.split(line))
+        except (CommandError, ValueError) as e:
+            print('line %d: %s' % (number, e), file=sys.stderr)
+            ok = False
+            continue
+        if pending and (command.run is not report or
+                        command.tournament_id != pending_id):
+            if not report_lines(pending_id, pending, out):
+                ok = False
+            pending = []
+        if command.run is report:
+            pending_id = command.tournament_id
+            pending.append((number, (command.winner, command.loser)))
+        elif not command.run(command, out):
+            print('line %d: %s failed' % (number, command.command),
+                  file=sys.stderr)
+            ok = False
+    if pending and not report_lines(pending_id, pending, out):
+        ok = False
+    return ok
+
+
+def report_lines(tournament_id, lines, out):
+    """Reports the results of (line number, result) pairs together.
+
+    They are written in one transaction, so when that fails none of them
+    is, and each is sent again on its own.  The lines that fail then are
+    reported on standard error.
+
+    Returns:
+        Whether every result was reported.
+    """
+    if report_results(tournament_id, [result for _, result in lines], out):
+        return True
+    if len(lines) == 1:
+        failed = [lines[0][0]]
+    else:
+        failed = [number for number, result in lines
+                  if not report_results(tournament_id, [result], out)]
+    for number in failed:
+        print('line %d: report failed' % number, file=sys.stderr)
+    return not failed
+
+
+def build_parser(parser_class=argparse.ArgumentParser, command_line=True):
+    """Returns the parser of the commands.
+
+    Args:
+        parser_class: The class of the parser and of its subparsers.
+        command_line: Whether to add the `batch` command and the options
+            choosing the database, which only the command line takes.
+    """
+    parser = parser_class(prog='python -m tournament',
+                          description='Run Swiss-system tournaments.')
+    if command_line:
+        backends = parser.add_mutually_exclusive_group()
+        backends.add_argument('--dsn', default=tournament.DSN,
+                              help='libpq connection string'
+                                   ' (default: %(default)s)')
+        backends.add_argument('--sqlite', metavar='PATH',
+                              help='use the SQLite database in PATH instead')
+        backends.add_argument('--memory', action='store_true',
+                              help='keep everything in memory, for a batch')
+    commands = parser.add_subparsers(dest='command', metavar='command')
+    commands.required = True
+
+    p = commands.add_parser('create', help='register a tournament; prints'
+                                           ' its id')
+    p.add_argument('name')
+    p.set_defaults(run=create)
+
+    p = commands.add_parser('register', help='register players in a'
+                                             ' tournament; prints their ids')
+    p.add_argument('tournament_id', type=int)
+    p.add_argument('names', nargs='+', metavar='name')
+    p.set_defaults(run=register)
+
+    p = commands.add_parser('report', help='report a match; prints its id')
+    p.add_argument('tournament_id', type=int)
+    p.add_argument('winner', type=int)
+    p.add_argument('loser', type=int, nargs='?',
+                   help='left out for a bye')
+    p.set_defaults(run=report)
+
+    p = commands.add_parser('standings', help='print id, name, wins and'
+                                              ' matches of every player')
+    p.add_argument('tournament_id', type=int)
+    p.add_argument('--round', type=int,
+                   help='as they were after this closed round')
+    p.set_defaults(run=standings)
+
+    p = commands.add_parser('pair', help='print the pairings of the next'
+                                         ' round: id, name, id, name')
+    p.add_argument('tournament_id', type=int)
+    p.add_argument('--mode', choices=sorted(pairing.PAIRING_MODES),
+                   default='greedy')
+    p.set_defaults(run=pair)
+
+    if command_line:
+        p = commands.add_parser('batch', help='run the commands of standard'
+                                              ' input, one per line')
+        p.set_defaults(run=batch)
+    return parser
+
+
+def use_backend(args):
+    """Points the module-level functions at the backend chosen.
+
+    Only its module is imported.  PostgreSQL gets a single connection.
+    """
+    if args.memory:
+        import memory_store
+        tournament.use_store(memory_store.MemoryTournamentStore())
+    elif args.sqlite:
+        import sqlite_store
+        tournament.use_store(sqlite_store.SQLiteTournamentStore(args.sqlite))
+    else:
+        tournament.configure(args.dsn, maxconn=1)
+
+
+@contextlib.contextmanager
+def errors_to_stderr():
+    """Sends what is printed to standard output to standard error.
+
+    The stores print their errors, and the results go to standard output,
+    which must hold nothing else.
+    """
+    stdout, sys.stdout = sys.stdout, sys.stderr
+    try:
+        yield
+    finally:
+        sys.stdout = stdout
+
+
+def main(argv=None, out=None):
+    """Runs a command line; returns the exit status."""
+    args = build_parser().parse_args(argv)
+    out = out or sys.stdout
+    use_backend(args)
+    try:
+        with errors_to_stderr():
+            return 0 if args.run(args, out) else 1
+    finally:
+        tournament.get_store().close()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+#
+# Test cases for cli.py
+# These run on the in-memory backend, and do not need a database.
+
+from __future__ import print_function
+
+import sys
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+import cli
+import metrics
+import tournament
+
+
+def run(*argv):
+    out = StringIO()
+    status = cli.main(list(argv), out)
+    return status, out.getvalue().splitlines()
+
+
+def batch(lines):
+    """Runs lines as a batch on a new in-memory store."""
+    args = cli.build_parser().parse_args(['--memory', 'batch'])
+    cli.use_backend(args)
+    out = StringIO()
+    ok = cli.batch(args, out, lines)
+    return ok, out.getvalue().splitlines()
+
+
+def test_commands():
+    status, output = run('--memory', 'create', 'Summer Sun Celebration')
+    if status != 0 or output != ['1']:
+        raise ValueError("create should print the new tournament's id.")
+    if 'psycopg2' in sys.modules:
+        raise ValueError("The memory backend should not import psycopg2.")
+    print("1. Commands run without importing unused drivers.")
+
+
+def test_batch():
+    metrics.reset()
+    metrics.enable()
+    try:
+        ok, output = batch([
+            'create "Running of the Leaves"',
+            'register 1 Applejack "Rainbow Dash" Fluttershy',
+            '# the first round',
+            'report 1 1 2',
+            'report 1 3',
+            '',
+            'standings 1',
+            'pair 1'])
+    finally:
+        metrics.disable()
+    if not ok or output != [
+            '1', '1', '2', '3', '1', '2',
+            '1\tApplejack\t1\t1', '3\tFluttershy\t1\t1',
+            '2\tRainbow Dash\t0\t1',
+            '1\tApplejack\t3\tFluttershy', '2\tRainbow Dash\t\t']:
+        raise ValueError("A batch should run every command in order.")
+    calls = [h for h in metrics.snapshot()['histograms']
+             if h['labels'] == {'function': 'report_matches'}]
+    if calls[0]['count'] != 1:
+        raise ValueError("Reports in a row should be sent together.")
+    print("2. Batches run many commands, and send reports together.")
+
+
+def test_batch_errors():
+    ok, output = batch(['create "Equestria Games"',
+                        'register 1 Spitfire',
+                        'report 1 1 99',
+                        'report one',
+                        'standings 1'])
+    if ok or output[-1] != '1\tSpitfire\t0\t0':
+        raise ValueError("Bad lines should fail the batch, and be skipped.")
+    print("3. Bad lines in a batch are reported and skipped.")
+
+
+def test_batch_bad_report():
+    stderr = sys.stderr
+    sys.stderr = errors = StringIO()
+    try:
+        ok, output = batch(['create "Best Young Flyers"',
+                            'register 1 Rarity Spike Zecora',
+                            'report 1 1 2',
+                            'report 1 3 99',
+                            'report 1 3'])
+    finally:
+        sys.stderr = stderr
+    if ok or output != ['1', '1', '2', '3', '1', '2']:
+        raise ValueError("The good reports of a group should be kept.")
+    if errors.getvalue().splitlines() != ['line 4: report failed']:
+        raise ValueError("Only the bad report should be named.")
+    print("4. A bad report fails alone, not with the reports around it.")
+
+
+def test_errors_on_stderr():
+    streams = sys.stdin, sys.stdout, sys.stderr
+    sys.stdin = StringIO('create "Wonderbolts Derby"\n'
+                         'register 1 Soarin\n'
+                         'report 1 1 99\n'
+                         'standings 1\n')
+    sys.stdout, sys.stderr = StringIO(), StringIO()
+    try:
+        status = cli.main(['--memory', 'batch'])
+        output = sys.stdout.getvalue().splitlines()
+        errors = sys.stderr.getvalue().splitlines()
+    finally:
+        sys.stdin, sys.stdout, sys.stderr = streams
+    if status != 1 or output != ['1', '1', '1\tSoarin\t0\t0']:
+        raise ValueError("Standard output should hold only results.")
+    if errors != ['Error player 99 does not exist',
+                  'line 3: report failed']:
+        raise ValueError("Errors of the store should go to standard error.")
+    print("5. Errors go to standard error, results to standard output.")
+
+
+if __name__ == '__main__':
+    test_commands()
+    test_batch()
+    test_batch_errors()
+    test_batch_bad_report()
+    test_errors_on_stderr()
+    tournament.get_store().close()
+    print("Success!  All tests pass!")
@@ -0,0 +1,95 @@
+#
+# export.py -- streams standings and match history to CSV or JSON lines
+#
+# Built on the streaming iterators of tournament.py, so exports take the same
+# memory however many rows they write.
+#
+#     python export.py history 7 --format jsonl --output history.jsonl
+
+from __future__ import print_function
+
+import argparse
+import csv
+import json
+import sys
+
+import tournament
+
+FORMATS = ('csv', 'jsonl')
+
+STANDINGS_FIELDS = ('id', 'name', 'wins', 'matches')
+HISTORY_FIELDS = ('winner_id', 'loser_id')
+
+
+def write_rows(rows, fields, out, format='csv'):
+    """Writes rows to a file as they come.
+
+    Args:
+        rows: An iterable of tuples.
+        fields: The names of the columns.
+        out: A file open for writing text.
+        format: "csv" writes a header line and a line per row; "jsonl" a JSON
+            object per row.
+
+    Returns:
+        The number of rows written.
+    """
+    if format not in FORMATS:
+        raise ValueError("Unknown format %r" % (format,))
+    count = 0
+    if format == 'csv':
+        writer = csv.writer(out)
+        writer.writerow(fields)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    else:
+        for row in rows:
+            out.write(json.dumps(dict(zip(fields, row)), sort_keys=True))
+            out.write('\n')
+            count += 1
+    return count
+
+
+def export_standings(tournament_id, out, format='csv',
+                     itersize=tournament.ITERSIZE):
+    """Writes the standings of a tournament; see `write_rows`."""
+    return write_rows(tournament.iter_standings(tournament_id, itersize),
+                      STANDINGS_FIELDS, out, format)
+
+
+def export_match_history(tournament_id, out, format='csv',
+                         itersize=tournament.ITERSIZE):
+    """Writes the match history of a tournament; see `write_rows`."""
+    return write_rows(tournament.iter_match_history(tournament_id, itersize),
+                      HISTORY_FIELDS, out, format)
+
+
+EXPORTS = {
+    'standings': export_standings,
+    'history': export_match_history,
+}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export the standings or '
+                                     'the match history of a tournament.')
+    parser.add_argument('what', choices=sorted(EXPORTS))
+    parser.add_argument('tournament_id', type=int)
+    parser.add_argument('--format', choices=FORMATS, default='csv')
+    parser.add_argument('--itersize', type=int, default=tournament.ITERSIZE,
+                        help='rows fetched per round trip '
+                        '(default: %(default)s)')
+    parser.add_argument('--output', help='file to write (default: stdout)')
+    parser.add_argument('--dsn', default=tournament.DSN,
+                        help='libpq connection string (default: %(default)s)')
+    args = parser.parse_args()
+    tournament.configure(args.dsn, maxconn=1)
+    out = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        count = EXPORTS[args.what](args.tournament_id, out, args.format,
+                                   args.itersize)
+    finally:
+        if args.output:
+            out.close()
+    print('Exported %d rows.' % count, file=sys.stderr)
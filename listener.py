@@ -0,0 +1,119 @@
+#
+# listener.py -- follows tournament changes made by other processes
+#
+# Every write in tournament.py sends a notification on the
+# `tournament.NOTIFY_CHANNEL` channel when it commits.  A
+# `TournamentListener` receives them in a background thread and passes the
+# id of each changed tournament to its callbacks, e.g. to invalidate a
+# `cache.TournamentCache`:
+#
+#     listener = TournamentListener(callbacks=[store.cache.invalidate])
+#     listener.start()
+
+import select
+import threading
+
+import psycopg2
+import psycopg2.extensions
+
+import tournament
+
+
+class TournamentListener(object):
+    """Calls back with the id of every tournament another process changes.
+
+    Callbacks get the tournament id as an int, or None when every
+    tournament may have changed: after `delete_players`, and after the
+    connection to the database was lost, since notifications sent in the
+    meantime are gone.
+
+    Args:
+        dsn: libpq connection string of the tournament database.
+        callbacks: Functions taking a tournament id, or None.
+        timeout: Seconds between checks whether the listener was stopped.
+        retry: Seconds to wait before reconnecting after an error.
+    """
+
+    def __init__(self, dsn=tournament.DSN, callbacks=(), timeout=1.0,
+                 retry=5.0):
+        self.dsn = dsn
+        self.callbacks = list(callbacks)
+        self.timeout = timeout
+        self.retry = retry
+        self._db = None
+        self._thread = None
+        self._stopping = threading.Event()
+
+    def add_callback(self, callback):
+        """Adds a function to call with the id of each changed tournament."""
+        self.callbacks.append(callback)
+
+    def _dispatch(self, tournament_id):
+        for callback in list(self.callbacks):
+            callback(tournament_id)
+
+    def listen(self):
+        """Connects to the database and subscribes to the channel."""
+        self._db = psycopg2.connect(self.dsn)
+        self._db.set_isolation_level(
+            psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        curs = self._db.cursor()
+        curs.execute("LISTEN %s;" % tournament.NOTIFY_CHANNEL)
+
+    def poll(self, timeout=0):
+        """Waits up to `timeout` seconds and dispatches what arrived.
+
+        Use this instead of `start` to handle the notifications in a thread
+        of your own, after calling `listen`.
+
+        Returns:
+            The number of notifications dispatched.
+        """
+        if select.select([self._db], [], [], timeout) == ([], [], []):
+            return 0
+        self._db.poll()
+        count = 0
+        while self._db.notifies:
+            notify = self._db.notifies.pop(0)
+            count += 1
+            if notify.payload == '*':
+                self._dispatch(None)
+            else:
+                self._dispatch(int(notify.payload))
+        return count
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                if self._db is None:
+                    self.listen()
+                    # Changes made while not listening were missed.
+                    self._dispatch(None)
+                self.poll(self.timeout)
+            except (psycopg2.Error, select.error, OSError):
+                self._disconnect()
+                self._stopping.wait(self.retry)
+
+    def _disconnect(self):
+        if self._db is not None:
+            try:
+                self._db.close()
+            except psycopg2.Error:
+                pass
+            self._db = None
+
+    def start(self):
+        """Starts listening in a background thread."""
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run,
+                                        name='TournamentListener')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stops the background thread and closes its connection."""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._disconnect()
@@ -0,0 +1,319 @@
+#
+# memory_store.py -- tournament storage backend that needs no database
+#
+# Keeps players, tournaments and matches in dicts, with each tournament's
+# standings, opponents and byes indexed the way the queries of
+# tournament.py need them.  Nothing is persisted; meant for tests and events
+# that run in a single process.
+
+import itertools
+import threading
+
+import storage
+
+
+class _Tournament(object):
+    """The state of one tournament."""
+
+    def __init__(self, name):
+        self.name = name
+        # Player id -> [wins, losses, byes, matches], like a row of
+        # tournament_standings.
+        self.standings = {}
+        # Match ids, in the order they were reported.
+        self.matches = []
+        # (winner, loser) pairs already played.
+        self.played = set()
+        # Ids of the players that had a bye.
+        self.byes = set()
+        # Whether each round is closed; round n is at index n - 1.
+        self.rounds = []
+        # Round -> (winner, loser) results played in it.
+        self.round_results = {}
+        # Closed round -> the player_standings rows when it closed.
+        self.snapshots = {}
+
+    def open_round(self):
+        """Returns the number of the open round, or None."""
+        if self.rounds and not self.rounds[-1]:
+            return len(self.rounds)
+        return None
+
+
+class MemoryTournamentStore(storage.TournamentBackend):
+    """Tournament storage in the memory of this process.
+
+    Follows the constraints of the database schema: players and
+    tournaments must exist before they are referenced, a player is
+    registered in a tournament at most once, and players cannot be deleted
+    while matches or tournaments refer to them.  Violations print an error,
+    like the database backends do.  All methods are safe to call from
+    several threads.
+
+    Args:
+        states: An optional `pairing.PairingStates`; see
+            `tournament.TournamentStore`.
+    """
+
+    def __init__(self, states=None):
+        self.states = states
+        self._lock = threading.RLock()
+        self._players = {}
+        self._tournaments = {}
+        # Match id -> (tournament id, winner, loser).
+        self._matches = {}
+        self._player_ids = itertools.count(1)
+        self._tournament_ids = itertools.count(1)
+        self._match_ids = itertools.count(1)
+
+    def _check_players(self, player_ids):
+        for player_id in player_ids:
+            if player_id is not None and player_id not in self._players:
+                raise KeyError("player %s does not exist" % (player_id,))
+
+    def delete_matches(self, tournament_id):
+        """See `tournament.delete_matches`."""
+        with self._lock:
+            t = self._tournaments.get(tournament_id)
+            if t is None:
+                return
+            for m_id in t.matches:
+                del self._matches[m_id]
+            t.matches = []
+            t.played = set()
+            t.byes = set()
+            t.rounds = []
+            t.round_results = {}
+            t.snapshots = {}
+            for row in t.standings.values():
+                row[:] = [0, 0, 0, 0]
+            self._changed(tournament_id)
+
+    def delete_tournament(self, tournament_id):
+        """See `tournament.delete_tournament`."""
+        with self._lock:
+            self.delete_tournament_players(tournament_id)
+            self.delete_matches(tournament_id)
+            self._tournaments.pop(tournament_id, None)
+            self._changed(tournament_id)
+
+    def delete_players(self):
+        """See `tournament.delete_players`."""
+        with self._lock:
+            if self._matches or any(t.standings or t.snapshots for t in
+                                    self._tournaments.values()):
+                print('Error players are still referenced by matches or'
+                      ' tournaments')
+                return
+            self._players.clear()
+            self._changed(None)
+
+    def delete_tournament_players(self, tournament_id):
+        """See `tournament.delete_tournament_players`."""
+        with self._lock:
+            t = self._tournaments.get(tournament_id)
+            if t is not None:
+                t.standings = {}
+                t.snapshots = {}
+                self._changed(tournament_id)
+
+    def count_players(self, tournament_id):
+        """See `tournament.count_players`."""
+        with self._lock:
+            t = self._tournaments.get(tournament_id)
+            return len(t.standings) if t is not None else 0
+
+    def register_player(self, name):
+        """See `tournament.register_player`."""
+        with self._lock:
+            player_id = next(self._player_ids)
+            self._players[player_id] = name
+            return player_id
+
+    def register_players(self, names, tournament_id=None):
+        """See `tournament.register_players`."""
+        names = list(names)
+        with self._lock:
+            if tournament_id is not None and \
+                    tournament_id not in self._tournaments:
+                print('Error tournament %s does not exist' % tournament_id)
+                return None
+            player_ids = [self.register_player(name) for name in names]
+            if tournament_id is not None:
+                standings = self._tournaments[tournament_id].standings
+                for player_id in player_ids:
+                    standings[player_id] = [0, 0, 0, 0]
+                self._changed(tournament_id)
+            return player_ids
+
+    def register_tournament(self, tournament_name):
+        """See `tournament.register_tournament`."""
+        with self._lock:
+            tournament_id = next(self._tournament_ids)
+            self._tournaments[tournament_id] = _Tournament(tournament_name)
+            return tournament_id
+
+    def register_player_in_tournament(self, tournament_id, player_id):
+        """See `tournament.register_player_in_tournament`."""
+        with self._lock:
+            t = self._tournaments.get(tournament_id)
+            if t is None or player_id not in self._players:
+                print('Error tournament %s or player %s does not exist' %
+                      (tournament_id, player_id))
+            elif player_id in t.standings:
+                print('Error player %s is already registered in tournament'
+                      ' %s' % (player_id, tournament_id))
+            else:
+                # Results the player already has in the tournament count.
+                row = [0, 0, 0, 0]
+                for m_id in t.matches:
+                    winner, loser = self._matches[m_id][1:]
+                    if winner == player_id:
+                        row[0] += 1
+                        row[2] += loser is None
+                        row[3] += 1
+                    elif loser == player_id:
+                        row[1] += 1
+                        row[3] += 1
+                t.standings[player_id] = row
+                self._changed(tournament_id)
+
+    def player_standings(self, tournament_id):
+        """See `tournament.player_standings`."""
+        with self._lock:
+            t = self._tournaments.get(tournament_id)
+            if t is None:
+                return []
+            players = self._players
+            rows = [(p_id, players.get(p_id), row[0], row[3])
+                    for p_id, row in t.standings.items()]
+        rows.sort(key=lambda row: (-row[2], row[0]))
+        return rows
+
+    def _report(self, t, tournament_id, winner, loser):
+        m_id = next(self._match_ids)
+        self._matches[m_id] = (tournament_id, winner, loser)
+        t.matches.append(m_id)
+        row = t.standings.get(winner)
+        if row is not None:
+            row[0] += 1
+            row[2] += loser is None
+            row[3] += 1
+        if loser is None:
+            t.byes.add(winner)
+        else:
+            t.played.add((winner, loser))
+            row = t.standings.get(loser)
+            if row is not None:
+                row[1] += 1
+                row[3] += 1
+        round = t.open_round()
+        if round is not None:
+            t.round_results.setdefault(round, []).append((winner, loser))
+        return m_id
+
+    def report_match(self, tournament_id, winner, loser):
+        """See `tournament.report_match`."""
+        self.report_matches(tournament_id, [(winner, loser)])
+
+    def report_matches(self, tournament_id, results):
+        """See `tournament.report_matches`."""
+        results = list(results)
+        with self._lock:
+            t = self._tournaments.get(tournament_id)
+            try:
+                if t is None:
+                    raise KeyError("tournament %s does not exist" %
+                                   (tournament_id,))
+                self._check_players(p for result in results
+                                    for p in result)
+            except KeyError as e:
+                print('Error %s' % e.args[0])
+                return None
+            match_ids = [self._report(t, tournament_id, winner, loser)
+                          for winner, loser in results]
+            # Under the lock, so no pairing state is built in between.
+            self._changed(tournament_id, results)
+            return match_ids
+
+    def match_history(self, tournament_id):
+        """See `tournament.match_history`."""
+        with self._lock:
+            t = self._tournaments.get(tournament_id)
+            return list(t.played) if t is not None else []
+
+    def iter_match_history(self, tournament_id, itersize=None):
+        """See `tournament.iter_match_history`."""
+        with self._lock:
+            t = self._tournaments.get(tournament_id)
+            m_ids = t.matches if t is not None else []
+            return iter([self._matches[m_id][1:] for m_id in m_ids])
+
+    def players_with_bye_games(self, tournament_id):
+        """See `tournament.players_with_bye_games`."""
+        with self._lock:
+            t = self._tournaments.get(tournament_id)
+            return sorted(t.byes) if t is not None else []
+
+    def open_round(self, tournament_id):
+        """See `tournament.open_round`."""
+        with self._lock:
+            t = self._tournaments.get(tournament_id)
+            if t is None:
+                print('Error tournament %s does not exist' % tournament_id)
+            elif t.open_round() is not None:
+                print('Error round %s of tournament %s is still open' %
+                      (t.open_round(), tournament_id))
+            else:
+                t.rounds.append(False)
+                return len(t.rounds)
+
+    def close_round(self, tournament_id):
+        """See `tournament.close_round`."""
+        with self._lock:
+            t = self._tournaments.get(tournament_id)
+            round = t.open_round() if t is not None else None
+            if round is not None:
+                t.rounds[-1] = True
+                t.snapshots[round] = self.player_standings(tournament_id)
+            return round
+
+    def rounds(self, tournament_id):
+        """See `tournament.rounds`."""
+        with self._lock:
+            t = self._tournaments.get(tournament_id)
+            if t is None:
+                return []
+            return [(i + 1, closed) for i, closed in enumerate(t.rounds)]
+
+    def round_results(self, tournament_id, round):
+        """See `tournament.round_results`."""
+        with self._lock:
+            t = self._tournaments.get(tournament_id)
+            if t is None:
+                return []
+            return list(t.round_results.get(round, ()))
+
+    def standings_at(self, tournament_id, round):
+        """See `tournament.standings_at`."""
+        with self._lock:
+            t = self._tournaments.get(tournament_id)
+            if t is None:
+                return []
+            return list(t.snapshots.get(round, ()))
+
+    def pairing_data(self, tournament_id):
+        """See `tournament.pairing_data`."""
+        # Read under the lock, so all three come from the same state.
+        with self._lock:
+            return storage.TournamentBackend.pairing_data(self, tournament_id)
+
+    def ranking_data(self, tournament_id):
+        """See `storage.TournamentBackend.ranking_data`."""
+        with self._lock:
+            t = self._tournaments.get(tournament_id)
+            matches = [self._matches[m_id] for m_id in t.matches] \
+                if t is not None else []
+            return (self.player_standings(tournament_id),
+                    [(winner, loser) for _, winner, loser in matches
+                     if loser is not None])
@@ -0,0 +1,209 @@
+#
+# metrics.py -- opt-in instrumentation of the hot paths of tournament.py
+#
+# Nothing is recorded until `enable()` is called; until then an
+# instrumented call costs one check of `enabled`.  Once enabled, latency
+# histograms are kept of the module-level functions of tournament.py, of
+# every SQL statement, by its name in queries.py, and of checking
+# connections out of the pool, with counters of the rows the statements
+# returned or changed and of the iterations of the pairing loops.
+#
+#     metrics.enable()
+#     tournament.swiss_pairings(7)
+#     print(metrics.to_prometheus())
+
+import bisect
+import functools
+import json
+import threading
+import time
+
+# Seconds; the upper bounds of the histogram buckets, as Prometheus has them.
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+           0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Prefix of the metric names in the Prometheus text format.
+NAMESPACE = "tournament"
+
+# The most precise clock there is; Python 2 only has time.time().
+clock = getattr(time, 'perf_counter', time.time)
+
+enabled = False
+
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+_hooks = []
+
+
+class Histogram(object):
+    """Counts of observed values by bucket, with their number and sum."""
+
+    __slots__ = ('counts', 'count', 'sum')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """Returns (upper bound, count of values up to it) tuples.
+
+        The last bound is infinity, and its count is that of every value.
+        """
+        total = 0
+        result = []
+        for bound, count in zip(BUCKETS + (float('inf'),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+def enable():
+    """Starts recording."""
+    global enabled
+    enabled = True
+
+
+def disable():
+    """Stops recording.  What was recorded is kept until `reset`."""
+    global enabled
+    enabled = False
+
+
+def reset():
+    """Forgets everything recorded so far."""
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def add_hook(hook):
+    """Calls `hook(name, labels, value)` with every value recorded.
+
+    Args:
+        hook: A callable.  labels is a dict, and value the seconds, rows or
+            iterations recorded.  Hooks run in the thread that recorded the
+            value, so they should be quick.
+    """
+    _hooks.append(hook)
+
+
+def remove_hook(hook):
+    """Stops calling a hook added with `add_hook`."""
+    _hooks.remove(hook)
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def observe(name, value, **labels):
+    """Adds a value to the histogram `name` of the given labels."""
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram()
+        histogram.observe(value)
+    for hook in _hooks:
+        hook(name, labels, value)
+
+
+def count(name, value=1, **labels):
+    """Adds a value to the counter `name` of the given labels."""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+    for hook in _hooks:
+        hook(name, labels, value)
+
+
+def timed(func):
+    """Decorator recording the latency of `func` in 'function_seconds'."""
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not enabled:
+            return func(*args, **kwargs)
+        start = clock()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            observe('function_seconds', clock() - start, function=name)
+    return wrapper
+
+
+def snapshot():
+    """Returns everything recorded so far.
+
+    Returns:
+        A dict with a list of 'histograms', each a dict of its 'name',
+        'labels', 'count', 'sum' and cumulative 'buckets' as [upper bound,
+        count] pairs, and a list of 'counters', each a dict of its 'name',
+        'labels' and 'value'.  Both are sorted by name and labels.
+    """
+    with _lock:
+        histograms = [
+            {'name': name, 'labels': dict(labels), 'count': h.count,
+             'sum': h.sum, 'buckets': [list(b) for b in h.cumulative()]}
+            for (name, labels), h in sorted(_histograms.items())]
+        counters = [
+            {'name': name, 'labels': dict(labels), 'value': value}
+            for (name, labels), value in sorted(_counters.items())]
+    return {'histograms': histograms, 'counters': counters}
+
+
+def to_json(indent=None):
+    """Returns `snapshot` as JSON.  The infinite bucket bound is null."""
+    data = snapshot()
+    for histogram in data['histograms']:
+        histogram['buckets'][-1][0] = None
+    return json.dumps(data, indent=indent, sort_keys=True)
+
+
+def _format_labels(labels, extra=()):
+    pairs = sorted(labels.items()) + list(extra)
+    if not pairs:
+        return ''
+    return '{%s}' % ','.join(
+        '%s="%s"' % (k, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+        for k, v in pairs)
+
+
+def _format_bound(bound):
+    return '+Inf' if bound == float('inf') else repr(bound)
+
+
+def to_prometheus():
+    """Returns `snapshot` in the Prometheus text exposition format."""
+    data = snapshot()
+    lines = []
+    typed = set()
+    for h in data['histograms']:
+        name = '%s_%s' % (NAMESPACE, h['name'])
+        if name not in typed:
+            typed.add(name)
+            lines.append('# TYPE %s histogram' % name)
+        for bound, total in h['buckets']:
+            lines.append('%s_bucket%s %d' % (
+                name, _format_labels(h['labels'],
+                                     [('le', _format_bound(bound))]),
+                total))
+        labels = _format_labels(h['labels'])
+        lines.append('%s_sum%s %r' % (name, labels, h['sum']))
+        lines.append('%s_count%s %d' % (name, labels, h['count']))
+    for c in data['counters']:
+        name = '%s_%s' % (NAMESPACE, c['name'])
+        if name not in typed:
+            typed.add(name)
+            lines.append('# TYPE %s counter' % name)
+        lines.append('%s%s %s' % (name, _format_labels(c['labels']),
+                                  c['value']))
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+#
+# Test cases for metrics.py
+# These do not need a database.
+
+from __future__ import print_function
+
+import json
+
+import metrics
+import pairing
+
+
+@metrics.timed
+def work(value):
+    return value * 2
+
+
+def make_data():
+    standings = [(4, "Applejack", 2, 2), (2, "Rarity", 1, 2),
+                 (3, "Spike", 1, 2), (1, "Fluttershy", 0, 2)]
+    history = [(4, 1), (2, 3), (4, 2), (1, 3)]
+    return standings, history, [3]
+
+
+def test_disabled():
+    metrics.disable()
+    metrics.reset()
+    work(1)
+    pairing.pair_players(*make_data())
+    if metrics.snapshot() != {'histograms': [], 'counters': []}:
+        raise ValueError("Nothing should be recorded while disabled.")
+    print("1. Nothing is recorded until metrics are enabled.")
+
+
+def test_histograms():
+    metrics.reset()
+    metrics.enable()
+    try:
+        if work(21) != 42:
+            raise ValueError("Timed functions should return their result.")
+        for seconds in (0.0002, 0.003, 0.003, 20.0):
+            metrics.observe('query_seconds', seconds, query='TEST')
+    finally:
+        metrics.disable()
+    histograms = metrics.snapshot()['histograms']
+    if [(h['name'], h['labels']) for h in histograms] != [
+            ('function_seconds', {'function': 'work'}),
+            ('query_seconds', {'query': 'TEST'})]:
+        raise ValueError("Histograms should be kept by name and labels.")
+    buckets = dict((bound, total) for bound, total in histograms[1]['buckets'])
+    if buckets[0.00025] != 1 or buckets[0.005] != 3 or buckets[10.0] != 3 \
+            or buckets[float('inf')] != 4 or histograms[1]['count'] != 4:
+        raise ValueError("Buckets should count the values up to their"
+                         " bound.")
+    print("2. Latencies are recorded in histograms.")
+
+
+def test_formats():
+    metrics.reset()
+    metrics.enable()
+    try:
+        metrics.observe('query_seconds', 0.001, query='TEST')
+        metrics.count('query_rows_total', 5, query='TEST')
+    finally:
+        metrics.disable()
+    text = metrics.to_prometheus()
+    for line in ('# TYPE tournament_query_seconds histogram',
+                 'tournament_query_seconds_bucket{query="TEST",le="0.001"} 1',
+                 'tournament_query_seconds_bucket{query="TEST",le="+Inf"} 1',
+                 'tournament_query_seconds_count{query="TEST"} 1',
+                 '# TYPE tournament_query_rows_total counter',
+                 'tournament_query_rows_total{query="TEST"} 5'):
+        if line not in text.splitlines():
+            raise ValueError("Prometheus text should have %r." % line)
+    data = json.loads(metrics.to_json())
+    if data['counters'] != [{'name': 'query_rows_total',
+                             'labels': {'query': 'TEST'}, 'value': 5}] or \
+            data['histograms'][0]['buckets'][-1] != [None, 1]:
+        raise ValueError("JSON should hold the snapshot.")
+    print("3. Snapshots are dumped as Prometheus text and JSON.")
+
+
+def test_hooks():
+    seen = []
+
+    def hook(name, labels, value):
+        seen.append((name, labels, value))
+
+    metrics.reset()
+    metrics.add_hook(hook)
+    metrics.enable()
+    try:
+        pairing.pair_players(*make_data())
+    finally:
+        metrics.disable()
+        metrics.remove_hook(hook)
+    # Four players are looked at, and Applejack steps over Rarity.
+    if seen != [('pairing_iterations_total', {'loop': 'greedy'}, 5)]:
+        raise ValueError("Hooks should see the pairing iterations.")
+    print("4. Hooks see the iterations of the pairing loop.")
+
+
+if __name__ == '__main__':
+    test_disabled()
+    test_histograms()
+    test_formats()
+    test_hooks()
+    print("Success!  All tests pass!")
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+#
+# migrate.py -- upgrades an existing tournament database in place
+#
+# Applies the scripts in the migrations folder that are newer than the
+# version recorded in the schema_version table, each in its own
+# transaction.  Databases set up with tournament.sql are already current.
+
+from __future__ import print_function
+
+import argparse
+import os
+import re
+
+import psycopg2
+
+import tournament
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          'migrations')
+
+
+def migrations():
+    """Returns a sorted list of (version, path) tuples of the migrations."""
+    found = []
+    for name in os.listdir(MIGRATIONS):
+        match = re.match(r'(\d+)_.*\.sql$', name)
+        if match:
+            found.append((int(match.group(1)),
+                          os.path.join(MIGRATIONS, name)))
+    return sorted(found)
+
+
+def table_exists(curs, name):
+    curs.execute("SELECT to_regclass(%s) IS NOT NULL;", (name,))
+    return curs.fetchone()[0]
+
+
+def current_version(db):
+    """Returns the schema version of the database.
+
+    Databases created before schema_version existed get the table; their
+    version is worked out from the tables they have.
+    """
+    curs = db.cursor()
+    if not table_exists(curs, 'schema_version'):
+        version = 1 if table_exists(curs, 'tournament_standings') else 0
+        curs.execute("""CREATE TABLE schema_version (version INT NOT NULL);
+                        INSERT INTO schema_version VALUES (%s);""",
+                     (version,))
+        db.commit()
+    curs.execute("SELECT version FROM schema_version;")
+    return curs.fetchone()[0]
+
+
+def migrate(dsn=tournament.DSN):
+    """Upgrades the database to the latest schema version.
+
+    Args:
+        dsn: libpq connection string of the tournament database.
+
+    Returns:
+        version: The schema version the database is at now.
+    """
+    db = psycopg2.connect(dsn)
+    try:
+        version = current_version(db)
+        for number, path in migrations():
+            if number <= version:
+                continue
+            print('Applying %s' % os.path.basename(path))
+            curs = db.cursor()
+            with open(path) as f:
+                curs.execute(f.read())
+            curs.execute("UPDATE schema_version SET version = %s;",
+                         (number,))
+            db.commit()
+            version = number
+        return version
+    except psycopg2.DatabaseError:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Upgrade the schema of a '
+                                     'tournament database.')
+    parser.add_argument('--dsn', default=tournament.DSN,
+                        help='libpq connection string (default: %(default)s)')
+    args = parser.parse_args()
+    print('Schema is at version %s.' % migrate(args.dsn))
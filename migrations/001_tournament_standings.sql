@@ -0,0 +1,34 @@
+-- Adds the tournament_standings table, and fills it with the standings of
+-- the matches played so far.
+
+CREATE TABLE tournament_standings (
+    t_id INT REFERENCES tournament (id),
+    p_id INT REFERENCES player (id),
+    wins INT NOT NULL DEFAULT 0,
+    losses INT NOT NULL DEFAULT 0,
+    byes INT NOT NULL DEFAULT 0,
+    matches INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (t_id, p_id)
+);
+
+CREATE INDEX tournament_standings_by_wins
+    ON tournament_standings (t_id, wins DESC);
+
+INSERT INTO tournament_standings (t_id, p_id, wins, losses, byes, matches)
+    SELECT
+        registered.t_id,
+        registered.p_id,
+        COUNT(CASE WHEN matches.winner_id = registered.p_id THEN 1 END),
+        COUNT(CASE WHEN matches.loser_id = registered.p_id THEN 1 END),
+        COUNT(CASE WHEN matches.winner_id = registered.p_id
+                   AND matches.loser_id IS NULL THEN 1 END),
+        COUNT(matches.id)
+    FROM
+        (SELECT DISTINCT t_id, p_id FROM tournament_players) AS registered
+        LEFT JOIN (SELECT DISTINCT t_id, m_id FROM tournament_matches)
+            AS played
+        ON played.t_id = registered.t_id
+        LEFT JOIN matches
+        ON played.m_id = matches.id
+        AND registered.p_id IN (matches.winner_id, matches.loser_id)
+    GROUP BY registered.t_id, registered.p_id;
@@ -0,0 +1,30 @@
+-- Adds primary keys to the link tables, and the indexes the queries in
+-- tournament.py and the foreign key checks look rows up with.
+
+-- Duplicate links have to go before the primary keys can be added.
+DELETE FROM tournament_players AS a
+    USING tournament_players AS b
+    WHERE a.ctid < b.ctid AND a.t_id = b.t_id AND a.p_id = b.p_id;
+
+DELETE FROM tournament_matches AS a
+    USING tournament_matches AS b
+    WHERE a.ctid < b.ctid AND a.m_id = b.m_id;
+
+ALTER TABLE tournament_matches
+    ADD PRIMARY KEY (t_id, m_id),
+    ADD UNIQUE (m_id);
+
+ALTER TABLE tournament_players
+    ADD PRIMARY KEY (t_id, p_id);
+
+CREATE INDEX tournament_players_p_id ON tournament_players (p_id);
+
+CREATE INDEX matches_winner_id ON matches (winner_id);
+CREATE INDEX matches_loser_id ON matches (loser_id);
+
+-- Covers player_standings, which only needs to read the index.
+DROP INDEX tournament_standings_by_wins;
+CREATE INDEX tournament_standings_by_wins
+    ON tournament_standings (t_id, wins DESC, p_id, matches);
+
+CREATE INDEX tournament_standings_p_id ON tournament_standings (p_id);
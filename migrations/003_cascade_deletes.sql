@@ -0,0 +1,19 @@
+-- Makes the rows of a tournament go with it: deleting a tournament deletes
+-- its links to matches and players, and its standings.  The primary keys
+-- of the three tables start with t_id, so the cascades look rows up by
+-- index.
+
+ALTER TABLE tournament_matches
+    DROP CONSTRAINT tournament_matches_t_id_fkey,
+    ADD CONSTRAINT tournament_matches_t_id_fkey
+        FOREIGN KEY (t_id) REFERENCES tournament (id) ON DELETE CASCADE;
+
+ALTER TABLE tournament_players
+    DROP CONSTRAINT tournament_players_t_id_fkey,
+    ADD CONSTRAINT tournament_players_t_id_fkey
+        FOREIGN KEY (t_id) REFERENCES tournament (id) ON DELETE CASCADE;
+
+ALTER TABLE tournament_standings
+    DROP CONSTRAINT tournament_standings_t_id_fkey,
+    ADD CONSTRAINT tournament_standings_t_id_fkey
+        FOREIGN KEY (t_id) REFERENCES tournament (id) ON DELETE CASCADE;
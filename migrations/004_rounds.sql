@@ -0,0 +1,19 @@
+-- Adds rounds: the tournament_rounds table, and the round of every match
+-- in tournament_matches.  Matches reported before are left without one.
+
+CREATE TABLE tournament_rounds (
+    t_id INT REFERENCES tournament (id) ON DELETE CASCADE,
+    round INT NOT NULL,
+    closed BOOLEAN NOT NULL DEFAULT false,
+    PRIMARY KEY (t_id, round)
+);
+
+CREATE UNIQUE INDEX tournament_rounds_open
+    ON tournament_rounds (t_id) WHERE NOT closed;
+
+ALTER TABLE tournament_matches
+    ADD COLUMN round INT,
+    ADD FOREIGN KEY (t_id, round) REFERENCES tournament_rounds (t_id, round);
+
+CREATE INDEX tournament_matches_by_round
+    ON tournament_matches (t_id, round);
@@ -0,0 +1,18 @@
+-- Adds tournament_round_standings, the standings of a tournament as they
+-- were when each of its rounds closed.  Rounds closed before have none.
+
+CREATE TABLE tournament_round_standings (
+    t_id INT,
+    round INT,
+    p_id INT REFERENCES player (id),
+    wins INT NOT NULL,
+    losses INT NOT NULL,
+    byes INT NOT NULL,
+    matches INT NOT NULL,
+    PRIMARY KEY (t_id, round, p_id),
+    FOREIGN KEY (t_id, round) REFERENCES tournament_rounds (t_id, round)
+        ON DELETE CASCADE
+);
+
+CREATE INDEX tournament_round_standings_p_id
+    ON tournament_round_standings (p_id);
@@ -0,0 +1,582 @@
+#
+# pairing.py -- Swiss pairing engine for tournament.py
+#
+# Pairs the players of a round from data that was already read from the
+# database, so the cost is close to linear in players plus match history.
+
+import bisect
+import contextlib
+import threading
+import time
+
+import metrics
+import records
+
+
+def rematch_index(history):
+    """Returns the `records.pair_key`s of the players that already met.
+
+    Args:
+        history: A `records.MatchHistory`, which is returned as it is, a
+            `PairingState`, whose keys are returned, or an iterable of
+            (id1, id2) tuples, as returned by `tournament.match_history`.
+
+    Returns:
+        A container of keys, supporting `in` and iteration.
+    """
+    if isinstance(history, records.MatchHistory):
+        return history
+    if isinstance(history, PairingState):
+        return history.played
+    return set(records.pair_key(a, b) for a, b in history)
+
+
+def standings_columns(standings):
+    """Returns the ids and the names of the players, in standings order.
+
+    Args:
+        standings: A `records.StandingsTable`, whose columns are returned
+            as they are, or a list of (id, name, wins, matches) tuples.
+    """
+    if isinstance(standings, records.StandingsTable):
+        return standings.ids, standings.names
+    return [row[0] for row in standings], [row[1] for row in standings]
+
+
+def pair_players(standings, history, byes):
+    """Returns the pairings for the next round of a tournament.
+
+    Walking down the standings, every unpaired player is matched with the
+    first player below him or her that is unpaired and not a previous
+    opponent.  Players left without an opponent get a bye, unless they
+    already had one.  This is the same pairing `swiss_pairings` always made.
+
+    Args:
+        standings: A list of (id, name, wins, matches) tuples, sorted by
+            wins, as returned by `tournament.player_standings`, or a
+            `records.StandingsTable`.
+        history: An iterable of (id1, id2) tuples of players that already
+            played each other, or a `records.MatchHistory`.
+        byes: An iterable of ids of players that already had a bye.
+
+    Returns:
+      A list of tuples, each of which contains (id1, name1, id2, name2).
+      For a bye match id2 and name2 are None.
+    """
+    ids, names = standings_columns(standings)
+    played = rematch_index(history)
+    pair_key = records.pair_key
+    n = len(ids)
+
+    # following[i] points at or before the first unpaired player after i.
+    # Paired players are skipped by path compression, so the scan for an
+    # opponent only ever steps over previous opponents.
+    following = list(range(1, n + 2))
+    paired = [False] * n
+
+    def next_unpaired(i):
+        root = i
+        while root < n and paired[root]:
+            root = following[root]
+        while i < root:
+            following[i], i = root, following[i]
+        return root
+
+    pairs = []
+    skipped = 0
+    for i in range(n):
+        if paired[i]:
+            continue
+        player1 = ids[i]
+        j = next_unpaired(i + 1)
+        while j < n and pair_key(player1, ids[j]) in played:
+            j = next_unpaired(j + 1)
+            skipped += 1
+        if j < n:
+            paired[i] = paired[j] = True
+            pairs.append((player1, names[i], ids[j], names[j]))
+
+    # Create a bye game, but only if player does not already have one.
+    had_bye = set(byes)
+    for i in range(n):
+        if not paired[i] and ids[i] not in had_bye:
+            pairs.append((ids[i], names[i], None, None))
+    if metrics.enabled:
+        # Every player is looked at once, and every previous opponent
+        # stepped over once more.
+        metrics.count('pairing_iterations_total', n + skipped,
+                      loop='greedy')
+    return pairs
+
+
+def _blossom_augment(root, neighbours, match, later=None):
+    """Looks for an augmenting path from the exposed vertex `root`.
+
+    This is the search step of Edmonds' blossom algorithm.  Odd cycles are
+    contracted by merging their vertices in a union-find forest rooted at
+    the base of their blossom, so a contraction costs about the size of the
+    cycle rather than of the search.  The search finds a path whatever order
+    the vertices are scanned in, so the ones `later` picks out wait until no
+    others are left.  When a path is found the matching is flipped along it.
+
+    Args:
+        root: Exposed vertex to start from.
+        neighbours: A function returning the vertices adjacent to a vertex,
+            nearest first.
+        match: List holding the mate of every vertex, or -1.  Updated in
+            place.
+        later: A function telling whether to scan a vertex only once no
+            others are queued, for vertices with many neighbours.
+
+    Returns:
+        True when the matching grew by one edge.
+    """
+    parent = {}
+    # Contracted vertex -> vertex it was merged into, up to the base of its
+    # blossom.
+    merged = {}
+    queued = set([root])
+    queue = [root]
+    deferred = []
+
+    def base_of(v):
+        top = v
+        while top in merged:
+            top = merged[top]
+        while v != top:
+            merged[v], v = top, merged[v]
+        return top
+
+    def push(v):
+        queued.add(v)
+        if later is not None and later(v):
+            deferred.append(v)
+        else:
+            queue.append(v)
+
+    def common_ancestor(a, b):
+        seen = set()
+        while True:
+            a = base_of(a)
+            seen.add(a)
+            if match[a] == -1:
+                break
+            a = parent[match[a]]
+        while True:
+            b = base_of(b)
+            if b in seen:
+                return b
+            b = parent[match[b]]
+
+    def mark_path(v, ancestor, child, blossom):
+        while base_of(v) != ancestor:
+            blossom.add(base_of(v))
+            blossom.add(base_of(match[v]))
+            parent[v] = child
+            child = match[v]
+            v = parent[match[v]]
+
+    head = deferred_head = 0
+    while True:
+        if head < len(queue):
+            v = queue[head]
+            head += 1
+        elif deferred_head < len(deferred):
+            v = deferred[deferred_head]
+            deferred_head += 1
+        else:
+            break
+        for to in neighbours(v):
+            if base_of(v) == base_of(to) or match[v] == to:
+                continue
+            if to == root or (match[to] != -1 and match[to] in parent):
+                ancestor = common_ancestor(v, to)
+                blossom = set()
+                mark_path(v, ancestor, to, blossom)
+                mark_path(to, ancestor, v, blossom)
+                # Vertices inside earlier blossoms are already queued; the
+                # others on the cycle are single vertices, queued now.
+                for b in blossom:
+                    top = base_of(b)
+                    if top != ancestor:
+                        merged[top] = ancestor
+                    if b not in queued:
+                        push(b)
+            elif to not in parent:
+                parent[to] = v
+                if match[to] == -1:
+                    while to != -1:
+                        v = parent[to]
+                        next_to = match[v]
+                        match[to] = v
+                        match[v] = to
+                        to = next_to
+                    return True
+                push(match[to])
+    return False
+
+
+def pair_players_optimal(standings, history, byes, window=8):
+    """Returns the pairings for the next round, pairing as many as possible.
+
+    The greedy walk of `pair_players` can dead-end when the last players in
+    the standings only have previous opponents left.  This mode starts from
+    the greedy pairings and repairs them with a maximum matching on the
+    graph of allowed opponents, so everybody is paired whenever that is
+    possible.  On an odd field one extra vertex stands for the bye, and only
+    players without a bye are connected to it.
+
+    Score differences are not weighed.  To keep pairings inside score groups
+    as far as a window can, each player is first only connected with the
+    `window` players on either side of him or her in the standings, nearest
+    first.  The players left over then look further, and everybody else
+    only once they see the whole field, until no more players can be
+    paired, so the result is a maximum matching of the full graph.  A dead
+    end at the bottom of the standings thus only widens the searches of the
+    players in it.
+
+    Args:
+        standings: A list of (id, name, wins, matches) tuples, sorted by
+            wins, as returned by `tournament.player_standings`, or a
+            `records.StandingsTable`.
+        history: An iterable of (id1, id2) tuples of players that already
+            played each other, or a `records.MatchHistory`.
+        byes: An iterable of ids of players that already had a bye.
+        window: Number of neighbours in the standings to start with.
+
+    Returns:
+      A list of tuples, each of which contains (id1, name1, id2, name2).
+      For a bye match id2 and name2 are None.
+    """
+    ids, names = standings_columns(standings)
+    played = rematch_index(history)
+    pair_key = records.pair_key
+    had_bye = set(byes)
+    n = len(ids)
+    bye = n if n % 2 else None
+    match = [-1] * (n + 1)
+    index = dict((player_id, i) for i, player_id in enumerate(ids))
+
+    # Seed with the greedy pairings; they are already close to optimal.
+    for id1, _, id2, _ in pair_players(standings, history, byes):
+        if id2 is not None:
+            match[index[id1]] = index[id2]
+            match[index[id2]] = index[id1]
+        elif bye is not None and match[bye] == -1:
+            match[index[id1]] = bye
+            match[bye] = index[id1]
+
+    # Players that already met everybody and cannot take the bye will never
+    # be paired; searching for them would only scan the whole graph.  Only
+    # opponents still in the standings count.
+    opponents = dict.fromkeys(ids, 0)
+    for key in played:
+        id1, id2 = records.split_key(key)
+        if id1 in opponents and id2 in opponents:
+            opponents[id1] += 1
+            opponents[id2] += 1
+    hopeless = set(i for i in range(n) if opponents[ids[i]] >= n - 1 and
+                   (bye is None or ids[i] in had_bye))
+
+    def exposed():
+        vertices = [i for i in range(n) if match[i] == -1
+                    and i not in hopeless]
+        if bye is not None and match[bye] == -1:
+            vertices.append(bye)
+        return vertices
+
+    # How far each player looks in the standings.  Two players are connected
+    # when either looks far enough to see the other, so widening the reach
+    # of the few left over does not make every search scan more edges.
+    reach = [min(window, n)] * n
+    # Players looking further than the others, by position, who must be
+    # added to the neighbours of the players they see, and how far the
+    # furthest looking of them looks.  Having many neighbours, they are
+    # scanned last in a search.
+    wide = []
+    wide_set = set()
+    furthest = [0]
+
+    def widen(players):
+        """Lets `players` look four times further.
+
+        Players left over usually met each other, as when the bottom of the
+        standings dead-ends, so each also looks past twice as many players
+        as there are left over, and can see enough others to pair with.
+        Once all of them see the whole field, everybody else looks further
+        instead, so the last matching is a maximum matching of the full
+        graph.
+
+        Returns:
+            False when everybody already sees the whole field.
+        """
+        players = [i for i in players if i != bye and reach[i] < n]
+        least = 2 * len(players)
+        if not players:
+            players = [i for i in range(n) if reach[i] < n]
+            if not players:
+                return False
+            least = 0
+        for i in players:
+            reach[i] = min(max(reach[i] * 4, least), n)
+        floor = min(reach)
+        wide[:] = [i for i in range(n) if reach[i] > floor]
+        wide_set.clear()
+        wide_set.update(wide)
+        furthest[0] = max(reach)
+        known.clear()
+        return True
+
+    # Whoever has not had a bye may take it, however far he or she looks.
+    bye_takers = [i for i in range(n - 1, -1, -1) if ids[i] not in had_bye]
+
+    # Vertex -> its neighbours, until somebody looks further.  Searches
+    # from the players left over scan the same players again and again.
+    known = {}
+
+    def neighbours(v):
+        if v == bye:
+            return bye_takers
+        if v in known:
+            return known[v]
+        result = []
+        for distance in range(1, reach[v] + 1):
+            for i in (v - distance, v + distance):
+                if 0 <= i < n and \
+                        pair_key(ids[v], ids[i]) not in played:
+                    result.append(i)
+        seen_by = [i for i in wide[bisect.bisect_left(wide, v - furthest[0]):
+                                   bisect.bisect_right(wide,
+                                                       v + furthest[0])]
+                   if reach[v] < abs(i - v) <= reach[i] and
+                   pair_key(ids[v], ids[i]) not in played]
+        seen_by.sort(key=lambda i: abs(i - v))
+        result.extend(seen_by)
+        if bye is not None and ids[v] not in had_bye:
+            result.append(bye)
+        known[v] = result
+        return result
+
+    def real_neighbours(v):
+        return [i for i in neighbours(v) if i != bye]
+
+    def later(v):
+        return v == bye or v in wide_set
+
+    searches = 0
+    while True:
+        for v in exposed():
+            if match[v] == -1:
+                _blossom_augment(v, neighbours, match, later)
+                searches += 1
+        left = exposed()
+        if len(left) < 2 or not widen(left):
+            break
+
+    # A bye only covers one player.  If the player holding it can be paired
+    # with someone left over instead, the matching stays as large and pairs
+    # one more player.
+    left = [v for v in exposed() if v != bye]
+    if bye is not None and match[bye] != -1 and left:
+        holder = match[bye]
+        match[holder] = match[bye] = -1
+        searches += 1
+        while not _blossom_augment(holder, real_neighbours, match, later):
+            if not widen([holder] + left):
+                match[holder] = bye
+                match[bye] = holder
+                break
+            searches += 1
+
+    pairs = []
+    for i in range(n):
+        j = match[i]
+        if i < j < n:
+            pairs.append((ids[i], names[i], ids[j], names[j]))
+    for i in range(n):
+        if (match[i] == -1 or match[i] == bye) and ids[i] not in had_bye:
+            pairs.append((ids[i], names[i], None, None))
+    if metrics.enabled:
+        metrics.count('pairing_iterations_total', searches,
+                      loop='augmenting_path')
+    return pairs
+
+
+PAIRING_MODES = {
+    'greedy': pair_players,
+    'optimal': pair_players_optimal,
+}
+
+
+def pair_tournament(job):
+    """Pairs one tournament and times it; a unit of work for `pair_all`.
+
+    Kept at module level and taking a single tuple, so a
+    `multiprocessing.Pool` can run it.
+
+    Args:
+        job: A tuple (tournament_id, mode, standings, history, byes).
+
+    Returns:
+      A tuple (tournament_id, pairings, seconds).
+    """
+    tournament_id, mode, standings, history, byes = job
+    start = time.time()
+    pairings = PAIRING_MODES[mode](standings, history, byes)
+    return tournament_id, pairings, time.time() - start
+
+
+class PairingState(object):
+    """What pairing a tournament needs, kept up to date result by result.
+
+    Players are kept in score groups by wins, and the pairs that already
+    met in a set of `records.pair_key`s, so reporting a result costs the
+    same however long the tournament has been running.  Pairing the next
+    round sorts the players, and does not read the match history again.
+
+    Args:
+        standings: (id, name, wins, matches) tuples, or a
+            `records.StandingsTable`.
+        history: (id1, id2) tuples of players that already played each
+            other, or a `records.MatchHistory`.
+        byes: Ids of players that already had a bye.
+    """
+
+    def __init__(self, standings=(), history=(), byes=()):
+        self.names = {}
+        self.wins = {}
+        self.matches = {}
+        # Wins -> ids of the players with that many wins.
+        self.groups = {}
+        self.played = set(rematch_index(history))
+        self.byes = set(byes)
+        for player_id, name, wins, matches in standings:
+            self.add_player(player_id, name, wins, matches)
+
+    def add_player(self, player_id, name, wins=0, matches=0):
+        """Adds a player to the standings."""
+        self.names[player_id] = name
+        self.wins[player_id] = wins
+        self.matches[player_id] = matches
+        self.groups.setdefault(wins, set()).add(player_id)
+
+    def report(self, winner, loser=None):
+        """Applies the result of a match; loser is None for a bye.
+
+        Like the standings of the database, only players in the standings
+        are counted, but the pair is remembered either way.
+        """
+        if winner in self.wins:
+            wins = self.wins[winner]
+            group = self.groups[wins]
+            group.discard(winner)
+            if not group:
+                del self.groups[wins]
+            self.wins[winner] = wins + 1
+            self.groups.setdefault(wins + 1, set()).add(winner)
+            self.matches[winner] += 1
+        if loser is None:
+            self.byes.add(winner)
+        else:
+            self.played.add(records.pair_key(winner, loser))
+            if loser in self.matches:
+                self.matches[loser] += 1
+
+    def standings(self):
+        """Returns (id, name, wins, matches) tuples in standings order."""
+        rows = []
+        for wins in sorted(self.groups, reverse=True):
+            for player_id in sorted(self.groups[wins]):
+                rows.append((player_id, self.names[player_id], wins,
+                             self.matches[player_id]))
+        return rows
+
+    def pairings(self, mode="greedy"):
+        """Returns the pairings of the next round; see `PAIRING_MODES`."""
+        return PAIRING_MODES[mode](self.standings(), self, self.byes)
+
+
+class PairingStates(object):
+    """The `PairingState`s of several tournaments, kept by a store.
+
+    A store given one builds the state of a tournament the first time it
+    pairs it, applies the results it reports from then on, and drops the
+    state on any other change.  Call `invalidate` from a
+    `listener.TournamentListener` when other processes write too.  All
+    methods are safe to call from several threads.
+    """
+
+    def __init__(self):
+        self._states = {}
+        # Tournament id -> number of writes reporting results under way.
+        self._reporting = {}
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def version(self):
+        """Returns a token to pass to `put`; see `cache.TournamentCache`."""
+        return self._version
+
+    def get(self, tournament_id):
+        """Returns (state, lock) of a tournament, or None.
+
+        Hold the lock while using the state.
+        """
+        with self._lock:
+            return self._states.get(tournament_id)
+
+    def put(self, tournament_id, state, version):
+        """Keeps the state of a tournament.
+
+        The state is not kept if the tournament changed since `version`
+        was taken, or results are being reported to it, since it may then
+        miss results or be about to get them twice.
+
+        Returns:
+            What `get` returns from then on, or None.
+        """
+        with self._lock:
+            if version != self._version or \
+                    self._reporting.get(tournament_id):
+                return None
+            entry = self._states[tournament_id] = (state, threading.Lock())
+            return entry
+
+    @contextlib.contextmanager
+    def reporting(self, tournament_id):
+        """Brackets a write that reports results to a tournament.
+
+        Wrap the transaction, and call `report` once it is committed.
+        """
+        with self._lock:
+            self._version += 1
+            self._reporting[tournament_id] = \
+                self._reporting.get(tournament_id, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._version += 1
+                self._reporting[tournament_id] -= 1
+                if not self._reporting[tournament_id]:
+                    del self._reporting[tournament_id]
+
+    def report(self, tournament_id, results):
+        """Applies (winner, loser) results to the state of a tournament."""
+        with self._lock:
+            self._version += 1
+            entry = self._states.get(tournament_id)
+        if entry is not None:
+            state, lock = entry
+            with lock:
+                for winner, loser in results:
+                    state.report(winner, loser)
+
+    def invalidate(self, tournament_id=None):
+        """Drops the state of a tournament, or of every one if None."""
+        with self._lock:
+            self._version += 1
+            if tournament_id is None:
+                self._states.clear()
+            else:
+                self._states.pop(tournament_id, None)
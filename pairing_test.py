@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+#
+# Test cases for pairing.py
+# These do not need a database.
+
+from __future__ import print_function
+
+import random
+
+from pairing import *
+
+
+def legacy_pair_players(standings, history, byes):
+    """The nested loop `swiss_pairings` used before the pairing engine."""
+    temp_pairing = []
+    ids = [x[0] for x in standings]
+    for player1 in ids:
+        for player2 in ids:
+            p2_picked = [z for z in temp_pairing
+                         if z[0] == player2 or z[1] == player2]
+            p1_picked = [z for z in temp_pairing
+                         if z[0] == player1 or z[1] == player1]
+            if p2_picked or p1_picked or player1 == player2 \
+                    or (player1, player2) in history \
+                    or (player2, player1) in history:
+                continue
+            temp_pairing.append((player1, player2))
+    temp_paired_players = set([x for t in temp_pairing for x in t])
+    for x in ids:
+        if x not in temp_paired_players and x not in byes:
+            temp_pairing.append((x, None))
+    names = dict((x[0], x[1]) for x in standings)
+    return [(p1, names[p1], p2, names.get(p2)) for p1, p2 in temp_pairing]
+
+
+def make_standings(count):
+    return [(i, "Player %d" % i, 0, 0) for i in range(1, count + 1)]
+
+
+def test_pairs_adjacent_players():
+    standings = make_standings(4)
+    pairs = pair_players(standings, [], [])
+    if pairs != [(1, "Player 1", 2, "Player 2"),
+                 (3, "Player 3", 4, "Player 4")]:
+        raise ValueError("Players next to each other should be paired.")
+    print("1. Adjacent players in the standings are paired.")
+
+
+def test_prevents_rematches():
+    standings = make_standings(4)
+    pairs = pair_players(standings, [(1, 2), (3, 4)], [])
+    actual = set(frozenset([p[0], p[2]]) for p in pairs)
+    if actual != set([frozenset([1, 3]), frozenset([2, 4])]):
+        raise ValueError("Players should not be paired twice.")
+    print("2. Previous opponents are not paired again.")
+
+
+def test_bye():
+    standings = make_standings(3)
+    pairs = pair_players(standings, [], [])
+    if pairs[-1] != (3, "Player 3", None, None):
+        raise ValueError("The unpaired player should get a bye.")
+    pairs = pair_players(standings, [], [3])
+    if len(pairs) != 1:
+        raise ValueError("A player should only get one bye.")
+    print("3. An unpaired player gets a single bye.")
+
+
+def test_matches_legacy_pairings():
+    rng = random.Random(1)
+    for count in (2, 5, 8, 13, 20):
+        standings = make_standings(count)
+        for _ in range(20):
+            rng.shuffle(standings)
+            history = [tuple(rng.sample(range(1, count + 1), 2))
+                       for _ in range(rng.randint(0, count * 2))]
+            byes = rng.sample(range(1, count + 1), rng.randint(0, 2))
+            expected = legacy_pair_players(standings, history, byes)
+            if pair_players(standings, history, byes) != expected:
+                raise ValueError("Pairings differ from the original loop.")
+    print("4. Pairings are the same as the original pairing loop.")
+
+
+def test_optimal_pairs_everybody():
+    standings = make_standings(4)
+    history = [(3, 4)]
+    greedy = pair_players(standings, history, [])
+    if (3, "Player 3", None, None) not in greedy:
+        raise ValueError("The greedy pairing should dead-end on player 3.")
+    pairs = pair_players_optimal(standings, history, [])
+    if len(pairs) != 2 or None in [p[2] for p in pairs]:
+        raise ValueError("Optimal pairing should pair every player.")
+    if (3, "Player 3", 4, "Player 4") in pairs:
+        raise ValueError("Players should not be paired twice.")
+    print("5. Optimal pairing pairs players the greedy walk leaves over.")
+
+
+def test_optimal_keeps_greedy_pairings():
+    rng = random.Random(2)
+    standings = make_standings(31)
+    history = [(i, i + 1) for i in range(1, 31, 2)]
+    rng.shuffle(standings)
+    pairs = pair_players_optimal(standings, history, [])
+    if pairs != pair_players(standings, history, []):
+        raise ValueError("Pairings that need no repair should not change.")
+    print("6. Optimal pairing keeps greedy pairings that pair everybody.")
+
+
+def test_optimal_ignores_opponents_outside():
+    standings = [row for i in (1, 3, 2, 4) for row in make_standings(4)
+                 if row[0] == i]
+    # Players 2 and 4 met three players each, but players 5 and 6 are not
+    # in the standings.
+    history = [(2, 4), (2, 5), (2, 6), (4, 1), (4, 5)]
+    pairs = pair_players_optimal(standings, history, [])
+    if len(pairs) != 2 or None in [p[2] for p in pairs]:
+        raise ValueError("Opponents outside the standings should not keep"
+                         " a player from being paired.")
+    print("9. Only opponents in the standings count towards meeting"
+          " everybody.")
+
+
+def test_incremental_state():
+    rng = random.Random(3)
+    for mode in sorted(PAIRING_MODES):
+        state = PairingState(make_standings(21))
+        wins = dict.fromkeys(range(1, 22), 0)
+        history = []
+        byes = []
+        for _ in range(6):
+            standings = sorted(((i, "Player %d" % i, wins[i], 0)
+                                for i in wins),
+                               key=lambda row: (-row[2], row[0]))
+            pairs = state.pairings(mode)
+            if pairs != PAIRING_MODES[mode](standings, history, byes):
+                raise ValueError("Pairing from the state should pair like"
+                                 " pairing from scratch.")
+            for id1, _, id2, _ in pairs:
+                if id2 is None:
+                    winner, loser = id1, None
+                    byes.append(id1)
+                else:
+                    winner, loser = rng.choice([(id1, id2), (id2, id1)])
+                    history.append((winner, loser))
+                wins[winner] += 1
+                state.report(winner, loser)
+    print("7. Pairing states apply results and pair like from scratch.")
+
+
+def test_states_skip_stale_builds():
+    states = PairingStates()
+    version = states.version()
+    states.report(1, [(1, 2)])
+    if states.put(1, PairingState(), version) is not None:
+        raise ValueError("A state read before a result should be dropped.")
+    with states.reporting(1):
+        if states.put(1, PairingState(), states.version()) is not None:
+            raise ValueError("A state read while reporting should be"
+                             " dropped.")
+    state = PairingState(make_standings(2))
+    states.put(1, state, states.version())
+    states.report(1, [(1, 2)])
+    if states.get(1)[0].standings()[0] != (1, "Player 1", 1, 1):
+        raise ValueError("Results should be applied to the kept state.")
+    print("8. Pairing states are only kept when they are current.")
+
+
+if __name__ == '__main__':
+    test_pairs_adjacent_players()
+    test_prevents_rematches()
+    test_bye()
+    test_matches_legacy_pairings()
+    test_optimal_pairs_everybody()
+    test_optimal_keeps_greedy_pairings()
+    test_incremental_state()
+    test_states_skip_stale_builds()
+    test_optimal_ignores_opponents_outside()
+    print("Success!  All tests pass!")
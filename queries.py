@@ -0,0 +1,545 @@
+#
+# queries.py -- SQL statements of the tournament project
+#
+# Shared by tournament.py and its asyncio counterpart, async_tournament.py,
+# so both run exactly the same queries.  Statements use psycopg2's %s and
+# %(name)s placeholders.
+
+DELETE_MATCHES = """
+    DELETE FROM matches WHERE id in (
+        SELECT
+            m_id
+        FROM
+            tournament_matches
+        WHERE
+            t_id = %(t_id)s);
+    DELETE FROM tournament_rounds WHERE t_id = %(t_id)s;
+    UPDATE
+        tournament_standings
+    SET
+        wins = 0, losses = 0, byes = 0, matches = 0
+    WHERE
+        t_id = %(t_id)s;
+    """
+
+# One transaction, whatever the size of the tournament: the matches go by
+# the index on tournament_matches, and deleting the tournament cascades to
+# its links, players and standings; see tournament.sql.
+DELETE_TOURNAMENT = """
+    DELETE FROM matches WHERE id in (
+        SELECT
+            m_id
+        FROM
+            tournament_matches
+        WHERE
+            t_id = %(t_id)s);
+    DELETE FROM tournament WHERE id = %(t_id)s;
+    """
+
+DELETE_PLAYERS = "DELETE FROM player;"
+
+DELETE_TOURNAMENT_PLAYERS = """
+    DELETE FROM tournament_round_standings WHERE t_id = %(t_id)s;
+    DELETE FROM tournament_standings WHERE t_id = %(t_id)s;
+    DELETE FROM tournament_players WHERE t_id = %(t_id)s;
+    """
+
+COUNT_PLAYERS = """
+    SELECT
+        COALESCE(count(p_id),0)
+    FROM
+        tournament_players
+    WHERE t_id=%s"""
+
+REGISTER_PLAYER = """
+    INSERT INTO player VALUES(DEFAULT,%s);
+    SELECT currval('player_id_seq');"""
+
+# Reserving ids up front lets bulk inserts return them in input order.
+RESERVE_PLAYER_IDS = """
+    SELECT
+        nextval('player_id_seq')
+    FROM
+        generate_series(1, %s);"""
+
+INSERT_PLAYERS = """
+    INSERT INTO
+        player(id, fullname)
+        SELECT * FROM unnest(%(ids)s::int[],
+                             %(names)s::text[]);
+    """
+
+ENROLL_PLAYERS = """
+    INSERT INTO
+        tournament_players
+        SELECT %(t_id)s, unnest(%(ids)s::int[]);
+    INSERT INTO
+        tournament_standings(t_id, p_id)
+        SELECT %(t_id)s, unnest(%(ids)s::int[]);
+    """
+
+REGISTER_TOURNAMENT = """
+    INSERT INTO tournament(name) VALUES(%s);
+    SELECT currval('tournament_id_seq');"""
+
+# The standings row counts the results the player already has in the
+# tournament, found by the indexes on matches.winner_id and loser_id.
+REGISTER_PLAYER_IN_TOURNAMENT = """
+    INSERT INTO tournament_players VALUES(%(t_id)s,%(p_id)s);
+    INSERT INTO
+        tournament_standings(t_id, p_id, wins, losses, byes, matches)
+        SELECT
+            %(t_id)s,
+            %(p_id)s,
+            COUNT(CASE WHEN matches.winner_id = %(p_id)s THEN 1 END),
+            COUNT(CASE WHEN matches.loser_id = %(p_id)s THEN 1 END),
+            COUNT(CASE WHEN matches.winner_id = %(p_id)s
+                       AND matches.loser_id IS NULL THEN 1 END),
+            COUNT(matches.id)
+        FROM
+            matches JOIN tournament_matches
+            ON tournament_matches.m_id = matches.id
+        WHERE
+            tournament_matches.t_id = %(t_id)s
+            AND %(p_id)s IN (matches.winner_id, matches.loser_id);"""
+
+PLAYER_STANDINGS = """
+    SELECT
+        tournament_standings.p_id,
+        player.fullname,
+        tournament_standings.wins,
+        tournament_standings.matches
+    FROM
+        tournament_standings LEFT JOIN player
+        ON tournament_standings.p_id = player.id
+    WHERE
+        tournament_standings.t_id = %s
+    ORDER BY wins DESC, p_id;"""
+
+REPORT_MATCH = """
+    INSERT INTO
+        matches
+        VALUES(DEFAULT,%(winner)s,%(loser)s);
+    INSERT INTO
+        tournament_matches(t_id, m_id, round)
+        VALUES(%(t_id)s,
+               (SELECT currval('matches_id_seq')),
+               (SELECT round FROM tournament_rounds
+                WHERE t_id = %(t_id)s AND NOT closed)
+               );
+    UPDATE
+        tournament_standings
+    SET
+        wins = wins + 1,
+        byes = byes + (%(loser)s IS NULL)::int,
+        matches = matches + 1
+    WHERE
+        t_id = %(t_id)s AND p_id = %(winner)s;
+    UPDATE
+        tournament_standings
+    SET
+        losses = losses + 1,
+        matches = matches + 1
+    WHERE
+        t_id = %(t_id)s AND p_id = %(loser)s;
+    """
+
+RESERVE_MATCH_IDS = """
+    SELECT
+        nextval('matches_id_seq')
+    FROM
+        generate_series(1, %s);"""
+
+REPORT_MATCHES = """
+    INSERT INTO
+        matches(id, winner_id, loser_id)
+        SELECT * FROM unnest(%(ids)s::int[],
+                             %(winners)s::int[],
+                             %(losers)s::int[]);
+    INSERT INTO
+        tournament_matches(t_id, m_id, round)
+        SELECT %(t_id)s, unnest(%(ids)s::int[]),
+               (SELECT round FROM tournament_rounds
+                WHERE t_id = %(t_id)s AND NOT closed);
+    UPDATE
+        tournament_standings
+    SET
+        wins = tournament_standings.wins + delta.wins,
+        losses = tournament_standings.losses + delta.losses,
+        byes = tournament_standings.byes + delta.byes,
+        matches = tournament_standings.matches + delta.matches
+    FROM
+        unnest(%(players)s::int[], %(wins)s::int[],
+               %(losses)s::int[], %(byes)s::int[],
+               %(matches)s::int[])
+        AS delta(p_id, wins, losses, byes, matches)
+    WHERE
+        t_id = %(t_id)s
+        AND tournament_standings.p_id = delta.p_id;
+    """
+
+# Every match with byes and repeats, for iter_match_history.  Ordered by
+# the primary key of tournament_matches, so a server-side cursor gets its
+# first rows without sorting the whole history.
+ALL_MATCHES = """
+    SELECT
+        matches.winner_id,
+        matches.loser_id
+    FROM
+        tournament_matches JOIN matches
+        ON tournament_matches.m_id = matches.id
+    WHERE
+        tournament_matches.t_id = %s
+    ORDER BY tournament_matches.m_id;"""
+
+MATCH_HISTORY = """
+    SELECT DISTINCT
+        winner_id,
+        loser_id
+    FROM
+        tournament_matches LEFT JOIN matches
+        ON tournament_matches.m_id = matches.id
+    WHERE
+        loser_id is not null
+        and tournament_matches.t_id = %s;
+    """
+
+PLAYERS_WITH_BYE_GAMES = """
+    SELECT DISTINCT
+        winner_id
+    FROM
+        tournament_matches LEFT JOIN matches
+        ON tournament_matches.m_id = matches.id
+    WHERE
+        loser_id is null
+        AND tournament_matches.t_id = %s;
+    """
+
+# Standings, previous opponents and bye holders in one round trip.  Rows
+# are told apart by `kind`; see `split_pairing_data`.
+PAIRING_DATA = """
+    WITH played AS (
+        SELECT
+            winner_id,
+            loser_id
+        FROM
+            tournament_matches JOIN matches
+            ON tournament_matches.m_id = matches.id
+        WHERE
+            tournament_matches.t_id = %(t_id)s)
+    SELECT
+        'standing' AS kind,
+        tournament_standings.p_id AS id1,
+        NULL::int AS id2,
+        player.fullname,
+        tournament_standings.wins,
+        tournament_standings.matches
+    FROM
+        tournament_standings LEFT JOIN player
+        ON tournament_standings.p_id = player.id
+    WHERE
+        tournament_standings.t_id = %(t_id)s
+    UNION ALL
+    SELECT DISTINCT
+        'match',
+        LEAST(winner_id, loser_id),
+        GREATEST(winner_id, loser_id),
+        NULL::text, NULL::int, NULL::int
+    FROM
+        played
+    WHERE
+        loser_id IS NOT NULL
+    UNION ALL
+    SELECT DISTINCT
+        'bye', winner_id,
+        NULL::int, NULL::text, NULL::int, NULL::int
+    FROM
+        played
+    WHERE
+        loser_id IS NULL
+    ORDER BY kind, wins DESC, id1;"""
+
+# Standings and every match result, winner first, in one round trip.  Rows
+# have the layout of PAIRING_DATA, so `split_pairing_data` splits them.
+RANKING_DATA = """
+    SELECT
+        'standing' AS kind,
+        tournament_standings.p_id AS id1,
+        NULL::int AS id2,
+        player.fullname,
+        tournament_standings.wins,
+        tournament_standings.matches
+    FROM
+        tournament_standings LEFT JOIN player
+        ON tournament_standings.p_id = player.id
+    WHERE
+        tournament_standings.t_id = %(t_id)s
+    UNION ALL
+    SELECT
+        'match', winner_id, loser_id,
+        NULL::text, NULL::int, NULL::int
+    FROM
+        tournament_matches JOIN matches
+        ON tournament_matches.m_id = matches.id
+    WHERE
+        tournament_matches.t_id = %(t_id)s
+        AND loser_id IS NOT NULL;"""
+
+# PAIRING_DATA for a list of tournaments, told apart by the leading t_id.
+PAIRING_DATA_MANY = """
+    WITH played AS (
+        SELECT
+            tournament_matches.t_id,
+            winner_id,
+            loser_id
+        FROM
+            tournament_matches JOIN matches
+            ON tournament_matches.m_id = matches.id
+        WHERE
+            tournament_matches.t_id = ANY(%(t_ids)s))
+    SELECT
+        tournament_standings.t_id,
+        'standing' AS kind,
+        tournament_standings.p_id AS id1,
+        NULL::int AS id2,
+        player.fullname,
+        tournament_standings.wins,
+        tournament_standings.matches
+    FROM
+        tournament_standings LEFT JOIN player
+        ON tournament_standings.p_id = player.id
+    WHERE
+        tournament_standings.t_id = ANY(%(t_ids)s)
+    UNION ALL
+    SELECT DISTINCT
+        t_id,
+        'match',
+        LEAST(winner_id, loser_id),
+        GREATEST(winner_id, loser_id),
+        NULL::text, NULL::int, NULL::int
+    FROM
+        played
+    WHERE
+        loser_id IS NOT NULL
+    UNION ALL
+    SELECT DISTINCT
+        t_id, 'bye', winner_id,
+        NULL::int, NULL::text, NULL::int, NULL::int
+    FROM
+        played
+    WHERE
+        loser_id IS NULL
+    ORDER BY t_id, kind, wins DESC, id1;"""
+
+# Inserts nothing while a round is open.  Two opening a round at once can
+# both get past the check, and then the unique index tournament_rounds_open
+# fails the second.
+OPEN_ROUND = """
+    INSERT INTO
+        tournament_rounds(t_id, round)
+        SELECT %(t_id)s, COALESCE(max(round), 0) + 1
+        FROM tournament_rounds
+        WHERE t_id = %(t_id)s
+        HAVING NOT EXISTS (
+            SELECT 1
+            FROM tournament_rounds
+            WHERE t_id = %(t_id)s AND NOT closed)
+    RETURNING round;"""
+
+# Closing a round snapshots the standings into tournament_round_standings.
+CLOSE_ROUND = """
+    WITH closed AS (
+        UPDATE
+            tournament_rounds
+        SET
+            closed = true
+        WHERE
+            t_id = %(t_id)s AND NOT closed
+        RETURNING t_id, round),
+    snapshot AS (
+        INSERT INTO
+            tournament_round_standings
+            SELECT
+                closed.t_id, closed.round, p_id, wins, losses, byes, matches
+            FROM
+                closed JOIN tournament_standings
+                ON tournament_standings.t_id = closed.t_id)
+    SELECT round FROM closed;"""
+
+CURRENT_ROUND = """
+    SELECT
+        round
+    FROM
+        tournament_rounds
+    WHERE
+        t_id = %s AND NOT closed;"""
+
+ROUNDS = """
+    SELECT
+        round,
+        closed
+    FROM
+        tournament_rounds
+    WHERE
+        t_id = %s
+    ORDER BY round;"""
+
+ROUND_RESULTS = """
+    SELECT
+        winner_id,
+        loser_id
+    FROM
+        tournament_matches JOIN matches
+        ON tournament_matches.m_id = matches.id
+    WHERE
+        tournament_matches.t_id = %(t_id)s
+        AND tournament_matches.round = %(round)s
+    ORDER BY m_id;"""
+
+# The standings when a round closed, ordered like PLAYER_STANDINGS.
+STANDINGS_AT = """
+    SELECT
+        tournament_round_standings.p_id,
+        player.fullname,
+        tournament_round_standings.wins,
+        tournament_round_standings.matches
+    FROM
+        tournament_round_standings LEFT JOIN player
+        ON tournament_round_standings.p_id = player.id
+    WHERE
+        tournament_round_standings.t_id = %(t_id)s
+        AND tournament_round_standings.round = %(round)s
+    ORDER BY wins DESC, p_id;"""
+
+# Registered players without a match, or a bye, in a round.
+UNPAIRED_PLAYERS = """
+    WITH played AS (
+        SELECT
+            winner_id,
+            loser_id
+        FROM
+            tournament_matches JOIN matches
+            ON tournament_matches.m_id = matches.id
+        WHERE
+            tournament_matches.t_id = %(t_id)s
+            AND tournament_matches.round = %(round)s)
+    SELECT
+        p_id
+    FROM
+        tournament_players
+    WHERE
+        t_id = %(t_id)s
+        AND p_id NOT IN (
+            SELECT winner_id FROM played
+            UNION ALL
+            SELECT loser_id FROM played WHERE loser_id IS NOT NULL)
+    ORDER BY p_id;"""
+
+NOTIFY = "SELECT pg_notify(%s, %s);"
+
+# Where the primary's write-ahead log ends, after a commit.
+CURRENT_LSN = "SELECT pg_current_wal_lsn()::text;"
+
+# How far a replica has replayed the primary's log; NULL on a primary.
+REPLAY_LSN = "SELECT pg_last_wal_replay_lsn()::text;"
+
+
+def report_matches_params(tournament_id, match_ids, results):
+    """Returns the parameters of REPORT_MATCHES.
+
+    The standings changes of every player are tallied, so each standings
+    row is updated once however many matches the player has in the batch.
+
+    Args:
+        tournament_id: The tournament id to log the match results to.
+        match_ids: Ids reserved with RESERVE_MATCH_IDS, one per result.
+        results: A list of (winner, loser) tuples; loser is None for a bye.
+    """
+    deltas = {}
+    for winner, loser in results:
+        delta = deltas.setdefault(winner, [0, 0, 0, 0])
+        delta[0] += 1
+        delta[2] += loser is None
+        delta[3] += 1
+        if loser is not None:
+            delta = deltas.setdefault(loser, [0, 0, 0, 0])
+            delta[1] += 1
+            delta[3] += 1
+    players = list(deltas)
+    return {'t_id': tournament_id,
+            'ids': match_ids,
+            'winners': [r[0] for r in results],
+            'losers': [r[1] for r in results],
+            'players': players,
+            'wins': [deltas[p][0] for p in players],
+            'losses': [deltas[p][1] for p in players],
+            'byes': [deltas[p][2] for p in players],
+            'matches': [deltas[p][3] for p in players]}
+
+
+def split_pairing_data(rows):
+    """Splits the rows of PAIRING_DATA into (standings, history, byes)."""
+    standings = []
+    history = []
+    byes = []
+    for kind, id1, id2, name, wins, matches in rows:
+        if kind == 'standing':
+            standings.append((id1, name, wins, matches))
+        elif kind == 'match':
+            history.append((id1, id2))
+        else:
+            byes.append(id1)
+    return standings, history, byes
+
+
+def split_pairing_data_many(tournament_ids, rows):
+    """Splits the rows of PAIRING_DATA_MANY into a dict by tournament id.
+
+    Every id of `tournament_ids` gets an entry, like `split_pairing_data`
+    returns for a tournament without players.
+    """
+    by_tournament = dict((t_id, []) for t_id in tournament_ids)
+    for row in rows:
+        by_tournament[row[0]].append(row[1:])
+    return dict((t_id, split_pairing_data(part))
+                for t_id, part in by_tournament.items())
+
+
+def parse_lsn(text):
+    """Returns a log sequence number like '16/B374D848' as an int.
+
+    None, which REPLAY_LSN returns on a server that is not a replica, is
+    returned as None.
+    """
+    if text is None:
+        return None
+    high, low = text.split('/')
+    return (int(high, 16) << 32) | int(low, 16)
+
+
+_statement_names = {}
+
+
+def statement_name(sql):
+    """Returns the name of a statement of this module, for metrics.
+
+    Statements run one after the other in a single string, like
+    INSERT_PLAYERS + ENROLL_PLAYERS, get their names joined with '+'.  Any
+    other SQL is named 'other'.
+    """
+    if not _statement_names:
+        for key, value in list(globals().items()):
+            if key.isupper() and isinstance(value, str):
+                _statement_names[value] = key
+    name = _statement_names.get(sql)
+    if name is not None:
+        return name
+    for value, key in list(_statement_names.items()):
+        if len(value) < len(sql) and sql.startswith(value):
+            rest = statement_name(sql[len(value):])
+            if rest != 'other':
+                # Only names made of statements are kept, so arbitrary SQL
+                # does not grow the table.
+                _statement_names[sql] = name = key + '+' + rest
+                return name
+    return 'other'
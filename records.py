@@ -0,0 +1,165 @@
+#
+# records.py -- compact representations of tournament data
+#
+# Standings and match histories of large tournaments kept as typed columns
+# in `array`s rather than lists of tuples, which takes a fraction of the
+# memory per player and per match.  The pairing engine runs on them
+# directly, and the cache of tournament.py keeps them.
+
+import array
+import bisect
+
+# Ids and scores fit the 32 bit integer columns of the database.
+ID_TYPECODE = 'i'
+
+# A pair of ids is packed into one 64 bit key; see `pair_key`.  Python 2
+# has no 'q', and its 'l' is 64 bits on 64 bit platforms but Windows.  With
+# neither, None: the keys are kept in a list.
+KEY_TYPECODE = None
+for _typecode in ('q', 'l'):
+    try:
+        if array.array(_typecode).itemsize >= 8:
+            KEY_TYPECODE = _typecode
+            break
+    except ValueError:
+        pass
+
+
+def pair_key(id1, id2):
+    """Returns one integer standing for the unordered pair of two ids."""
+    if id1 > id2:
+        id1, id2 = id2, id1
+    return (id1 << 32) | id2
+
+
+def split_key(key):
+    """Returns the (lower id, higher id) tuple packed by `pair_key`."""
+    return key >> 32, key & 0xffffffff
+
+
+class _Slotted(object):
+    """Pickles the __slots__ of subclasses, which Python 2 cannot do."""
+    __slots__ = ()
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+
+class Standing(_Slotted):
+    """One row of the standings, as returned by `StandingsTable`."""
+    __slots__ = ('id', 'name', 'wins', 'matches')
+
+    def __init__(self, player_id, name, wins, matches):
+        self.id = player_id
+        self.name = name
+        self.wins = wins
+        self.matches = matches
+
+    def __iter__(self):
+        return iter((self.id, self.name, self.wins, self.matches))
+
+    def __repr__(self):
+        return 'Standing(%r, %r, %r, %r)' % tuple(self)
+
+
+class StandingsTable(_Slotted):
+    """Standings kept column by column, in standings order.
+
+    Args:
+        rows: (id, name, wins, matches) tuples, as returned by
+            `tournament.player_standings`.
+    """
+    __slots__ = ('ids', 'names', 'wins', 'matches', '_index')
+
+    def __init__(self, rows=()):
+        self.ids = array.array(ID_TYPECODE)
+        self.names = []
+        self.wins = array.array(ID_TYPECODE)
+        self.matches = array.array(ID_TYPECODE)
+        self._index = None
+        for player_id, name, wins, matches in rows:
+            self.ids.append(player_id)
+            self.names.append(name)
+            self.wins.append(wins)
+            self.matches.append(matches)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, i):
+        return Standing(self.ids[i], self.names[i], self.wins[i],
+                        self.matches[i])
+
+    def __iter__(self):
+        for i in range(len(self.ids)):
+            yield self[i]
+
+    def rows(self):
+        """Returns the standings as a list of (id, name, wins, matches)."""
+        return list(zip(self.ids, self.names, self.wins, self.matches))
+
+    def index(self, player_id):
+        """Returns the row of a player; the map is built on first use."""
+        if self._index is None:
+            self._index = dict((player_id, i)
+                               for i, player_id in enumerate(self.ids))
+        return self._index[player_id]
+
+
+class MatchHistory(_Slotted):
+    """The pairs of players that met, as a sorted array of `pair_key`s, or
+    a sorted list where `array` has no 64 bit typecode.
+
+    Supports `key in history` like a set of keys does, in logarithmic time.
+
+    Args:
+        pairs: (id1, id2) tuples of players that played each other, in
+            either order and with repeats.
+    """
+    __slots__ = ('keys',)
+
+    def __init__(self, pairs=()):
+        keys = sorted(set(pair_key(a, b) for a, b in pairs))
+        if KEY_TYPECODE is not None:
+            keys = array.array(KEY_TYPECODE, keys)
+        self.keys = keys
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __iter__(self):
+        return iter(self.keys)
+
+    def __contains__(self, key):
+        keys = self.keys
+        i = bisect.bisect_left(keys, key)
+        return i < len(keys) and keys[i] == key
+
+    def has_met(self, id1, id2):
+        """Returns whether two players already played each other."""
+        return pair_key(id1, id2) in self
+
+    def pairs(self):
+        """Returns the (id1, id2) tuples of the pairs, id1 the lower id."""
+        return [split_key(key) for key in self.keys]
+
+
+def compact_pairing_data(standings, history, byes):
+    """Returns `tournament.pairing_data` in compact form.
+
+    Returns:
+        A tuple (standings, history, byes) of a `StandingsTable`, a
+        `MatchHistory` and a sorted array of ids.
+    """
+    return (StandingsTable(standings), MatchHistory(history),
+            array.array(ID_TYPECODE, sorted(byes)))
+
+
+def expand_pairing_data(data):
+    """Returns compact pairing data as `tournament.pairing_data` does."""
+    standings, history, byes = data
+    return standings.rows(), history.pairs(), list(byes)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+#
+# Test cases for records.py
+# These do not need a database.
+
+from __future__ import print_function
+
+import pickle
+
+import pairing
+import records
+from records import *
+
+
+def make_data():
+    standings = [(4, "Applejack", 2, 2), (2, "Rarity", 1, 2),
+                 (3, "Spike", 1, 2), (1, "Fluttershy", 0, 2)]
+    history = [(4, 1), (2, 3), (4, 2), (1, 3)]
+    return standings, history, [3]
+
+
+def test_round_trip():
+    standings, history, byes = make_data()
+    data = compact_pairing_data(standings, history, byes)
+    expanded = expand_pairing_data(data)
+    if expanded != (standings, sorted((min(p), max(p)) for p in history),
+                    byes):
+        raise ValueError("Compact data should expand to what it was made"
+                         " of.")
+    copy = pickle.loads(pickle.dumps(data, 2))
+    if expand_pairing_data(copy) != expanded:
+        raise ValueError("Compact data should survive pickling.")
+    print("1. Compact pairing data expands to the original rows.")
+
+
+def test_lookups():
+    standings, history, byes = make_data()
+    table = StandingsTable(standings)
+    played = MatchHistory(history + [(1, 4)])
+    if table.index(3) != 2 or tuple(table[2]) != standings[2]:
+        raise ValueError("Players should be found by id.")
+    if not played.has_met(1, 4) or played.has_met(1, 2) or len(played) != 4:
+        raise ValueError("Pairs should be found in either order, once.")
+    print("2. Players and previous pairs are looked up.")
+
+
+def test_pairing_on_records():
+    standings, history, byes = make_data()
+    data = compact_pairing_data(standings, history, byes)
+    for pair_players in pairing.PAIRING_MODES.values():
+        if pair_players(*data) != pair_players(standings, history, byes):
+            raise ValueError("Pairing should not depend on the form of the"
+                             " data.")
+    print("3. Pairing gives the same pairs on compact data.")
+
+
+def test_large_ids():
+    top = 2 ** 31 - 1
+    pairs = [(top, top - 1), (1, top)]
+    typecode = records.KEY_TYPECODE
+    try:
+        # Without a 64 bit typecode, as on Windows under Python 2.
+        for key_typecode in (typecode, None):
+            records.KEY_TYPECODE = key_typecode
+            played = MatchHistory(pairs)
+            if not played.has_met(top - 1, top) or \
+                    played.pairs() != [(1, top), (top - 1, top)]:
+                raise ValueError("Keys should hold pairs of any two ids.")
+    finally:
+        records.KEY_TYPECODE = typecode
+    print("4. Pairs of the largest ids are kept, with or without 64 bit"
+          " arrays.")
+
+
+if __name__ == '__main__':
+    test_round_trip()
+    test_lookups()
+    test_pairing_on_records()
+    test_large_ids()
+    print("Success!  All tests pass!")
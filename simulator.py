@@ -0,0 +1,294 @@
+#
+# simulator.py -- replays whole Swiss tournaments without a database
+#
+# For capacity planning: plays R rounds of N players with the pairing engine
+# `swiss_pairings` uses and random or rating-based results, and reports how
+# long standings and pairing took each round and how much memory it needed.
+#
+#     python simulator.py --players 100000 --rounds 9 --outcomes rating
+#
+# The results and opponents are kept in NumPy arrays when NumPy is
+# installed, and in arrays of the standard library otherwise.
+
+from __future__ import division, print_function
+
+import argparse
+import array
+import random
+import time
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import pairing
+import tiebreaks
+
+OUTCOMES = ('random', 'rating')
+
+
+def peak_memory_kb():
+    """Returns the peak resident memory of this process in KB, or None."""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class TournamentSimulator(object):
+    """A Swiss tournament played out in memory.
+
+    Players have ids 1 to `players`; the arrays are indexed by id - 1.
+    `opponents[i, r]` holds the index of the opponent of player i in round
+    r, or -1 for a bye or a round not played yet, and `won[i, r]` whether
+    the player won it.
+
+    Args:
+        players: Number of players.
+        rounds: Number of rounds to play.
+        outcomes: "random" gives every match to either player with even
+            odds.  "rating" draws a rating per player and gives the match
+            to the higher rated player with Elo odds.
+        mode: The pairing mode, as for `tournament.swiss_pairings`.
+        seed: Seed of the random results.
+        use_numpy: Whether to keep the results in NumPy arrays; by default
+            whenever NumPy is installed.
+    """
+
+    def __init__(self, players, rounds, outcomes='random', mode='greedy',
+                 seed=0, use_numpy=None):
+        if outcomes not in OUTCOMES:
+            raise ValueError("Unknown outcomes %r" % (outcomes,))
+        if mode not in pairing.PAIRING_MODES:
+            raise ValueError("Unknown pairing mode %r" % (mode,))
+        if use_numpy is None:
+            use_numpy = numpy is not None
+        elif use_numpy and numpy is None:
+            raise ImportError("NumPy is not installed")
+        self.players = players
+        self.rounds = rounds
+        self.outcomes = outcomes
+        self.pair_players = pairing.PAIRING_MODES[mode]
+        self.use_numpy = use_numpy
+        self.round = 0
+        self.names = ["Player %d" % i for i in range(1, players + 1)]
+        if use_numpy:
+            self._rng = numpy.random.RandomState(seed)
+            self.wins = numpy.zeros(players, numpy.int32)
+            self.matches = numpy.zeros(players, numpy.int32)
+            self.had_bye = numpy.zeros(players, numpy.bool_)
+            self.opponents = numpy.full((players, rounds), -1, numpy.int32)
+            self.won = numpy.zeros((players, rounds), numpy.bool_)
+            self.ratings = self._rng.normal(1500, 200, players)
+        else:
+            self._rng = random.Random(seed)
+            self.wins = array.array('i', [0]) * players
+            self.matches = array.array('i', [0]) * players
+            self.had_bye = array.array('b', [0]) * players
+            # Flat players x rounds arrays, row-major like the NumPy ones.
+            self.opponents = array.array('i', [-1]) * (players * rounds)
+            self.won = array.array('b', [0]) * (players * rounds)
+            self.ratings = array.array(
+                'd', [self._rng.gauss(1500, 200) for _ in range(players)])
+
+    def state_bytes(self):
+        """Returns the bytes held by the result and opponent arrays."""
+        arrays = (self.wins, self.matches, self.had_bye, self.opponents,
+                  self.won, self.ratings)
+        if self.use_numpy:
+            return sum(a.nbytes for a in arrays)
+        return sum(len(a) * a.itemsize for a in arrays)
+
+    def standings(self):
+        """Returns the standings, as `tournament.player_standings` does."""
+        wins = self.wins
+        if self.use_numpy:
+            order = numpy.lexsort((numpy.arange(self.players),
+                                   -wins)).tolist()
+            wins = wins.tolist()
+            matches = self.matches.tolist()
+        else:
+            order = sorted(range(self.players), key=lambda i: -wins[i])
+            matches = self.matches
+        names = self.names
+        return [(i + 1, names[i], wins[i], matches[i]) for i in order]
+
+    def history(self):
+        """Returns (id1, id2) tuples of the players that met, id1 lower."""
+        played = self.round
+        if self.use_numpy:
+            opponents = self.opponents[:, :played]
+            rows, cols = numpy.nonzero(
+                opponents > numpy.arange(self.players)[:, None])
+            return list(zip((rows + 1).tolist(),
+                            (opponents[rows, cols] + 1).tolist()))
+        rounds = self.rounds
+        opponents = self.opponents
+        found = []
+        for i in range(self.players):
+            for r in range(i * rounds, i * rounds + played):
+                if opponents[r] > i:
+                    found.append((i + 1, opponents[r] + 1))
+        return found
+
+    def results(self):
+        """Returns (winner, loser) tuples of every match played so far."""
+        if self.use_numpy:
+            rows, cols = numpy.nonzero(self.won[:, :self.round])
+            losers = self.opponents[rows, cols]
+            return list(zip((rows + 1).tolist(),
+                            [l + 1 if l >= 0 else None
+                             for l in losers.tolist()]))
+        found = []
+        rounds = self.rounds
+        for i in range(self.players):
+            for r in range(i * rounds, i * rounds + self.round):
+                if self.won[r]:
+                    loser = self.opponents[r]
+                    found.append((i + 1, loser + 1 if loser >= 0 else None))
+        return found
+
+    def _first_wins(self, first, second):
+        """Returns for each match whether the first player wins it."""
+        if self.use_numpy:
+            first = numpy.array(first, numpy.int64)
+            second = numpy.array(second, numpy.int64)
+            odds = 0.5
+            if self.outcomes == 'rating':
+                odds = 1 / (1 + 10 ** ((self.ratings[second] -
+                                        self.ratings[first]) / 400))
+            return (self._rng.random_sample(len(first)) < odds).tolist()
+        ratings = self.ratings
+        rating = self.outcomes == 'rating'
+        draws = []
+        for a, b in zip(first, second):
+            odds = 0.5
+            if rating:
+                odds = 1 / (1 + 10 ** ((ratings[b] - ratings[a]) / 400))
+            draws.append(self._rng.random() < odds)
+        return draws
+
+    def _record(self, pairs):
+        """Records the results of a round's pairings."""
+        r = self.round
+        first = [p[0] - 1 for p in pairs if p[2] is not None]
+        second = [p[2] - 1 for p in pairs if p[2] is not None]
+        if self.use_numpy:
+            for p in pairs:
+                if p[2] is None:
+                    self.wins[p[0] - 1] += 1
+                    self.matches[p[0] - 1] += 1
+                    self.had_bye[p[0] - 1] = True
+                    self.won[p[0] - 1, r] = True
+            first = numpy.array(first, numpy.int64)
+            second = numpy.array(second, numpy.int64)
+            first_wins = numpy.array(self._first_wins(first, second),
+                                     numpy.bool_)
+            self.opponents[first, r] = second
+            self.opponents[second, r] = first
+            self.won[first, r] = first_wins
+            self.won[second, r] = ~first_wins
+            self.wins[first] += first_wins
+            self.wins[second] += ~first_wins
+            self.matches[first] += 1
+            self.matches[second] += 1
+            return
+        rounds = self.rounds
+        for p in pairs:
+            if p[2] is None:
+                i = p[0] - 1
+                self.wins[i] += 1
+                self.matches[i] += 1
+                self.had_bye[i] = 1
+                self.won[i * rounds + r] = 1
+        for a, b, a_wins in zip(first, second,
+                                self._first_wins(first, second)):
+            winner, loser = (a, b) if a_wins else (b, a)
+            self.opponents[a * rounds + r] = b
+            self.opponents[b * rounds + r] = a
+            self.won[winner * rounds + r] = 1
+            self.wins[winner] += 1
+            self.matches[a] += 1
+            self.matches[b] += 1
+
+    def play_round(self):
+        """Pairs and plays the next round.
+
+        Returns:
+            A dict with the round number, the seconds spent on the
+            standings, the history, the pairing and the results, the number
+            of pairs and the peak memory of the process in KB.
+        """
+        start = time.time()
+        standings = self.standings()
+        standings_done = time.time()
+        history = self.history()
+        if self.use_numpy:
+            byes = (numpy.nonzero(self.had_bye)[0] + 1).tolist()
+        else:
+            byes = [i + 1 for i, b in enumerate(self.had_bye) if b]
+        history_done = time.time()
+        pairs = self.pair_players(standings, history, byes)
+        pairing_done = time.time()
+        self._record(pairs)
+        self.round += 1
+        results_done = time.time()
+        return {'round': self.round,
+                'standings': standings_done - start,
+                'history': history_done - standings_done,
+                'pairing': pairing_done - history_done,
+                'results': results_done - pairing_done,
+                'pairs': len(pairs),
+                'peak_kb': peak_memory_kb()}
+
+    def run(self):
+        """Plays every remaining round and returns their `play_round`s."""
+        return [self.play_round() for _ in range(self.round, self.rounds)]
+
+    def ranked_standings(self):
+        """Returns the standings ranked with tiebreaks, see `tiebreaks`."""
+        return tiebreaks.rank(self.standings(), self.results())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate a Swiss '
+                                     'tournament and time every round.')
+    parser.add_argument('--players', type=int, default=10000)
+    parser.add_argument('--rounds', type=int, default=7)
+    parser.add_argument('--outcomes', choices=OUTCOMES, default='random')
+    parser.add_argument('--mode', choices=sorted(pairing.PAIRING_MODES),
+                        default='greedy')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-numpy', action='store_true',
+                        help='use standard library arrays even if NumPy '
+                        'is installed')
+    args = parser.parse_args()
+
+    simulator = TournamentSimulator(args.players, args.rounds, args.outcomes,
+                                    args.mode, args.seed,
+                                    False if args.no_numpy else None)
+    print('%d players, %d rounds, %s arrays of %.1f MB' % (
+        args.players, args.rounds,
+        'NumPy' if simulator.use_numpy else 'standard library',
+        simulator.state_bytes() / 1e6))
+    print('%5s %10s %10s %10s %10s %8s %10s' % (
+        'round', 'standings', 'history', 'pairing', 'results', 'pairs',
+        'peak MB'))
+    for timing in simulator.run():
+        peak = timing['peak_kb']
+        print('%5d %9.3fs %9.3fs %9.3fs %9.3fs %8d %10s' % (
+            timing['round'], timing['standings'], timing['history'],
+            timing['pairing'], timing['results'], timing['pairs'],
+            '%.1f' % (peak / 1024) if peak is not None else '-'))
+    start = time.time()
+    simulator.ranked_standings()
+    print('ranked standings with tiebreaks: %.3fs' % (time.time() - start))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+#
+# Test cases for simulator.py
+# These do not need a database.  The NumPy arrays are only tested when NumPy
+# is installed.
+
+from __future__ import print_function
+
+import pairing
+from simulator import *
+
+
+def backends():
+    if numpy is None:
+        return [False]
+    return [False, True]
+
+
+def test_rounds_pair_everybody():
+    for use_numpy in backends():
+        simulator = TournamentSimulator(9, 5, mode="optimal",
+                                        use_numpy=use_numpy)
+        for timing in simulator.run():
+            if timing['pairs'] != 5:
+                raise ValueError("Every round should pair all 9 players.")
+        history = simulator.history()
+        if len(history) != 5 * 4 or len(set(history)) != len(history):
+            raise ValueError("Players should not meet twice.")
+        if list(simulator.matches) != [5] * 9 or sum(simulator.had_bye) != 5:
+            raise ValueError("Every player should play each round, with a"
+                             " different player getting the bye.")
+    print("1. Every round pairs every player once.")
+
+
+def test_same_pairings_as_swiss_pairings():
+    for use_numpy in backends():
+        simulator = TournamentSimulator(41, 4, use_numpy=use_numpy)
+        for _ in range(4):
+            before = set(simulator.history())
+            byes = [i + 1 for i in range(41) if simulator.had_bye[i]]
+            expected = pairing.pair_players(simulator.standings(),
+                                            list(before), byes)
+            simulator.play_round()
+            played = set(simulator.history()) - before
+            if played != set((min(p[0], p[2]), max(p[0], p[2]))
+                             for p in expected if p[2] is not None):
+                raise ValueError("The simulator should pair like"
+                                 " swiss_pairings.")
+    print("2. The simulator pairs like swiss_pairings.")
+
+
+def test_results_match_wins():
+    for use_numpy in backends():
+        simulator = TournamentSimulator(101, 6, use_numpy=use_numpy)
+        simulator.run()
+        tally = [0] * 101
+        for winner, loser in simulator.results():
+            tally[winner - 1] += 1
+        if tally != list(simulator.wins):
+            raise ValueError("Results should add up to the wins.")
+        ranked = simulator.ranked_standings()
+        if len(ranked) != 101 or \
+                [row[2] for row in ranked] != sorted(tally, reverse=True):
+            raise ValueError("Ranked standings should order every player by"
+                             " wins.")
+    print("3. Results add up to the standings.")
+
+
+def test_rating_outcomes():
+    for use_numpy in backends():
+        simulator = TournamentSimulator(400, 7, outcomes='rating',
+                                        use_numpy=use_numpy)
+        simulator.run()
+        by_rating = sorted(range(400), key=lambda i: simulator.ratings[i])
+        weaker = sum(simulator.wins[i] for i in by_rating[:200])
+        stronger = sum(simulator.wins[i] for i in by_rating[200:])
+        if stronger <= weaker:
+            raise ValueError("Higher rated players should win more.")
+    print("4. Higher rated players win more with rating-based outcomes.")
+
+
+if __name__ == '__main__':
+    test_rounds_pair_everybody()
+    test_same_pairings_as_swiss_pairings()
+    test_results_match_wins()
+    test_rating_outcomes()
+    print("Success!  All tests pass!")
@@ -0,0 +1,435 @@
+#
+# sqlite_store.py -- tournament storage backend on SQLite
+#
+# Keeps the tournaments in a SQLite file, or in memory, with the tables of
+# tournament.sql.  Needs nothing outside the standard library.
+
+import sqlite3
+import threading
+
+import storage
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS player (
+        id INTEGER PRIMARY KEY,
+        fullname TEXT
+    );
+    CREATE TABLE IF NOT EXISTS tournament (
+        id INTEGER PRIMARY KEY,
+        name TEXT
+    );
+    CREATE TABLE IF NOT EXISTS tournament_rounds (
+        t_id INT REFERENCES tournament (id) ON DELETE CASCADE,
+        round INT NOT NULL,
+        closed BOOLEAN NOT NULL DEFAULT 0,
+        PRIMARY KEY (t_id, round)
+    );
+    CREATE UNIQUE INDEX IF NOT EXISTS tournament_rounds_open
+        ON tournament_rounds (t_id) WHERE NOT closed;
+    CREATE TABLE IF NOT EXISTS matches (
+        id INTEGER PRIMARY KEY,
+        winner_id INT REFERENCES player (id),
+        loser_id INT REFERENCES player (id)
+    );
+    CREATE INDEX IF NOT EXISTS matches_winner_id ON matches (winner_id);
+    CREATE INDEX IF NOT EXISTS matches_loser_id ON matches (loser_id);
+    CREATE TABLE IF NOT EXISTS tournament_matches (
+        t_id INT REFERENCES tournament (id) ON DELETE CASCADE,
+        m_id INT UNIQUE REFERENCES matches (id) ON DELETE CASCADE,
+        round INT,
+        PRIMARY KEY (t_id, m_id),
+        FOREIGN KEY (t_id, round) REFERENCES tournament_rounds (t_id, round)
+    );
+    CREATE INDEX IF NOT EXISTS tournament_matches_by_round
+        ON tournament_matches (t_id, round);
+    CREATE TABLE IF NOT EXISTS tournament_players (
+        t_id INT REFERENCES tournament (id) ON DELETE CASCADE,
+        p_id INT REFERENCES player (id),
+        PRIMARY KEY (t_id, p_id)
+    );
+    CREATE INDEX IF NOT EXISTS tournament_players_p_id
+        ON tournament_players (p_id);
+    CREATE TABLE IF NOT EXISTS tournament_standings (
+        t_id INT REFERENCES tournament (id) ON DELETE CASCADE,
+        p_id INT REFERENCES player (id),
+        wins INT NOT NULL DEFAULT 0,
+        losses INT NOT NULL DEFAULT 0,
+        byes INT NOT NULL DEFAULT 0,
+        matches INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (t_id, p_id)
+    );
+    CREATE INDEX IF NOT EXISTS tournament_standings_by_wins
+        ON tournament_standings (t_id, wins DESC, p_id, matches);
+    CREATE INDEX IF NOT EXISTS tournament_standings_p_id
+        ON tournament_standings (p_id);
+    CREATE TABLE IF NOT EXISTS tournament_round_standings (
+        t_id INT,
+        round INT,
+        p_id INT REFERENCES player (id),
+        wins INT NOT NULL,
+        losses INT NOT NULL,
+        byes INT NOT NULL,
+        matches INT NOT NULL,
+        PRIMARY KEY (t_id, round, p_id),
+        FOREIGN KEY (t_id, round) REFERENCES tournament_rounds (t_id, round)
+            ON DELETE CASCADE
+    );
+    CREATE INDEX IF NOT EXISTS tournament_round_standings_p_id
+        ON tournament_round_standings (p_id);
+    """
+
+# The winner's row also counts a bye; the loser's row is missing for one.
+UPDATE_STANDINGS = """
+    UPDATE tournament_standings
+    SET wins = wins + ?, losses = losses + ?, byes = byes + ?,
+        matches = matches + ?
+    WHERE t_id = ? AND p_id = ?;"""
+
+# Counts the results a player already has in the tournament it registers in.
+ENROLL_STANDINGS = """
+    INSERT INTO tournament_standings(t_id, p_id, wins, losses, byes, matches)
+    SELECT :t_id, :p_id,
+        COUNT(CASE WHEN winner_id = :p_id THEN 1 END),
+        COUNT(CASE WHEN loser_id = :p_id THEN 1 END),
+        COUNT(CASE WHEN winner_id = :p_id AND loser_id IS NULL THEN 1 END),
+        COUNT(matches.id)
+    FROM matches JOIN tournament_matches
+        ON tournament_matches.m_id = matches.id
+    WHERE tournament_matches.t_id = :t_id
+        AND :p_id IN (winner_id, loser_id);"""
+
+
+class SQLiteTournamentStore(storage.TournamentBackend):
+    """Tournament storage in a SQLite database.
+
+    One connection is shared by all threads, one operation at a time.
+
+    Args:
+        path: File of the database, created if missing.  The default keeps
+            the database in memory until the store is closed.
+        states: An optional `pairing.PairingStates`; see
+            `tournament.TournamentStore`.
+    """
+
+    def __init__(self, path=':memory:', states=None):
+        self.path = path
+        self.states = states
+        self._db = None
+        self._lock = threading.RLock()
+
+    def _connection(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA foreign_keys = ON;")
+            self._db.executescript(SCHEMA)
+        return self._db
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _write(self, statements):
+        """Runs (sql, args) statements in one transaction."""
+        with self._lock:
+            db = self._connection()
+            try:
+                with db:
+                    for sql, args in statements:
+                        db.execute(sql, args)
+            except sqlite3.DatabaseError as e:
+                print('Error %s' % e)
+
+    def _read(self, sql, args):
+        with self._lock:
+            try:
+                return self._connection().execute(sql, args).fetchall()
+            except sqlite3.DatabaseError as e:
+                print('Error %s' % e)
+
+    def delete_matches(self, tournament_id):
+        """See `tournament.delete_matches`."""
+        self._write([
+            ("""DELETE FROM matches WHERE id IN (
+                    SELECT m_id FROM tournament_matches WHERE t_id = ?);""",
+             (tournament_id,)),
+            ("""UPDATE tournament_standings
+                SET wins = 0, losses = 0, byes = 0, matches = 0
+                WHERE t_id = ?;""", (tournament_id,)),
+            ("DELETE FROM tournament_rounds WHERE t_id = ?;",
+             (tournament_id,))])
+        self._changed(tournament_id)
+
+    def delete_tournament(self, tournament_id):
+        """See `tournament.delete_tournament`."""
+        self._write([
+            ("""DELETE FROM matches WHERE id IN (
+                    SELECT m_id FROM tournament_matches WHERE t_id = ?);""",
+             (tournament_id,)),
+            ("DELETE FROM tournament WHERE id = ?;", (tournament_id,))])
+        self._changed(tournament_id)
+
+    def delete_players(self):
+        """See `tournament.delete_players`."""
+        self._write([("DELETE FROM player;", ())])
+        self._changed(None)
+
+    def delete_tournament_players(self, tournament_id):
+        """See `tournament.delete_tournament_players`."""
+        self._write([
+            ("DELETE FROM tournament_round_standings WHERE t_id = ?;",
+             (tournament_id,)),
+            ("DELETE FROM tournament_standings WHERE t_id = ?;",
+             (tournament_id,)),
+            ("DELETE FROM tournament_players WHERE t_id = ?;",
+             (tournament_id,))])
+        self._changed(tournament_id)
+
+    def count_players(self, tournament_id):
+        """See `tournament.count_players`."""
+        rows = self._read("SELECT count(p_id) FROM tournament_players"
+                          " WHERE t_id = ?;", (tournament_id,))
+        return rows[0][0] if rows is not None else None
+
+    def register_player(self, name):
+        """See `tournament.register_player`."""
+        player_ids = self.register_players([name])
+        return player_ids[0] if player_ids else None
+
+    def register_players(self, names, tournament_id=None):
+        """See `tournament.register_players`."""
+        with self._lock:
+            db = self._connection()
+            try:
+                with db:
+                    player_ids = [
+                        db.execute("INSERT INTO player(fullname) VALUES(?);",
+                                   (name,)).lastrowid
+                        for name in names]
+                    if tournament_id is not None:
+                        rows = [(tournament_id, p) for p in player_ids]
+                        db.executemany("INSERT INTO tournament_players"
+                                       " VALUES(?, ?);", rows)
+                        db.executemany("INSERT INTO tournament_standings"
+                                       "(t_id, p_id) VALUES(?, ?);", rows)
+                if tournament_id is not None:
+                    self._changed(tournament_id)
+                return player_ids
+            except sqlite3.DatabaseError as e:
+                print('Error %s' % e)
+
+    def register_tournament(self, tournament_name):
+        """See `tournament.register_tournament`."""
+        with self._lock:
+            db = self._connection()
+            try:
+                with db:
+                    return db.execute("INSERT INTO tournament(name)"
+                                      " VALUES(?);",
+                                      (tournament_name,)).lastrowid
+            except sqlite3.DatabaseError as e:
+                print('Error %s' % e)
+                return None
+
+    def register_player_in_tournament(self, tournament_id, player_id):
+        """See `tournament.register_player_in_tournament`."""
+        self._write([
+            ("INSERT INTO tournament_players VALUES(?, ?);",
+             (tournament_id, player_id)),
+            (ENROLL_STANDINGS, {'t_id': tournament_id, 'p_id': player_id})])
+        self._changed(tournament_id)
+
+    def player_standings(self, tournament_id):
+        """See `tournament.player_standings`."""
+        return self._read("""
+            SELECT
+                tournament_standings.p_id,
+                player.fullname,
+                tournament_standings.wins,
+                tournament_standings.matches
+            FROM
+                tournament_standings LEFT JOIN player
+                ON tournament_standings.p_id = player.id
+            WHERE
+                tournament_standings.t_id = ?
+            ORDER BY wins DESC, p_id;""", (tournament_id,))
+
+    def report_match(self, tournament_id, winner, loser):
+        """See `tournament.report_match`."""
+        self.report_matches(tournament_id, [(winner, loser)])
+
+    def report_matches(self, tournament_id, results):
+        """See `tournament.report_matches`."""
+        results = list(results)
+        with self._lock:
+            db = self._connection()
+            try:
+                with db:
+                    round = self._current_round(db, tournament_id)
+                    match_ids = []
+                    for winner, loser in results:
+                        m_id = db.execute(
+                            "INSERT INTO matches(winner_id, loser_id)"
+                            " VALUES(?, ?);", (winner, loser)).lastrowid
+                        match_ids.append(m_id)
+                        db.execute("INSERT INTO tournament_matches"
+                                   " VALUES(?, ?, ?);",
+                                   (tournament_id, m_id, round))
+                        db.execute(UPDATE_STANDINGS,
+                                   (1, 0, int(loser is None), 1,
+                                    tournament_id, winner))
+                        if loser is not None:
+                            db.execute(UPDATE_STANDINGS,
+                                       (0, 1, 0, 1, tournament_id, loser))
+                # Under the lock, so no pairing state is built in between.
+                self._changed(tournament_id, results)
+                return match_ids
+            except sqlite3.DatabaseError as e:
+                print('Error %s' % e)
+
+    def _current_round(self, db, tournament_id):
+        row = db.execute("SELECT round FROM tournament_rounds"
+                         " WHERE t_id = ? AND NOT closed;",
+                         (tournament_id,)).fetchone()
+        return row[0] if row is not None else None
+
+    def open_round(self, tournament_id):
+        """See `tournament.open_round`."""
+        with self._lock:
+            db = self._connection()
+            try:
+                with db:
+                    round = self._current_round(db, tournament_id)
+                    if round is not None:
+                        print('Error round %s of tournament %s is still open'
+                              % (round, tournament_id))
+                        return None
+                    round = db.execute(
+                        "SELECT COALESCE(max(round), 0) + 1"
+                        " FROM tournament_rounds WHERE t_id = ?;",
+                        (tournament_id,)).fetchone()[0]
+                    db.execute("INSERT INTO tournament_rounds(t_id, round)"
+                               " VALUES(?, ?);", (tournament_id, round))
+                return round
+            except sqlite3.DatabaseError as e:
+                print('Error %s' % e)
+
+    def close_round(self, tournament_id):
+        """See `tournament.close_round`."""
+        with self._lock:
+            db = self._connection()
+            try:
+                with db:
+                    round = self._current_round(db, tournament_id)
+                    if round is not None:
+                        db.execute("UPDATE tournament_rounds SET closed = 1"
+                                   " WHERE t_id = ? AND round = ?;",
+                                   (tournament_id, round))
+                        db.execute("""
+                            INSERT INTO tournament_round_standings
+                            SELECT t_id, ?, p_id, wins, losses, byes,
+                                matches
+                            FROM tournament_standings WHERE t_id = ?;""",
+                                   (round, tournament_id))
+                return round
+            except sqlite3.DatabaseError as e:
+                print('Error %s' % e)
+
+    def rounds(self, tournament_id):
+        """See `tournament.rounds`."""
+        rows = self._read("SELECT round, closed FROM tournament_rounds"
+                          " WHERE t_id = ? ORDER BY round;", (tournament_id,))
+        if rows is None:
+            return None
+        return [(round, bool(closed)) for round, closed in rows]
+
+    def round_results(self, tournament_id, round):
+        """See `tournament.round_results`."""
+        return self._read("""
+            SELECT winner_id, loser_id
+            FROM tournament_matches JOIN matches
+                ON tournament_matches.m_id = matches.id
+            WHERE tournament_matches.t_id = ?
+                AND tournament_matches.round = ?
+            ORDER BY m_id;""", (tournament_id, round))
+
+    def standings_at(self, tournament_id, round):
+        """See `tournament.standings_at`."""
+        return self._read("""
+            SELECT
+                tournament_round_standings.p_id,
+                player.fullname,
+                tournament_round_standings.wins,
+                tournament_round_standings.matches
+            FROM
+                tournament_round_standings LEFT JOIN player
+                ON tournament_round_standings.p_id = player.id
+            WHERE
+                tournament_round_standings.t_id = ?
+                AND tournament_round_standings.round = ?
+            ORDER BY wins DESC, p_id;""", (tournament_id, round))
+
+    def match_history(self, tournament_id):
+        """See `tournament.match_history`."""
+        return self._read("""
+            SELECT DISTINCT
+                winner_id,
+                loser_id
+            FROM
+                tournament_matches JOIN matches
+                ON tournament_matches.m_id = matches.id
+            WHERE
+                loser_id IS NOT NULL
+                AND tournament_matches.t_id = ?;""", (tournament_id,))
+
+    def iter_match_history(self, tournament_id, itersize=None):
+        """See `tournament.iter_match_history`."""
+        return iter(self._read("""
+            SELECT
+                winner_id,
+                loser_id
+            FROM
+                tournament_matches JOIN matches
+                ON tournament_matches.m_id = matches.id
+            WHERE
+                tournament_matches.t_id = ?
+            ORDER BY m_id;""", (tournament_id,)) or ())
+
+    def players_with_bye_games(self, tournament_id):
+        """See `tournament.players_with_bye_games`."""
+        rows = self._read("""
+            SELECT DISTINCT
+                winner_id
+            FROM
+                tournament_matches JOIN matches
+                ON tournament_matches.m_id = matches.id
+            WHERE
+                loser_id IS NULL
+                AND tournament_matches.t_id = ?
+            ORDER BY winner_id;""", (tournament_id,))
+        return [row[0] for row in rows] if rows is not None else None
+
+    def pairing_data(self, tournament_id):
+        """See `tournament.pairing_data`."""
+        # Read under the lock, so all three come from the same state.
+        with self._lock:
+            return storage.TournamentBackend.pairing_data(self, tournament_id)
+
+    def ranking_data(self, tournament_id):
+        """See `storage.TournamentBackend.ranking_data`."""
+        with self._lock:
+            standings = self.player_standings(tournament_id)
+            results = self._read("""
+                SELECT
+                    winner_id,
+                    loser_id
+                FROM
+                    tournament_matches JOIN matches
+                    ON tournament_matches.m_id = matches.id
+                WHERE
+                    loser_id IS NOT NULL
+                    AND tournament_matches.t_id = ?;""", (tournament_id,))
+        if standings is None or results is None:
+            return None
+        return standings, results
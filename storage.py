@@ -0,0 +1,317 @@
+#
+# storage.py -- the interface of the storage backends of tournament.py
+#
+# The module-level functions of tournament.py call a store, which can be any
+# `TournamentBackend`: `tournament.TournamentStore` keeps the tournaments in
+# PostgreSQL, `sqlite_store.SQLiteTournamentStore` in SQLite and
+# `memory_store.MemoryTournamentStore` in memory.  Pairing and ranking are
+# built on the operations every backend implements, so they behave the same
+# on all of them.
+
+import contextlib
+
+import pairing
+import records
+import tiebreaks
+
+
+def _places(standings):
+    """Player id -> place, the players with more wins plus one."""
+    places = {}
+    for i, (player_id, _, wins, _) in enumerate(standings):
+        if i == 0 or wins != standings[i - 1][2]:
+            place = i + 1
+        places[player_id] = place
+    return places
+
+
+def diff_standings(earlier, later):
+    """Returns what changed between two standings, like `standings_at`'s.
+
+    Returns:
+        A list of (id, name, wins, matches, places) tuples, one per player
+        of `later`, in its order: the wins and matches added since
+        `earlier`, and the places gained, or None for a player missing
+        from `earlier`.  Players sharing a number of wins share a place.
+    """
+    before = dict((row[0], row) for row in earlier)
+    places_before = _places(earlier)
+    places = _places(later)
+    result = []
+    for player_id, name, wins, matches in later:
+        row = before.get(player_id)
+        if row is None:
+            result.append((player_id, name, wins, matches, None))
+        else:
+            result.append((player_id, name, wins - row[2], matches - row[3],
+                           places_before[player_id] - places[player_id]))
+    return result
+
+
+class TournamentBackend(object):
+    """Base class of the tournament stores.
+
+    Subclasses implement the operations that raise NotImplementedError
+    here; each one behaves like the function of tournament.py with the same
+    name.  Errors of the underlying database are printed, and the operation
+    returns None, as tournament.py always did.
+
+    Subclasses call `_changed` after every write to players, matches or
+    standings, and wrap writes reporting results in `_reporting`.
+    """
+
+    # A `pairing.PairingStates` to pair from incrementally, or None.
+    states = None
+
+    def close(self):
+        """Releases what the store holds open.  The store can be reused."""
+
+    def _changed(self, tournament_id, results=None):
+        """Called after a write changed a tournament, or all if None.
+
+        Args:
+            tournament_id: The tournament changed.
+            results: The (winner, loser) tuples reported, when that is all
+                the write did.  The pairing state of the tournament is then
+                brought up to date with them instead of being dropped.
+        """
+        if self.states is not None:
+            if results is None:
+                self.states.invalidate(tournament_id)
+            else:
+                self.states.report(tournament_id, results)
+
+    @contextlib.contextmanager
+    def _reporting(self, tournament_id):
+        """Wraps a write reporting results; see `PairingStates.reporting`."""
+        if self.states is None:
+            yield
+        else:
+            with self.states.reporting(tournament_id):
+                yield
+
+    def delete_matches(self, tournament_id):
+        raise NotImplementedError
+
+    def delete_tournament(self, tournament_id):
+        raise NotImplementedError
+
+    def delete_players(self):
+        raise NotImplementedError
+
+    def delete_tournament_players(self, tournament_id):
+        raise NotImplementedError
+
+    def count_players(self, tournament_id):
+        raise NotImplementedError
+
+    def register_player(self, name):
+        raise NotImplementedError
+
+    def register_players(self, names, tournament_id=None):
+        raise NotImplementedError
+
+    def register_tournament(self, tournament_name):
+        raise NotImplementedError
+
+    def register_player_in_tournament(self, tournament_id, player_id):
+        raise NotImplementedError
+
+    def player_standings(self, tournament_id):
+        raise NotImplementedError
+
+    def report_match(self, tournament_id, winner, loser):
+        raise NotImplementedError
+
+    def report_matches(self, tournament_id, results):
+        raise NotImplementedError
+
+    def match_history(self, tournament_id):
+        raise NotImplementedError
+
+    def players_with_bye_games(self, tournament_id):
+        raise NotImplementedError
+
+    def open_round(self, tournament_id):
+        raise NotImplementedError
+
+    def close_round(self, tournament_id):
+        raise NotImplementedError
+
+    def rounds(self, tournament_id):
+        raise NotImplementedError
+
+    def round_results(self, tournament_id, round):
+        raise NotImplementedError
+
+    def standings_at(self, tournament_id, round):
+        raise NotImplementedError
+
+    def standings_diff(self, tournament_id, from_round, to_round):
+        """See `tournament.standings_diff`."""
+        earlier = self.standings_at(tournament_id, from_round)
+        later = self.standings_at(tournament_id, to_round)
+        if earlier is None or later is None:
+            return None
+        return diff_standings(earlier, later)
+
+    def current_round(self, tournament_id):
+        """See `tournament.current_round`."""
+        rounds = self.rounds(tournament_id)
+        if rounds and not rounds[-1][1]:
+            return rounds[-1][0]
+        return None
+
+    def unpaired_players(self, tournament_id, round):
+        """See `tournament.unpaired_players`.
+
+        Built on `player_standings` and `round_results`; backends that can
+        look the players up directly override it.
+        """
+        standings = self.player_standings(tournament_id)
+        results = self.round_results(tournament_id, round)
+        if standings is None or results is None:
+            return None
+        played = set(p for result in results for p in result)
+        return sorted(row[0] for row in standings if row[0] not in played)
+
+    def iter_standings(self, tournament_id, itersize=None):
+        """See `tournament.iter_standings`.
+
+        Iterates over `player_standings`; backends that can stream the
+        rows override it.
+        """
+        return iter(self.player_standings(tournament_id) or ())
+
+    def iter_match_history(self, tournament_id, itersize=None):
+        """See `tournament.iter_match_history`."""
+        raise NotImplementedError
+
+    def ranking_data(self, tournament_id):
+        """Returns (standings, results) of a tournament, or None on error.
+
+        results holds a (winner, loser) tuple for every match that was not
+        a bye, as `tiebreaks.rank` takes them.
+        """
+        raise NotImplementedError
+
+    def pairing_data(self, tournament_id):
+        """See `tournament.pairing_data`.
+
+        Built on `player_standings`, `match_history` and
+        `players_with_bye_games`; backends that can read it all at once
+        override it.
+        """
+        standings = self.player_standings(tournament_id)
+        history = self.match_history(tournament_id)
+        byes = self.players_with_bye_games(tournament_id)
+        if standings is None or history is None or byes is None:
+            return None
+        history = sorted(set((min(pair), max(pair)) for pair in history))
+        return standings, history, sorted(byes)
+
+    def pairing_data_many(self, tournament_ids):
+        """See `tournament.pairing_data_many`."""
+        found = {}
+        for t_id in tournament_ids:
+            data = self.pairing_data(t_id)
+            if data is None:
+                return None
+            found[t_id] = data
+        return found
+
+    def compact_pairing_data(self, tournament_id):
+        """Returns `pairing_data` in the compact form of records.py.
+
+        Pairing runs on this form.  It may be shared with a cache, so treat
+        it as read-only.
+
+        Returns:
+            A tuple (standings, history, byes); see
+            `records.compact_pairing_data`.
+        """
+        data = self.pairing_data(tournament_id)
+        if data is None:
+            return None
+        return records.compact_pairing_data(*data)
+
+    def compact_pairing_data_many(self, tournament_ids):
+        """Returns `compact_pairing_data` of several tournaments, by id."""
+        data = self.pairing_data_many(tournament_ids)
+        if data is None:
+            return None
+        return dict((t_id, records.compact_pairing_data(*parts))
+                    for t_id, parts in data.items())
+
+    def ranked_standings(self, tournament_id, order=tiebreaks.TIEBREAKS):
+        """See `tournament.ranked_standings`."""
+        data = self.ranking_data(tournament_id)
+        if data is None:
+            return None
+        standings, results = data
+        return tiebreaks.rank(standings, results, order)
+
+    def pair_all(self, tournament_ids, mode="greedy", workers=None,
+                 timings=None):
+        """See `tournament.pair_all`."""
+        if mode not in pairing.PAIRING_MODES:
+            raise ValueError("Unknown pairing mode %r" % (mode,))
+        data = self.compact_pairing_data_many(tournament_ids)
+        if data is None:
+            return None
+        jobs = [(t_id, mode) + tuple(parts) for t_id, parts in data.items()]
+        # Imported here, as only this needs it, to keep start-up quick.
+        import multiprocessing
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+        workers = min(workers, len(jobs))
+        if workers <= 1:
+            done = [pairing.pair_tournament(job) for job in jobs]
+        else:
+            pool = multiprocessing.Pool(workers)
+            try:
+                done = pool.map(pairing.pair_tournament, jobs, chunksize=1)
+            finally:
+                pool.close()
+                pool.join()
+        result = {}
+        for t_id, pairings, seconds in done:
+            result[t_id] = pairings
+            if timings is not None:
+                timings[t_id] = seconds
+        return result
+
+    def swiss_pairings(self, tournament_id, mode="greedy"):
+        """See `tournament.swiss_pairings`."""
+        pair_players = pairing.PAIRING_MODES.get(mode)
+        if pair_players is None:
+            raise ValueError("Unknown pairing mode %r" % (mode,))
+        if self.states is not None:
+            return self._pairings_from_state(tournament_id, mode)
+        data = self.compact_pairing_data(tournament_id)
+        if data is None:
+            return None
+        standings, played_players, players_with_byes = data
+
+        # Previous pairings are filtered out, which implements extra
+        # credit: 'Prevent rematches between players.'
+        # It is not clearly defined what happens when a player is up for
+        # a second bye, but I'm assuming this will not happen.
+        return pair_players(standings, played_players, players_with_byes)
+
+    def _pairings_from_state(self, tournament_id, mode):
+        """Pairs a tournament from its pairing state, building it first if
+        `states` has none."""
+        entry = self.states.get(tournament_id)
+        if entry is None:
+            version = self.states.version()
+            data = self.compact_pairing_data(tournament_id)
+            if data is None:
+                return None
+            state = pairing.PairingState(*data)
+            entry = self.states.put(tournament_id, state, version)
+            if entry is None:
+                return state.pairings(mode)
+        state, lock = entry
+        with lock:
+            return state.pairings(mode)
@@ -0,0 +1,97 @@
+#
+# tiebreaks.py -- tiebreak scores and ranked standings for tournament.py
+#
+# Computes every tiebreak from the standings and the match results of a
+# tournament in one pass over the results, so ranking a field costs about
+# as much as reading its matches.
+
+# Tiebreaks in the order `rank` applies them by default, after wins.
+TIEBREAKS = ('buchholz', 'median_buchholz', 'sonneborn_berger', 'omw')
+
+# Match-win percentages below this count as this in OMW%, so losing to a
+# player who dropped out early does not weigh too heavily.
+MIN_MATCH_WIN = 1.0 / 3
+
+
+def compute(standings, results):
+    """Returns the tiebreak scores of every player.
+
+    Opponents are scored by their wins.  Byes have no opponent, so they add
+    to the wins of a player but to none of his or her tiebreaks.  Results
+    against players missing from the standings, such as players who left
+    the tournament, are skipped.
+
+    Args:
+        standings: A list of (id, name, wins, matches) tuples, as returned
+            by `tournament.player_standings`.
+        results: An iterable of (winner, loser) tuples, one per match;
+            loser is None for a bye.
+
+    Returns:
+        A dict mapping each player id to a dict with these keys:
+            buchholz: the sum of the wins of his or her opponents
+            median_buchholz: buchholz without the best and the worst
+                opponent, when there were at least three
+            sonneborn_berger: the sum of the wins of the opponents beaten
+            omw: the average match-win percentage of the opponents, each at
+                least MIN_MATCH_WIN; 0.0 without opponents
+    """
+    wins = {}
+    match_win = {}
+    for player_id, _, player_wins, matches in standings:
+        wins[player_id] = player_wins
+        match_win[player_id] = max(MIN_MATCH_WIN,
+                                   float(player_wins) / matches
+                                   if matches else 0.0)
+    opponents = dict((player_id, []) for player_id in wins)
+    sonneborn_berger = dict.fromkeys(wins, 0)
+    for winner, loser in results:
+        if loser is None or winner not in wins or loser not in wins:
+            continue
+        opponents[winner].append(loser)
+        opponents[loser].append(winner)
+        sonneborn_berger[winner] += wins[loser]
+
+    scores = {}
+    for player_id, faced in opponents.items():
+        opponent_wins = [wins[o] for o in faced]
+        buchholz = sum(opponent_wins)
+        median_buchholz = buchholz
+        if len(opponent_wins) >= 3:
+            median_buchholz -= max(opponent_wins) + min(opponent_wins)
+        omw = 0.0
+        if faced:
+            omw = sum(match_win[o] for o in faced) / len(faced)
+        scores[player_id] = {'buchholz': buchholz,
+                             'median_buchholz': median_buchholz,
+                             'sonneborn_berger': sonneborn_berger[player_id],
+                             'omw': omw}
+    return scores
+
+
+def rank(standings, results, order=TIEBREAKS):
+    """Returns the standings ordered by wins and then by tiebreaks.
+
+    Players equal on wins and every tiebreak are ordered by id.
+
+    Args:
+        standings: A list of (id, name, wins, matches) tuples.
+        results: An iterable of (winner, loser) tuples, one per match.
+        order: Names from TIEBREAKS, in the order to break ties by.
+
+    Returns:
+      A list of tuples, each of which contains (id, name, wins, matches,
+      buchholz, median_buchholz, sonneborn_berger, omw).
+    """
+    for name in order:
+        if name not in TIEBREAKS:
+            raise ValueError("Unknown tiebreak %r" % (name,))
+    scores = compute(standings, results)
+
+    def key(row):
+        score = scores[row[0]]
+        return ((-row[2],) + tuple(-score[name] for name in order) +
+                (row[0],))
+
+    return [row[:4] + tuple(scores[row[0]][name] for name in TIEBREAKS)
+            for row in sorted(standings, key=key)]
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+#
+# Test cases for tiebreaks.py
+# These do not need a database.
+
+from __future__ import print_function
+
+from tiebreaks import *
+
+
+def make_standings(wins):
+    """Returns standings of players 1..n with the given wins, 3 matches."""
+    return [(i, "Player %d" % i, w, 3) for i, w in enumerate(wins, 1)]
+
+
+def test_buchholz_and_sonneborn_berger():
+    standings = make_standings([2, 1, 1, 0])
+    scores = compute(standings, [(1, 2), (3, 4), (1, 3), (2, 4)])
+    if [scores[i]['buchholz'] for i in range(1, 5)] != [2, 2, 2, 2]:
+        raise ValueError("Buchholz should add up the opponents' wins.")
+    if [scores[i]['sonneborn_berger'] for i in range(1, 5)] != [2, 0, 0, 0]:
+        raise ValueError("Sonneborn-Berger should add up the wins of the"
+                         " opponents beaten.")
+    print("1. Buchholz and Sonneborn-Berger are computed.")
+
+
+def test_median_buchholz():
+    standings = make_standings([1, 3, 1, 0])
+    scores = compute(standings, [(2, 1), (3, 1), (1, 4)])
+    if scores[1]['buchholz'] != 4 or scores[1]['median_buchholz'] != 1:
+        raise ValueError("Median-Buchholz should drop the best and the"
+                         " worst opponent.")
+    if scores[2]['median_buchholz'] != scores[2]['buchholz']:
+        raise ValueError("Median-Buchholz should drop nobody with fewer"
+                         " than three opponents.")
+    print("2. Median-Buchholz drops the best and the worst opponent.")
+
+
+def test_opponent_match_win():
+    standings = make_standings([3, 0, 2, 1])
+    scores = compute(standings, [(1, 2), (1, 3), (3, 4), (4, None)])
+    if abs(scores[1]['omw'] - (MIN_MATCH_WIN + 2.0 / 3) / 2) > 1e-9:
+        raise ValueError("OMW% should average the opponents' match-win"
+                         " percentages, each at least a third.")
+    if scores[4]['omw'] != 2.0 / 3 or scores[4]['buchholz'] != 2:
+        raise ValueError("A bye should not count as an opponent.")
+    print("3. OMW% averages the opponents' match-win percentages.")
+
+
+def test_rank():
+    standings = make_standings([2, 1, 1, 0, 1, 0])
+    results = [(1, 2), (3, 4), (1, 3), (2, 4), (5, 6)]
+    ranked = rank(standings, results)
+    if [row[0] for row in ranked] != [1, 2, 3, 5, 4, 6]:
+        raise ValueError("Ties on wins should be broken by tiebreaks,"
+                         " then by id.")
+    if ranked[0][:4] != standings[0] or len(ranked[0]) != 8:
+        raise ValueError("Ranked standings should add the tiebreaks to the"
+                         " standings.")
+    try:
+        rank(standings, results, ('coin_toss',))
+    except ValueError:
+        pass
+    else:
+        raise ValueError("An unknown tiebreak should be refused.")
+    print("4. Standings are ranked by wins, tiebreaks and id.")
+
+
+if __name__ == '__main__':
+    test_buchholz_and_sonneborn_berger()
+    test_median_buchholz()
+    test_opponent_match_win()
+    test_rank()
+    print("Success!  All tests pass!")
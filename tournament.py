@@ -6,54 +6,777 @@
 #         - Not assuming an even number of players.
 #         - Support more than one tournament in the database.
 
-import psycopg2
+import contextlib
+import itertools
+import threading
+import time
 
+import metrics
+import queries
+import records
+import storage
+import tiebreaks
 
+DSN = "dbname=tournament"
+
+# Rows fetched per round trip by the streaming iterators.
+ITERSIZE = 2000
+
+# Writes notify this channel with the id of the tournament they changed, or
+# '*' when they may have changed every tournament.  See listener.py.
+NOTIFY_CHANNEL = "tournament_changed"
+
+# Seconds between checks of how far a replica has replayed, while waiting
+# for it to catch up with a write.
+REPLAY_POLL = 0.005
+
+# Seconds a replica that could not be reached is passed over, so reads do
+# not wait for a connection to time out every time.
+REPLICA_RETRY = 5.0
+
+
+# psycopg2, and the cursor class built on it, are imported by `load_driver`
+# when the first connection is made, not with this module: the command line
+# and the other storage backends start without them.
+_psycopg2 = None
+TimedCursor = None
+
+
+def load_driver():
+    """Imports psycopg2, unless it already was."""
+    global _psycopg2, TimedCursor
+    if TimedCursor is not None:
+        return
+    import psycopg2.extensions
+    import psycopg2.pool
+
+    class _TimedCursor(psycopg2.extensions.cursor):
+        """Cursor recording the latency and the row count of its statements.
+
+        `TournamentStore` hands these out while `metrics` are enabled.  On
+        a streaming cursor only the execution is timed, not the fetching.
+        """
+
+        def execute(self, sql, args=None):
+            start = metrics.clock()
+            try:
+                return super(_TimedCursor, self).execute(sql, args)
+            finally:
+                name = queries.statement_name(sql)
+                metrics.observe('query_seconds', metrics.clock() - start,
+                                query=name)
+                if self.rowcount >= 0:
+                    metrics.count('query_rows_total', self.rowcount,
+                                  query=name)
+
+    _psycopg2 = psycopg2
+    TimedCursor = _TimedCursor
+
+
+@metrics.timed
 def connect():
     """Connect to the PostgreSQL database.  Returns a database connection."""
-    return psycopg2.connect("dbname=tournament")
+    load_driver()
+    return _psycopg2.connect(DSN)
+
+
+class TournamentStore(storage.TournamentBackend):
+    """Tournament data access backed by a thread-safe connection pool.
+
+    Connections are opened lazily, the first time one is needed, and handed
+    back to the pool after every operation instead of being closed.  The
+    module-level functions use a shared store; see `configure`.
+
+    Args:
+        dsn: libpq connection string of the tournament database.
+        minconn: Connections the pool keeps open once created.
+        maxconn: Upper bound of open connections.  Callers block until a
+            connection is free when all of them are checked out.
+        health_check: Ping every connection with `SELECT 1` when it is
+            checked out, replacing it if the server went away.
+        cache: An optional `cache.TournamentCache` to serve standings and
+            pairing data from.  Writes through this store invalidate it.
+        states: An optional `pairing.PairingStates` that `swiss_pairings`
+            pairs from, kept up to date with the results reported through
+            this store.
+        replicas: libpq connection strings of streaming replicas of the
+            database.  Reads that do not fill the cache or the pairing
+            states are spread over them, each with a pool like this one;
+            writes always go to `dsn`.
+        read_your_writes: Make every thread read what it wrote itself.  A
+            replica is read only once it has replayed the last write of
+            the thread, waited for up to `replica_timeout` seconds;
+            otherwise the read goes to `dsn`.
+        replica_timeout: See `read_your_writes`.
+    """
+
+    def __init__(self, dsn=DSN, minconn=1, maxconn=10, health_check=False,
+                 cache=None, states=None, replicas=(), read_your_writes=False,
+                 replica_timeout=1.0):
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.health_check = health_check
+        self.cache = cache
+        self.states = states
+        self.replicas = [TournamentStore(replica, minconn, maxconn,
+                                         health_check)
+                         for replica in replicas]
+        self.read_your_writes = read_your_writes
+        self.replica_timeout = replica_timeout
+        self._pool = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._turns = itertools.count()
+        self._session = threading.local()
+        self._replayed = 0
+        # Until when this store, as a replica, is passed over.
+        self._down_until = 0
+
+    def _get_pool(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    load_driver()
+                    self._pool = _psycopg2.pool.ThreadedConnectionPool(
+                        self.minconn, self.maxconn, self.dsn)
+        return self._pool
+
+    def _is_healthy(self, db):
+        if db.closed:
+            return False
+        status = db.get_transaction_status()
+        if status == _psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        if self.health_check:
+            try:
+                curs = db.cursor()
+                curs.execute("SELECT 1;")
+                db.rollback()
+            except _psycopg2.Error:
+                return False
+        return True
+
+    def getconn(self):
+        """Check a connection out of the pool, waiting for a free one."""
+        timed = metrics.enabled
+        if timed:
+            start = metrics.clock()
+        self._slots.acquire()
+        try:
+            pool = self._get_pool()
+            db = pool.getconn()
+            while not self._is_healthy(db):
+                pool.putconn(db, close=True)
+                db = pool.getconn()
+            db.cursor_factory = TimedCursor if timed else None
+            if timed:
+                metrics.observe('connection_acquire_seconds',
+                                metrics.clock() - start)
+            return db
+        except:
+            self._slots.release()
+            raise
+
+    def putconn(self, db):
+        """Hand a connection back to the pool.
+
+        Anything left uncommitted is rolled back, and broken connections are
+        discarded instead of being reused.
+        """
+        try:
+            broken = db.closed
+            if not broken and db.get_transaction_status() != \
+                    _psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    db.rollback()
+                except _psycopg2.Error:
+                    broken = True
+            self._pool.putconn(db, close=broken)
+        finally:
+            self._slots.release()
+
+    @contextlib.contextmanager
+    def connection(self, readonly=False):
+        """Context manager lending out a pooled connection.
+
+        A `readonly` connection may be one to a replica; see `_reader`.
+        With `read_your_writes`, where the log of the primary ends is noted
+        after any other that committed.
+        """
+        if readonly:
+            store, db = self._reader()
+        else:
+            store, db = self, self.getconn()
+        try:
+            yield db
+            if not readonly and self.read_your_writes and self.replicas \
+                    and db.get_transaction_status() == \
+                    _psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                self._session.lsn = self._current_lsn(db)
+        finally:
+            store.putconn(db)
+
+    def _current_lsn(self, db):
+        try:
+            curs = db.cursor()
+            curs.execute(queries.CURRENT_LSN)
+            lsn = queries.parse_lsn(curs.fetchone()[0])
+            db.rollback()
+            return lsn
+        except _psycopg2.DatabaseError as e:
+            print('Error %s' % e)
+
+    def _reader(self):
+        """Checks out a connection to read from; returns (store, db).
+
+        The replicas take turns.  One that has not replayed the last write
+        of this thread by the deadline is passed over, and one that cannot
+        be reached is for REPLICA_RETRY seconds.  The primary is read when
+        none is left.
+        """
+        if self.replicas:
+            load_driver()
+            lsn = None
+            if self.read_your_writes:
+                lsn = getattr(self._session, 'lsn', None)
+                deadline = time.time() + self.replica_timeout
+            turn = next(self._turns)
+            for i in range(len(self.replicas)):
+                replica = self.replicas[(turn + i) % len(self.replicas)]
+                if replica._down_until > time.time():
+                    continue
+                try:
+                    db = replica.getconn()
+                except _psycopg2.OperationalError:
+                    replica._down_until = time.time() + REPLICA_RETRY
+                    continue
+                if lsn is None or replica._has_replayed(db, lsn, deadline):
+                    return replica, db
+                replica.putconn(db)
+        return self, self.getconn()
+
+    def _has_replayed(self, db, lsn, deadline):
+        """Whether the replica of `db` replayed the log up to `lsn`.
+
+        Waits for it until `deadline`.  A server that is not a replica has
+        everything.
+        """
+        curs = db.cursor()
+        while lsn > self._replayed:
+            try:
+                curs.execute(queries.REPLAY_LSN)
+                replayed = queries.parse_lsn(curs.fetchone()[0])
+                db.rollback()
+            except _psycopg2.DatabaseError as e:
+                print('Error %s' % e)
+                return False
+            if replayed is None:
+                return True
+            self._replayed = max(self._replayed, replayed)
+            if lsn > replayed:
+                if time.time() >= deadline:
+                    return False
+                time.sleep(REPLAY_POLL)
+        return True
+
+    def close(self):
+        """Close every connection held by the pool and the replicas'."""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+        for replica in self.replicas:
+            replica.close()
+
+    def _notify(self, curs, tournament_id):
+        """Queues a notification of the change, sent on commit."""
+        payload = '*' if tournament_id is None else str(tournament_id)
+        curs.execute(queries.NOTIFY, (NOTIFY_CHANNEL, payload))
+
+    def _changed(self, tournament_id, results=None):
+        """See `storage.TournamentBackend._changed`."""
+        if self.cache is not None:
+            self.cache.invalidate(tournament_id)
+        storage.TournamentBackend._changed(self, tournament_id, results)
+
+    def delete_matches(self, tournament_id):
+        """See `delete_matches`."""
+        with self.connection() as db:
+            try:
+                curs = db.cursor()
+                curs.execute(queries.DELETE_MATCHES, {'t_id': tournament_id})
+                self._notify(curs, tournament_id)
+                db.commit()
+                self._changed(tournament_id)
+            except _psycopg2.DatabaseError as e:
+                print('Error %s' % e)
+
+    def delete_tournament(self, tournament_id):
+        """See `delete_tournament`."""
+        with self.connection() as db:
+            try:
+                curs = db.cursor()
+                curs.execute(queries.DELETE_TOURNAMENT,
+                             {'t_id': tournament_id})
+                self._notify(curs, tournament_id)
+                db.commit()
+                self._changed(tournament_id)
+            except _psycopg2.DatabaseError as e:
+                print('Error %s' % e)
+
+    def delete_players(self):
+        """See `delete_players`."""
+        with self.connection() as db:
+            try:
+                curs = db.cursor()
+                curs.execute(queries.DELETE_PLAYERS)
+                self._notify(curs, None)
+                db.commit()
+                self._changed(None)
+            except _psycopg2.DatabaseError as e:
+                print('Error %s' % e)
+
+    def delete_tournament_players(self, tournament_id):
+        """See `delete_tournament_players`."""
+        with self.connection() as db:
+            try:
+                curs = db.cursor()
+                curs.execute(queries.DELETE_TOURNAMENT_PLAYERS,
+                             {'t_id': tournament_id})
+                self._notify(curs, tournament_id)
+                db.commit()
+                self._changed(tournament_id)
+            except _psycopg2.DatabaseError as e:
+                print('Error %s' % e)
+
+    def count_players(self, tournament_id):
+        """See `count_players`."""
+        with self.connection(readonly=True) as db:
+            try:
+                curs = db.cursor()
+                curs.execute(queries.COUNT_PLAYERS, (tournament_id,))
+                result = curs.fetchone()
+                return result[0]
+            except _psycopg2.DatabaseError as e:
+                print('Error %s' % e)
+
+    def register_player(self, name):
+        """See `register_player`."""
+        with self.connection() as db:
+            try:
+                curs = db.cursor()
+                curs.execute(queries.REGISTER_PLAYER, (name,))
+                db.commit()
+                player_id = curs.fetchone()
+                return player_id[0]
+            except _psycopg2.DatabaseError as e:
+                print('Error %s' % e)
+
+    def register_players(self, names, tournament_id=None):
+        """See `register_players`."""
+        names = list(names)
+        if not names:
+            return []
+        with self.connection() as db:
+            try:
+                curs = db.cursor()
+                curs.execute(queries.RESERVE_PLAYER_IDS, (len(names),))
+                player_ids = [row[0] for row in curs.fetchall()]
+                params = {'t_id': tournament_id, 'ids': player_ids,
+                          'names': names}
+                sql = queries.INSERT_PLAYERS
+                if tournament_id is not None:
+                    sql += queries.ENROLL_PLAYERS
+                curs.execute(sql, params)
+                if tournament_id is not None:
+                    self._notify(curs, tournament_id)
+                db.commit()
+                if tournament_id is not None:
+                    self._changed(tournament_id)
+                return player_ids
+            except _psycopg2.DatabaseError as e:
+                print('Error %s' % e)
+
+    def register_tournament(self, tournament_name):
+        """See `register_tournament`."""
+        with self.connection() as db:
+            try:
+                curs = db.cursor()
+                curs.execute(queries.REGISTER_TOURNAMENT, (tournament_name,))
+                db.commit()
+                tournament_id = curs.fetchone()
+                return tournament_id[0]
+            except _psycopg2.DatabaseError as e:
+                print('Error %s' % e)
+                return None
+
+    def register_player_in_tournament(self, tournament_id, player_id):
+        """See `register_player_in_tournament`."""
+        with self.connection() as db:
+            try:
+                curs = db.cursor()
+                curs.execute(queries.REGISTER_PLAYER_IN_TOURNAMENT,
+                             {'t_id': tournament_id, 'p_id': player_id})
+                self._notify(curs, tournament_id)
+                db.commit()
+                self._changed(tournament_id)
+            except _psycopg2.DatabaseError as e:
+                print('E Error %s' % e)
+
+    def player_standings(self, tournament_id):
+        """See `player_standings`."""
+        if self.cache is not None:
+            data = self.pairing_data(tournament_id)
+            return data[0] if data is not None else None
+        with self.connection(readonly=True) as db:
+            try:
+                curs = db.cursor()
+                curs.execute(queries.PLAYER_STANDINGS, (tournament_id,))
+                result = curs.fetchall()
+                return result
+            except _psycopg2.DatabaseError as e:
+                print('Error %s' % e)
+
+    def report_match(self, tournament_id, winner, loser):
+        """See `report_match`."""
+        with self._reporting(tournament_id), self.connection() as db:
+            try:
+                curs = db.cursor()
+                curs.execute(queries.REPORT_MATCH,
+                             {'t_id': tournament_id, 'winner': winner,
+                              'loser': loser})
+                self._notify(curs, tournament_id)
+                db.commit()
+                self._changed(tournament_id, [(winner, loser)])
+            except _psycopg2.DatabaseError as e:
+                print('Error %s' % e)
+
+    def report_matches(self, tournament_id, results):
+        """See `report_matches`."""
+        results = list(results)
+        if not results:
+            return []
+        with self._reporting(tournament_id), self.connection() as db:
+            try:
+                curs = db.cursor()
+                curs.execute(queries.RESERVE_MATCH_IDS, (len(results),))
+                match_ids = [row[0] for row in curs.fetchall()]
+                curs.execute(queries.REPORT_MATCHES,
+                             queries.report_matches_params(
+                                 tournament_id, match_ids, results))
+                self._notify(curs, tournament_id)
+                db.commit()
+                self._changed(tournament_id, results)
+                return match_ids
+            except _psycopg2.DatabaseError as e:
+                print('Error %s' % e)
+
+    def match_history(self, tournament_id):
+        """See `match_history`."""
+        with self.connection(readonly=True) as db:
+            try:
+                curs = db.cursor()
+                curs.execute(queries.MATCH_HISTORY, (tournament_id,))
+                return curs.fetchall()
+            except _psycopg2.DatabaseError as e:
+                print('Error %s' % e)
+
+    def _stream(self, sql, args, itersize):
+        """Yields the rows of a query from a server-side cursor.
+
+        The connection stays checked out until the rows run out or the
+        generator is closed.
+        """
+        with self.connection(readonly=True) as db:
+            try:
+                curs = db.cursor(name='tournament_stream')
+                curs.itersize = itersize
+                curs.execute(sql, args)
+                for row in curs:
+                    yield row
+                curs.close()
+            except _psycopg2.DatabaseError as e:
+                print('Error %s' % e)
+
+    def iter_standings(self, tournament_id, itersize=ITERSIZE):
+        """See `iter_standings`."""
+        return self._stream(queries.PLAYER_STANDINGS, (tournament_id,),
+                            itersize)
+
+    def iter_match_history(self, tournament_id, itersize=ITERSIZE):
+        """See `iter_match_history`."""
+        return self._stream(queries.ALL_MATCHES, (tournament_id,),
+                            itersize)
+
+    def players_with_bye_games(self, tournament_id):
+        """See `players_with_bye_games`."""
+        with self.connection(readonly=True) as db:
+            try:
+                curs = db.cursor()
+                curs.execute(queries.PLAYERS_WITH_BYE_GAMES, (tournament_id,))
+                result = curs.fetchall()
+                return [x[0] for x in result]
+            except _psycopg2.DatabaseError as e:
+                print('Error %s' % e)
+
+    def _round_write(self, sql, tournament_id, missing=None):
+        """Opens or closes a round; returns its number.
 
+        `missing` is printed as an error when there is no such round.
+        """
+        with self.connection() as db:
+            try:
+                curs = db.cursor()
+                curs.execute(sql, {'t_id': tournament_id})
+                result = curs.fetchone()
+                self._notify(curs, tournament_id)
+                db.commit()
+                if result is not None:
+                    return result[0]
+                if missing is not None:
+                    print('Error %s' % missing)
+            except _psycopg2.DatabaseError as e:
+                print('Error %s' % e)
 
+    def open_round(self, tournament_id):
+        """See `open_round`."""
+        return self._round_write(
+            queries.OPEN_ROUND, tournament_id,
+            'a round of tournament %s is still open' % tournament_id)
+
+    def close_round(self, tournament_id):
+        """See `close_round`."""
+        return self._round_write(queries.CLOSE_ROUND, tournament_id)
+
+    def current_round(self, tournament_id):
+        """See `current_round`."""
+        with self.connection(readonly=True) as db:
+            try:
+                curs = db.cursor()
+                curs.execute(queries.CURRENT_ROUND, (tournament_id,))
+                result = curs.fetchone()
+                return result[0] if result is not None else None
+            except _psycopg2.DatabaseError as e:
+                print('Error %s' % e)
+
+    def rounds(self, tournament_id):
+        """See `rounds`."""
+        with self.connection(readonly=True) as db:
+            try:
+                curs = db.cursor()
+                curs.execute(queries.ROUNDS, (tournament_id,))
+                return curs.fetchall()
+            except _psycopg2.DatabaseError as e:
+                print('Error %s' % e)
+
+    def round_results(self, tournament_id, round):
+        """See `round_results`."""
+        with self.connection(readonly=True) as db:
+            try:
+                curs = db.cursor()
+                curs.execute(queries.ROUND_RESULTS,
+                             {'t_id': tournament_id, 'round': round})
+                return curs.fetchall()
+            except _psycopg2.DatabaseError as e:
+                print('Error %s' % e)
+
+    def unpaired_players(self, tournament_id, round):
+        """See `unpaired_players`."""
+        with self.connection(readonly=True) as db:
+            try:
+                curs = db.cursor()
+                curs.execute(queries.UNPAIRED_PLAYERS,
+                             {'t_id': tournament_id, 'round': round})
+                return [x[0] for x in curs.fetchall()]
+            except _psycopg2.DatabaseError as e:
+                print('Error %s' % e)
+
+    def standings_at(self, tournament_id, round):
+        """See `standings_at`."""
+        with self.connection(readonly=True) as db:
+            try:
+                curs = db.cursor()
+                curs.execute(queries.STANDINGS_AT,
+                             {'t_id': tournament_id, 'round': round})
+                return curs.fetchall()
+            except _psycopg2.DatabaseError as e:
+                print('Error %s' % e)
+
+    def pairing_data(self, tournament_id):
+        """See `pairing_data`."""
+        if self.cache is None:
+            return self._read_pairing_data(tournament_id)
+        data = self.compact_pairing_data(tournament_id)
+        if data is None:
+            return None
+        return records.expand_pairing_data(data)
+
+    def compact_pairing_data(self, tournament_id):
+        """See `storage.TournamentBackend.compact_pairing_data`."""
+        def read(tournament_ids):
+            data = self._read_pairing_data(tournament_ids[0])
+            return {tournament_ids[0]: data} if data is not None else None
+        found = self._compact_pairing_data([tournament_id], read)
+        return found[tournament_id] if found is not None else None
+
+    def _compact_pairing_data(self, tournament_ids, read):
+        """Returns compact pairing data by tournament id, through the cache.
+
+        The cache keeps the compact form; `read` is called with the ids of
+        the tournaments it misses and returns their data as tuples.
+        """
+        found = {}
+        missing = []
+        for t_id in tournament_ids:
+            data = self.cache.get(t_id) if self.cache is not None else None
+            if data is None:
+                missing.append(t_id)
+            else:
+                found[t_id] = data
+        if missing:
+            version = self.cache.version() if self.cache is not None else None
+            read_data = read(missing)
+            if read_data is None:
+                return None
+            for t_id, parts in read_data.items():
+                data = records.compact_pairing_data(*parts)
+                if self.cache is not None:
+                    self.cache.put(t_id, data, version)
+                found[t_id] = data
+        return found
+
+    def _replica_safe(self):
+        """Whether pairing data may be read from a replica.
+
+        Not when it fills the cache or the pairing states: what a lagging
+        replica returns would be kept after the write it misses dropped it.
+        """
+        return self.cache is None and self.states is None
+
+    def _read_pairing_data(self, tournament_id):
+        with self.connection(readonly=self._replica_safe()) as db:
+            try:
+                curs = db.cursor()
+                curs.execute(queries.PAIRING_DATA, {'t_id': tournament_id})
+                return queries.split_pairing_data(curs.fetchall())
+            except _psycopg2.DatabaseError as e:
+                print('Error %s' % e)
+
+    def ranking_data(self, tournament_id):
+        """See `storage.TournamentBackend.ranking_data`."""
+        with self.connection(readonly=True) as db:
+            try:
+                curs = db.cursor()
+                curs.execute(queries.RANKING_DATA, {'t_id': tournament_id})
+                standings, results, _ = \
+                    queries.split_pairing_data(curs.fetchall())
+                return standings, results
+            except _psycopg2.DatabaseError as e:
+                print('Error %s' % e)
+
+    def pairing_data_many(self, tournament_ids):
+        """See `pairing_data_many`."""
+        tournament_ids = list(tournament_ids)
+        if self.cache is None:
+            return self._read_pairing_data_many(tournament_ids)
+        found = self.compact_pairing_data_many(tournament_ids)
+        if found is None:
+            return None
+        return dict((t_id, records.expand_pairing_data(data))
+                    for t_id, data in found.items())
+
+    def compact_pairing_data_many(self, tournament_ids):
+        """See `storage.TournamentBackend.compact_pairing_data_many`."""
+        return self._compact_pairing_data(list(tournament_ids),
+                                          self._read_pairing_data_many)
+
+    def _read_pairing_data_many(self, tournament_ids):
+        with self.connection(readonly=self._replica_safe()) as db:
+            try:
+                curs = db.cursor()
+                curs.execute(queries.PAIRING_DATA_MANY,
+                             {'t_ids': tournament_ids})
+                return queries.split_pairing_data_many(tournament_ids,
+                                                       curs.fetchall())
+            except _psycopg2.DatabaseError as e:
+                print('Error %s' % e)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def configure(dsn=DSN, minconn=1, maxconn=10, health_check=False,
+              cache=None, states=None, replicas=(), read_your_writes=False):
+    """Replaces the store used by the module-level functions.
+
+    The connections of the previous store are closed.  See `TournamentStore`
+    for the meaning of the arguments; pass a `cache.TournamentCache` as
+    `cache` to serve standings and pairing data from memory, a
+    `pairing.PairingStates` as `states` to pair incrementally, and the
+    connection strings of replicas as `replicas` to read from them.
+
+    Returns:
+        store: The new `TournamentStore`
+    """
+    global _store
+    with _store_lock:
+        if _store is not None:
+            _store.close()
+        _store = TournamentStore(dsn, minconn, maxconn, health_check, cache,
+                                 states, replicas, read_your_writes)
+        return _store
+
+
+def use_store(store):
+    """Makes the module-level functions use another storage backend.
+
+    The connections of the previous store are closed.
+
+    Args:
+        store: Any `storage.TournamentBackend`, e.g. a
+            `memory_store.MemoryTournamentStore` or a
+            `sqlite_store.SQLiteTournamentStore`.
+
+    Returns:
+        store: The store passed in
+    """
+    global _store
+    with _store_lock:
+        if _store is not None:
+            _store.close()
+        _store = store
+        return _store
+
+
+def get_store():
+    """Returns the store used by the module-level functions."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = TournamentStore()
+    return _store
+
+
+@metrics.timed
 def delete_matches(tournament_id):
     """Remove all the match records from the database."""
-    db = connect()
-    try:
-        sql = """
-                DELETE FROM matches WHERE id in (
-                    SELECT
-                        m_id
-                    FROM
-                        tournament_matches,matches
-                    WHERE
-                        t_id = %s);
-                """
-        curs = db.cursor()
-        curs.execute(sql, (tournament_id,))
-        db.commit()
-    except psycopg2.DatabaseError, e:
-        print 'Error %s' % e
-    finally:
-        if db:
-            db.close()
+    return get_store().delete_matches(tournament_id)
 
 
+@metrics.timed
 def delete_tournament(tournament_id):
-    """Remove all the player records from the database."""
-    db = connect()
-    try:
-        delete_tournament_players(tournament_id)
-        delete_matches(tournament_id)
-        sql = "DELETE FROM tournament where id=%s"
-        curs = db.cursor()
-        curs.execute(sql, (tournament_id,))
-        db.commit()
-    except psycopg2.DatabaseError, e:
-        print 'Error %s' % e
-    finally:
-        if db:
-            db.close()
+    """Remove a tournament with its matches, players and standings.
+
+    Everything goes in one transaction, and takes time in the size of the
+    tournament, not of the database.  The players stay registered.
+    """
+    return get_store().delete_tournament(tournament_id)
 
 
+@metrics.timed
 def delete_players():
     """Remove all the player information from the database.
 
@@ -63,37 +786,19 @@ def delete_players():
     See `delete_tournament_players` for removing players
     registered in a tournament.
     """
-    db = connect()
-    try:
-        sql = "DELETE FROM player;"
-        curs = db.cursor()
-        curs.execute(sql)
-        db.commit()
-    except psycopg2.DatabaseError, e:
-        print 'Error %s' % e
-    finally:
-        if db:
-            db.close()
+    return get_store().delete_players()
 
 
+@metrics.timed
 def delete_tournament_players(tournament_id):
     """Remove all the player records from the database.
     Args:
         tournament_id: Tournament id you want to count the players of.
     """
-    db = connect()
-    try:
-        sql = "DELETE FROM tournament_players WHERE t_id = %s;"
-        curs = db.cursor()
-        curs.execute(sql, (tournament_id,))
-        db.commit()
-    except psycopg2.DatabaseError, e:
-        print 'Error %s' % e
-    finally:
-        if db:
-            db.close()
+    return get_store().delete_tournament_players(tournament_id)
 
 
+@metrics.timed
 def count_players(tournament_id):
     """Returns the number of players currently registered.
 
@@ -103,24 +808,10 @@ def count_players(tournament_id):
     Return:
         count: Number of players in the tournament
     """
-    db = connect()
-    try:
-        sql = """SELECT
-                    COALESCE(count(p_id),0)
-                 FROM
-                    tournament_players
-                 WHERE t_id=%s"""
-        curs = db.cursor()
-        curs.execute(sql, (tournament_id,))
-        result = curs.fetchone()
-        return result[0]
-    except psycopg2.DatabaseError, e:
-        print 'Error %s' % e
-    finally:
-        if db:
-            db.close()
+    return get_store().count_players(tournament_id)
 
 
+@metrics.timed
 def register_player(name):
     """Adds a player to the player table.
 
@@ -131,22 +822,28 @@ def register_player(name):
     Returns:
       id: the of the player added
     """
-    db = connect()
-    try:
-        sql = """INSERT INTO player VALUES(DEFAULT,%s);
-                 SELECT currval('player_id_seq');"""
-        curs = db.cursor()
-        curs.execute(sql, (name,))
-        db.commit()
-        player_id = curs.fetchone()
-        return player_id[0]
-    except psycopg2.DatabaseError, e:
-        print 'Error %s' % e
-    finally:
-        if db:
-            db.close()
+    return get_store().register_player(name)
+
+
+@metrics.timed
+def register_players(names, tournament_id=None):
+    """Adds many players to the player table at once.
+
+    All players are written in a single transaction, which makes importing
+    a list of entrants, e.g. read with the `csv` module, a lot faster than
+    calling `register_player` for each of them.
+
+    Args:
+      names: An iterable of the players' full names.
+      tournament_id: When given, the players are also registered in this
+        tournament, in the same transaction.
+    Returns:
+      A list of the ids of the players added, in the order of the names.
+    """
+    return get_store().register_players(names, tournament_id)
 
 
+@metrics.timed
 def register_tournament(tournament_name):
     """Creates a tournament in the database.
 
@@ -158,47 +855,26 @@ def register_tournament(tournament_name):
     Returns:
         id: The tournament id
     """
-    db = connect()
-    try:
-        sql = """INSERT INTO tournament(name) VALUES(%s);
-                 SELECT currval('tournament_id_seq');"""
-        curs = db.cursor()
-        curs.execute(sql, (tournament_name,))
-        db.commit()
-        tournament_id = curs.fetchone()
-        return tournament_id[0]
-    except psycopg2.DatabaseError, e:
-        print 'Error %s' % e
-        return None
-    finally:
-        if db:
-            db.close()
+    return get_store().register_tournament(tournament_name)
 
 
+@metrics.timed
 def register_player_in_tournament(tournament_id, player_id):
     """Adds a player to a tournament.
 
     Links up a player with the desired tournament. A player can be assigned to
     many tournaments. Both the player and tournament needs to exist in the
-    Player and Tournament tables.
+    Player and Tournament tables. Results already reported for the player in
+    the tournament count in its standings.
 
     Args:
       tournament_id: The tournament id to register player in
       player_id: the id of the player to register
     """
-    db = connect()
-    try:
-        sql = "INSERT INTO tournament_players VALUES(%s,%s);"
-        curs = db.cursor()
-        curs.execute(sql, (tournament_id, player_id))
-        db.commit()
-    except psycopg2.DatabaseError, e:
-        print 'E Error %s' % e
-    finally:
-        if db:
-            db.close()
+    return get_store().register_player_in_tournament(tournament_id, player_id)
 
 
+@metrics.timed
 def player_standings(tournament_id):
     """Returns a list of the players and their win records, sorted by wins.
 
@@ -212,36 +888,10 @@ def player_standings(tournament_id):
         wins: the number of matches the player has won
         matches: the number of matches the player has played
     """
-    db = connect()
-    try:
-        sql = """
-            SELECT
-                tournament_players.p_id,
-                player.fullname,
-                COALESCE(winner_table.wins,0) AS wins,
-                COALESCE(winner_table.wins,0) + COALESCE(loser_table.losts, 0)
-                    AS matches
-            FROM
-                tournament_players LEFT JOIN winner_table
-                ON tournament_players.p_id = winner_table.winner_id
-                LEFT JOIN loser_table
-                ON tournament_players.p_id = loser_table.loser_id
-                LEFT JOIN player
-                on tournament_players.p_id = player.id
-            WHERE
-                tournament_players.t_id = %s
-            ORDER BY wins DESC NULLS LAST;"""
-        curs = db.cursor()
-        curs.execute(sql, (tournament_id,))
-        result = curs.fetchall()
-        return result
-    except psycopg2.DatabaseError, e:
-        print 'Error %s' % e
-    finally:
-        if db:
-            db.close()
+    return get_store().player_standings(tournament_id)
 
 
+@metrics.timed
 def report_match(tournament_id, winner, loser):
     """Records the outcome of a single match in a tournament
     between two players.
@@ -250,29 +900,33 @@ def report_match(tournament_id, winner, loser):
         tournament_id: The tournament id to log the match results to.
         winner:  the id number of the player who won
         loser:  the id number of the player who lost
+
+    The match is played in the open round of the tournament, if there is
+    one; see `open_round`.
     """
-    db = connect()
-    try:
-        sql = """
-            INSERT INTO
-                matches
-                VALUES(DEFAULT,%s,%s);
-            INSERT INTO
-                tournament_matches
-                VALUES(%s,
-                       (SELECT currval('matches_id_seq'))
-                       );
-            """
-        curs = db.cursor()
-        curs.execute(sql, (winner, loser, tournament_id))
-        db.commit()
-    except psycopg2.DatabaseError, e:
-        print 'Error %s' % e
-    finally:
-        if db:
-            db.close()
+    return get_store().report_match(tournament_id, winner, loser)
+
+
+@metrics.timed
+def report_matches(tournament_id, results):
+    """Records the outcome of many matches in a tournament at once.
+
+    All results are written in a single transaction, which is a lot faster
+    than calling `report_match` for each of them, e.g. at the end of a round.
+
+    Args:
+        tournament_id: The tournament id to log the match results to.
+        results: An iterable of (winner, loser) tuples of player ids.  For a
+            bye match loser is None.  They are played in the open round of
+            the tournament, if there is one.
 
+    Returns:
+        A list of the ids of the new matches, in the order of the results.
+    """
+    return get_store().report_matches(tournament_id, results)
 
+
+@metrics.timed
 def match_history(tournament_id):
     """Returns a list of unique pairs of players of previous matches in the
     tournament.
@@ -285,30 +939,39 @@ def match_history(tournament_id):
         id1: winner
         id2: loser
     """
-    db = connect()
-    try:
-        sql = """
-                SELECT DISTINCT
-                    winner_id,
-                    loser_id
-                FROM
-                    tournament_matches LEFT JOIN matches
-                    ON tournament_matches.m_id = matches.id
-                WHERE
-                    loser_id is not null
-                    and tournament_matches.t_id = %s
-                    and winner_id < loser_id;
-              """
-        curs = db.cursor()
-        curs.execute(sql, (tournament_id,))
-        return curs.fetchall()
-    except psycopg2.DatabaseError, e:
-        print 'Error %s' % e
-    finally:
-        if db:
-            db.close()
+    return get_store().match_history(tournament_id)
+
+
+def iter_standings(tournament_id, itersize=ITERSIZE):
+    """Yields the rows of `player_standings` one by one.
+
+    Rows are fetched from a server-side cursor, `itersize` at a time, so
+    the standings of any size take constant memory.  The store's
+    connection stays in use until the iteration ends or is closed.
+
+    Args:
+        tournament_id: The tournament id to read the standings of.
+        itersize: Rows to fetch per round trip to the database.
+    """
+    return get_store().iter_standings(tournament_id, itersize)
+
+
+def iter_match_history(tournament_id, itersize=ITERSIZE):
+    """Yields the (winner, loser) tuple of every match of a tournament.
+
+    Unlike `match_history`, byes, with loser None, and repeated results
+    are kept, in the order they were reported.  Like `iter_standings`,
+    fetches `itersize` rows at a time from a
+    server-side cursor.
+
+    Args:
+        tournament_id: The tournament id to read the matches of.
+        itersize: Rows to fetch per round trip to the database.
+    """
+    return get_store().iter_match_history(tournament_id, itersize)
 
 
+@metrics.timed
 def players_with_bye_games(tournament_id):
     """Returns a list of players who had byes.
 
@@ -321,30 +984,152 @@ def players_with_bye_games(tournament_id):
     Returns:
         A list of player id's
     """
-    db = connect()
-    try:
-        sql = """
-                SELECT DISTINCT
-                    winner_id
-                FROM
-                    tournament_matches LEFT JOIN matches
-                    ON tournament_matches.m_id = matches.id
-                WHERE
-                    loser_id is null
-                    AND tournament_matches.t_id = %s;
-              """
-        curs = db.cursor()
-        curs.execute(sql, (tournament_id,))
-        result = curs.fetchall()
-        return [x[0] for x in result]
-    except psycopg2.DatabaseError, e:
-        print 'Error %s' % e
-    finally:
-        if db:
-            db.close()
+    return get_store().players_with_bye_games(tournament_id)
+
+
+@metrics.timed
+def open_round(tournament_id):
+    """Opens the next round of a tournament.
+
+    Matches reported while the round is open are played in it.  Only one
+    round of a tournament can be open at a time.
+
+    Args:
+        tournament_id: The tournament to open a round of.
+
+    Returns:
+        The number of the round, starting at 1, or None if a round is
+        still open.
+    """
+    return get_store().open_round(tournament_id)
+
+
+@metrics.timed
+def close_round(tournament_id):
+    """Closes the open round of a tournament.
+
+    The standings are kept as they are then; see `standings_at`.  Results
+    of the round are to be reported before it is closed.
+
+    Args:
+        tournament_id: The tournament to close the round of.
+
+    Returns:
+        The number of the round closed, or None if no round was open.
+    """
+    return get_store().close_round(tournament_id)
+
+
+@metrics.timed
+def current_round(tournament_id):
+    """Returns the number of the open round of a tournament, or None."""
+    return get_store().current_round(tournament_id)
 
 
-def swiss_pairings(tournament_id):
+@metrics.timed
+def rounds(tournament_id):
+    """Returns the rounds of a tournament.
+
+    Returns:
+        A list of (round, closed) tuples, in the order of the rounds.
+    """
+    return get_store().rounds(tournament_id)
+
+
+@metrics.timed
+def round_results(tournament_id, round):
+    """Returns the results of one round of a tournament.
+
+    Args:
+        tournament_id: The tournament the round belongs to.
+        round: The number of the round.
+
+    Returns:
+        A list of (winner_id, loser_id) tuples, in the order they were
+        reported.  For a bye loser_id is None.
+    """
+    return get_store().round_results(tournament_id, round)
+
+
+@metrics.timed
+def unpaired_players(tournament_id, round):
+    """Returns the players of a tournament without a match in a round.
+
+    Args:
+        tournament_id: The tournament the round belongs to.
+        round: The number of the round.
+
+    Returns:
+        A sorted list of the ids of the registered players that have
+        neither played nor had a bye in the round.
+    """
+    return get_store().unpaired_players(tournament_id, round)
+
+
+@metrics.timed
+def standings_at(tournament_id, round):
+    """Returns the standings of a tournament as they were after a round.
+
+    They are read from the snapshot `close_round` took, one row per player,
+    without going through the matches.
+
+    Args:
+        tournament_id: The tournament the round belongs to.
+        round: The number of a closed round.
+
+    Returns:
+        A list of tuples like `player_standings` returns, or an empty list
+        if the round is not closed.
+    """
+    return get_store().standings_at(tournament_id, round)
+
+
+@metrics.timed
+def standings_diff(tournament_id, from_round, to_round):
+    """Returns how the standings changed from one round to another.
+
+    Args:
+        tournament_id: The tournament the rounds belong to.
+        from_round: The number of a closed round, or 0 for the start of
+            the tournament.
+        to_round: The number of a later closed round.
+
+    Returns:
+        A list of (id, name, wins, matches, places) tuples, one per player
+        in the standings after `to_round`, in their order:
+            wins: the number of matches the player won in between
+            matches: the number of matches the player played in between
+            places: the places the player went up, negative if down, or
+                None if the player was not registered after `from_round`
+        Players with as many wins share a place.
+    """
+    return get_store().standings_diff(tournament_id, from_round, to_round)
+
+
+@metrics.timed
+def pairing_data(tournament_id):
+    """Returns everything `swiss_pairings` needs, read in one query.
+
+    Reading it all at once is faster than calling `player_standings`,
+    `match_history` and `players_with_bye_games` in turn, and all three come
+    from the same snapshot of the database, even while results are being
+    reported.
+
+    Args:
+        tournament_id: The tournament id to read the data of.
+
+    Returns:
+        A tuple (standings, history, byes):
+            standings: as returned by `player_standings`
+            history: a list of (id1, id2) tuples of players that played each
+                other, id1 being the lower id
+            byes: as returned by `players_with_bye_games`
+    """
+    return get_store().pairing_data(tournament_id)
+
+
+@metrics.timed
+def swiss_pairings(tournament_id, mode="greedy"):
     """Returns a list of pairs of players for the next round of a match.
 
     Assuming that there are an even number of players registered, each player
@@ -357,6 +1142,17 @@ def swiss_pairings(tournament_id):
     gets assigned a bye match. A player can only have one bye match in the
     tournament.
 
+    Args:
+        tournament_id: The tournament id to pair the players of.
+        mode: "greedy" pairs each player, from the top of the standings
+            down, with the next available opponent.  "optimal" repairs the
+            greedy pairings with a maximum cardinality matching: there are
+            no rematches and no second byes, and no player ends up without
+            an opponent when a pairing for everybody exists.  Score
+            differences are not minimized; score groups are only kept
+            together heuristically, by looking for opponents near each
+            player in the standings first.
+
     Returns:
       A list of tuples, each of which contains (id1, name1, id2, name2)
         id1: the first player's unique id
@@ -364,52 +1160,75 @@ def swiss_pairings(tournament_id):
         id2: the second player's unique id
         name2: the second player's name
     """
-    temp_pairing = []
-    final_pairing = []
-    standings = player_standings(tournament_id)
-    played_players = match_history(tournament_id)
-    players_with_byes = players_with_bye_games(tournament_id)
-
-    player1_standings = [x[0] for x in standings]
-    player2_standings = [x[0] for x in standings]
-
-    # Create pairings. Here we also filter out previous parings, which
-    # implements extra credit: 'Prevent rematches between players.'
-    for player1 in player1_standings:
-        for player2 in player2_standings:
-            p2_picked = [z for z in temp_pairing
-                         if z[0] == player2 or z[1] == player2]
-            p1_picked = [z for z in temp_pairing
-                         if z[0] == player1 or z[1] == player1]
-
-            if p2_picked\
-                or p1_picked\
-                or player1 == player2\
-                or (player1, player2) in played_players\
-                    or (player2, player1) in played_players:
-                continue
-            temp_pairing.append((player1, player2))
-
-    # Create a bye game, but only if player does not already have one.
-    # It is not clearly defined what happens when a player is up for
-    # a second bye, but I'm assuming this will not happen.
-    temp_paired_players = set([x for t in temp_pairing for x in t])
-    players_to_get_free_win = set(player1_standings)-temp_paired_players
-    for x in players_to_get_free_win:
-        if x not in players_with_byes:
-            temp_pairing.append((x, None))
-
-    # Create tuple of matched player ids and names
-    for p in temp_pairing:
-        left_id = p[0]
-        right_id = p[1]
-        left_name = [x[1] for x in standings if x[0] == left_id][0]
-        #  If a bye match, the player on the right will be None
-        right_name = None
-        if right_id:
-            right_name = [x[1] for x in standings if x[0] == right_id][0]
-
-        t = (left_id, left_name, right_id, right_name)
-        final_pairing.append(t)
-
-    return final_pairing
+    return get_store().swiss_pairings(tournament_id, mode)
+
+
+@metrics.timed
+def ranked_standings(tournament_id, order=tiebreaks.TIEBREAKS):
+    """Returns the standings with tiebreaks, fully ranked.
+
+    Players are ordered by wins, then by the tiebreaks in `order`, then by
+    id.  All tiebreaks are computed from one read of the tournament's
+    matches; see `tiebreaks.compute` for their definitions.
+
+    Args:
+        tournament_id: The tournament id to rank the players of.
+        order: Names from `tiebreaks.TIEBREAKS`, in the order to break ties
+            by.
+
+    Returns:
+      A list of tuples, each of which contains (id, name, wins, matches,
+      buchholz, median_buchholz, sonneborn_berger, omw):
+        id, name, wins, matches: as returned by `player_standings`
+        buchholz: the sum of the wins of the player's opponents
+        median_buchholz: buchholz without the best and worst opponent
+        sonneborn_berger: the sum of the wins of the opponents beaten
+        omw: the average match-win percentage of the opponents
+    """
+    return get_store().ranked_standings(tournament_id, order)
+
+
+@metrics.timed
+def pairing_data_many(tournament_ids):
+    """Returns `pairing_data` of several tournaments, read in one query.
+
+    Args:
+        tournament_ids: The tournament ids to read the data of.
+
+    Returns:
+        A dict mapping each tournament id to its (standings, history, byes)
+        tuple, as returned by `pairing_data`.
+    """
+    return get_store().pairing_data_many(tournament_ids)
+
+
+@metrics.timed
+def pair_all(tournament_ids, mode="greedy", workers=None, timings=None):
+    """Returns the pairings for the next round of several tournaments.
+
+    Gives the same pairings as calling `swiss_pairings` for each tournament,
+    but reads the data of all of them in one query and pairs them in
+    parallel, in a pool of worker processes.
+
+    Args:
+        tournament_ids: The tournament ids to pair the players of.
+        mode: The pairing mode, as for `swiss_pairings`.
+        workers: Number of worker processes; defaults to one per CPU.  With
+            1, or a single tournament, the pairing runs in this process.
+        timings: An optional dict, filled with the seconds spent pairing
+            each tournament, keyed by tournament id.
+
+    Returns:
+        A dict mapping each tournament id to its pairings, as returned by
+        `swiss_pairings`.
+    """
+    return get_store().pair_all(tournament_ids, mode, workers, timings)
+
+
+if __name__ == '__main__':
+    # python -m tournament; see cli.py.  This module is registered under its
+    # name, so cli.py works on it instead of importing it a second time.
+    import sys
+    sys.modules['tournament'] = sys.modules[__name__]
+    import cli
+    sys.exit(cli.main())
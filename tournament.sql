@@ -1,4 +1,12 @@
 -- Table definitions for the tournament project.
+--
+-- This creates the latest version of the schema. Existing databases are
+-- upgraded with migrate.py instead; see the migrations folder.
+
+-- Version of the schema, the number of the last migration it includes.
+CREATE TABLE schema_version (
+    version INT NOT NULL
+);
 
 -- Players.
 CREATE TABLE player (
@@ -12,6 +20,18 @@ CREATE TABLE tournament (
     name text
 );
 
+-- Rounds of a tournament.  At most one round of a tournament is open, and
+-- the matches reported meanwhile are played in it.
+CREATE TABLE tournament_rounds (
+    t_id INT REFERENCES tournament (id) ON DELETE CASCADE,
+    round INT NOT NULL,
+    closed BOOLEAN NOT NULL DEFAULT false,
+    PRIMARY KEY (t_id, round)
+);
+
+CREATE UNIQUE INDEX tournament_rounds_open
+    ON tournament_rounds (t_id) WHERE NOT closed;
+
 -- Matches played.
 CREATE TABLE matches (
     id serial PRIMARY KEY,
@@ -19,18 +39,70 @@ CREATE TABLE matches (
     loser_id INT REFERENCES player (id)
 );
 
--- Links a match to a tournament.
+CREATE INDEX matches_winner_id ON matches (winner_id);
+CREATE INDEX matches_loser_id ON matches (loser_id);
+
+-- Links a match to a tournament, and to the round it was played in, if
+-- one was open.  Deleting the match or the tournament deletes the link.
 CREATE TABLE tournament_matches (
-    t_id INT REFERENCES tournament (id),
-    m_id INT REFERENCES matches (id) ON DELETE CASCADE
+    t_id INT REFERENCES tournament (id) ON DELETE CASCADE,
+    m_id INT REFERENCES matches (id) ON DELETE CASCADE,
+    round INT,
+    PRIMARY KEY (t_id, m_id),
+    UNIQUE (m_id),
+    FOREIGN KEY (t_id, round) REFERENCES tournament_rounds (t_id, round)
 );
 
+CREATE INDEX tournament_matches_by_round
+    ON tournament_matches (t_id, round);
+
 -- Players registered to play in a tournament.
 CREATE TABLE tournament_players (
-    t_id INT REFERENCES tournament (id),
-    p_id INT REFERENCES player (id)
+    t_id INT REFERENCES tournament (id) ON DELETE CASCADE,
+    p_id INT REFERENCES player (id),
+    PRIMARY KEY (t_id, p_id)
+);
+
+CREATE INDEX tournament_players_p_id ON tournament_players (p_id);
+
+-- Standings of the players registered in a tournament. tournament.py
+-- updates the row of each player in the same transaction that records a
+-- match, so reading the standings never has to aggregate the matches.
+CREATE TABLE tournament_standings (
+    t_id INT REFERENCES tournament (id) ON DELETE CASCADE,
+    p_id INT REFERENCES player (id),
+    wins INT NOT NULL DEFAULT 0,
+    losses INT NOT NULL DEFAULT 0,
+    byes INT NOT NULL DEFAULT 0,
+    matches INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (t_id, p_id)
+);
+
+-- Covers player_standings, which only needs to read the index.
+CREATE INDEX tournament_standings_by_wins
+    ON tournament_standings (t_id, wins DESC, p_id, matches);
+
+CREATE INDEX tournament_standings_p_id ON tournament_standings (p_id);
+
+-- Standings of a tournament as they were when each of its rounds closed;
+-- rows are only ever added, by close_round.  Deleting the round, or the
+-- players of the tournament, deletes them.
+CREATE TABLE tournament_round_standings (
+    t_id INT,
+    round INT,
+    p_id INT REFERENCES player (id),
+    wins INT NOT NULL,
+    losses INT NOT NULL,
+    byes INT NOT NULL,
+    matches INT NOT NULL,
+    PRIMARY KEY (t_id, round, p_id),
+    FOREIGN KEY (t_id, round) REFERENCES tournament_rounds (t_id, round)
+        ON DELETE CASCADE
 );
 
+CREATE INDEX tournament_round_standings_p_id
+    ON tournament_round_standings (p_id);
+
 -- View of the winning players ordered by most won.
 CREATE VIEW winner_table AS
     SELECT
@@ -48,3 +120,5 @@ CREATE VIEW loser_table AS
      FROM matches
     GROUP BY loser_id
     ORDER BY losts DESC;
+
+INSERT INTO schema_version VALUES (5);
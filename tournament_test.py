@@ -6,8 +6,18 @@
 #     - Not assuming an even number of players.
 #     - Support more than one tournament in the database.
 
+import json
 import os
-
+import sys
+import time
+from StringIO import StringIO
+
+import export
+import metrics
+from cache import TournamentCache
+from memory_store import MemoryTournamentStore
+from pairing import PairingStates
+from sqlite_store import SQLiteTournamentStore
 from tournament import *
 
 
@@ -225,7 +235,524 @@ def test_pairings_uneven(tournament_id):
     print "10. After one match, uneven amount of players" \
           " are paired correctly."
 
+def test_standings_per_tournament(tournament_id, other_tournament_id):
+    for t_id in (tournament_id, other_tournament_id):
+        delete_matches(t_id)
+        delete_tournament_players(t_id)
+    id1 = register_player("Rarity")
+    id2 = register_player("Spike")
+    for t_id in (tournament_id, other_tournament_id):
+        register_player_in_tournament(t_id, id1)
+        register_player_in_tournament(t_id, id2)
+    report_match(other_tournament_id, id1, id2)
+    for (i, n, w, m) in player_standings(tournament_id):
+        if w != 0 or m != 0:
+            raise ValueError("Matches of another tournament should not count"
+                             " in the standings.")
+    delete_matches(tournament_id)
+    if len(match_history(other_tournament_id)) != 1:
+        raise ValueError("Deleting the matches of a tournament should keep"
+                         " the matches of other tournaments.")
+    print "22. Standings and matches are kept per tournament."
+
+def test_pair_all(tournament_id, other_tournament_id):
+    for t_id in (tournament_id, other_tournament_id):
+        delete_matches(t_id)
+        delete_tournament_players(t_id)
+    ids = register_players(["Gilda", "Zecora", "Cheerilee", "Maud Pie",
+                            "Big Mac"], tournament_id)
+    register_players(["Derpy", "Lyra", "Bon Bon", "Octavia"],
+                     other_tournament_id)
+    report_matches(tournament_id, [(ids[0], ids[1]), (ids[2], ids[3])])
+    for workers in (1, 2):
+        timings = {}
+        pairings = pair_all([tournament_id, other_tournament_id],
+                            workers=workers, timings=timings)
+        for t_id in (tournament_id, other_tournament_id):
+            if pairings[t_id] != swiss_pairings(t_id):
+                raise ValueError("pair_all() should pair each tournament"
+                                 " like swiss_pairings() does.")
+        if sorted(timings) != sorted([tournament_id, other_tournament_id]):
+            raise ValueError("pair_all() should time every tournament.")
+    print "23. Several tournaments can be paired at once."
+
+def test_delete_tournament(tournament_id):
+    delete_matches(tournament_id)
+    delete_tournament_players(tournament_id)
+    doomed_id = register_tournament("Doomed")
+    ids = register_players(["Chrysalis", "Sombra", "Tirek", "Cozy Glow"],
+                           doomed_id)
+    register_player_in_tournament(tournament_id, ids[0])
+    register_player_in_tournament(tournament_id, ids[2])
+    report_matches(doomed_id, [(ids[0], ids[1]), (ids[2], ids[3])])
+    report_match(tournament_id, ids[2], ids[0])
+    delete_tournament(doomed_id)
+    if match_history(doomed_id) or count_players(doomed_id) != 0 or \
+            player_standings(doomed_id):
+        raise ValueError("Deleting a tournament should delete its matches,"
+                         " players and standings.")
+    if match_history(tournament_id) != [(ids[2], ids[0])] or \
+            count_players(tournament_id) != 2:
+        raise ValueError("Deleting a tournament should keep the other"
+                         " tournaments.")
+    print "24. A tournament is deleted with everything in it."
+
+def test_metrics(tournament_id):
+    delete_matches(tournament_id)
+    delete_tournament_players(tournament_id)
+    ids = register_players(["Shining Armor", "Cadance", "Flurry Heart"],
+                           tournament_id)
+    metrics.reset()
+    metrics.enable()
+    try:
+        report_matches(tournament_id, [(ids[0], ids[1]), (ids[2], None)])
+        player_standings(tournament_id)
+        swiss_pairings(tournament_id)
+    finally:
+        metrics.disable()
+    snapshot = metrics.snapshot()
+    histograms = dict((h['name'], h) for h in snapshot['histograms']
+                      if not h['labels'])
+    series = set((h['name'],) + tuple(h['labels'].values())
+                 for h in snapshot['histograms'])
+    counters = dict(((c['name'],) + tuple(c['labels'].values()), c['value'])
+                    for c in snapshot['counters'])
+    for name in (('function_seconds', 'report_matches'),
+                 ('function_seconds', 'swiss_pairings'),
+                 ('query_seconds', 'REPORT_MATCHES'),
+                 ('query_seconds', 'PAIRING_DATA')):
+        if name not in series:
+            raise ValueError("%s should be timed." % (name,))
+    if histograms['connection_acquire_seconds']['count'] != 3:
+        raise ValueError("Checking out connections should be timed.")
+    if counters[('query_rows_total', 'PLAYER_STANDINGS')] != 3 or \
+            counters[('pairing_iterations_total', 'greedy')] != 3:
+        raise ValueError("Rows and pairing iterations should be counted.")
+    print "25. Functions, queries and connections are timed when enabled."
+
+def test_incremental_pairings(tournament_id):
+    delete_matches(tournament_id)
+    delete_tournament_players(tournament_id)
+    register_players(["Pinkie Pie", "Maud Pie", "Limestone Pie", "Marble Pie",
+                      "Cheese Sandwich"], tournament_id)
+    store = get_store()
+    store.states = PairingStates()
+    try:
+        for _ in range(3):
+            pairs = swiss_pairings(tournament_id)
+            states, store.states = store.states, None
+            expected = swiss_pairings(tournament_id)
+            store.states = states
+            if pairs != expected:
+                raise ValueError("Pairing incrementally should pair like"
+                                 " reading everything again.")
+            report_matches(tournament_id, [(p[0], p[2]) for p in pairs])
+            if store.states.get(tournament_id) is None:
+                raise ValueError("Reported results should be applied to"
+                                 " the pairing state.")
+        register_player_in_tournament(tournament_id,
+                                      register_player("Sugar Belle"))
+        if store.states.get(tournament_id) is not None:
+            raise ValueError("Other changes should drop the pairing state.")
+    finally:
+        store.states = None
+    print "18. Rounds are paired from a state kept up to date."
+
+def test_rounds(tournament_id):
+    delete_matches(tournament_id)
+    delete_tournament_players(tournament_id)
+    ids = register_players(["Coloratura", "Svengallop", "Sapphire Shores",
+                            "Photo Finish"], tournament_id)
+    report_match(tournament_id, ids[0], ids[1])
+    if open_round(tournament_id) != 1 or current_round(tournament_id) != 1:
+        raise ValueError("The first round should be round 1.")
+    stdout, sys.stdout = sys.stdout, StringIO()
+    try:
+        reopened = open_round(tournament_id)
+        printed = sys.stdout.getvalue()
+    finally:
+        sys.stdout = stdout
+    if reopened is not None or 'still open' not in printed or \
+            'duplicate' in printed or 'UNIQUE' in printed:
+        raise ValueError("Opening a round while one is open should return"
+                         " None, and not fail on the index.")
+    report_matches(tournament_id, [(ids[2], ids[3])])
+    if round_results(tournament_id, 1) != [(ids[2], ids[3])]:
+        raise ValueError("Only matches of the round should be its results.")
+    if unpaired_players(tournament_id, 1) != sorted(ids[:2]):
+        raise ValueError("Players without a match in the round should be"
+                         " unpaired.")
+    report_match(tournament_id, ids[1], ids[0])
+    if close_round(tournament_id) != 1 or \
+            current_round(tournament_id) is not None or \
+            close_round(tournament_id) is not None:
+        raise ValueError("Closing the round should leave none open.")
+    open_round(tournament_id)
+    report_match(tournament_id, ids[3], None)
+    if round_results(tournament_id, 2) != [(ids[3], None)] or \
+            unpaired_players(tournament_id, 2) != sorted(ids[:3]) or \
+            len(round_results(tournament_id, 1)) != 2:
+        raise ValueError("Results should be kept by round.")
+    if rounds(tournament_id) != [(1, True), (2, False)]:
+        raise ValueError("rounds() should list every round.")
+    delete_matches(tournament_id)
+    if rounds(tournament_id) != []:
+        raise ValueError("Deleting the matches should delete the rounds.")
+    print "19. Matches are played in rounds, looked up by round."
+
+def test_replicas(tournament_id, replica):
+    delete_matches(tournament_id)
+    delete_tournament_players(tournament_id)
+    # The first replica cannot be reached, so reads go to the second.
+    store = TournamentStore(replicas=["dbname=tournament port=1", replica],
+                            read_your_writes=True)
+    attempts = []
+    getconn = store.replicas[0].getconn
+    store.replicas[0].getconn = lambda: attempts.append(1) or getconn()
+    ids = store.register_players(["Trixie", "Starlight Glimmer",
+                                  "Sunburst"], tournament_id)
+    store.report_matches(tournament_id, [(ids[0], ids[1]), (ids[2], None)])
+    if store.count_players(tournament_id) != 3 or \
+            store.match_history(tournament_id) != [(ids[0], ids[1])] or \
+            store.players_with_bye_games(tournament_id) != [ids[2]]:
+        raise ValueError("Reads should see the writes of the same thread.")
+    store.report_match(tournament_id, ids[1], ids[2])
+    if [row[2] for row in store.player_standings(tournament_id)] != \
+            [1, 1, 1]:
+        raise ValueError("Standings should see the last match reported.")
+    if store.replicas[1]._pool is None or \
+            store.replicas[0]._pool is not None:
+        raise ValueError("Reads should go to the replica that is up.")
+    if len(attempts) != 1:
+        raise ValueError("A replica that is down should not be tried again"
+                         " at once.")
+    store.close()
+    print "26. Reads go to replicas, and see the writes before them."
+
+def test_standings_snapshots(tournament_id):
+    delete_matches(tournament_id)
+    delete_tournament_players(tournament_id)
+    ids = register_players(["Spoiled Rich", "Filthy Rich", "Sugar Belle",
+                            "Party Favor"], tournament_id)
+    open_round(tournament_id)
+    report_matches(tournament_id, [(ids[0], ids[1]), (ids[2], ids[3])])
+    close_round(tournament_id)
+    after_one = player_standings(tournament_id)
+    open_round(tournament_id)
+    report_matches(tournament_id, [(ids[3], ids[0]), (ids[1], ids[2])])
+    if standings_at(tournament_id, 2) != []:
+        raise ValueError("An open round should have no snapshot.")
+    close_round(tournament_id)
+    if standings_at(tournament_id, 1) != after_one or \
+            standings_at(tournament_id, 2) != \
+            player_standings(tournament_id):
+        raise ValueError("Each round closed should keep its standings.")
+    diff = standings_diff(tournament_id, 1, 2)
+    if [row[0] for row in diff] != sorted(ids) or \
+            [row[2:] for row in diff] != [(0, 1, 0), (1, 1, 2),
+                                          (0, 1, 0), (1, 1, 2)]:
+        raise ValueError("The diff should have the wins, matches and"
+                         " places gained between the rounds.")
+    if [row[2:] for row in standings_diff(tournament_id, 0, 2)] != \
+            [(1, 2, None)] * 4:
+        raise ValueError("Diffing from round 0 should count everything.")
+    delete_matches(tournament_id)
+    if standings_at(tournament_id, 1) != []:
+        raise ValueError("Deleting the matches should delete the"
+                         " snapshots.")
+    print "20. Standings are kept when a round closes, and diffed."
+
+def test_ranked_standings(tournament_id):
+    delete_matches(tournament_id)
+    delete_tournament_players(tournament_id)
+    ids = register_players(["Sweetie Belle", "Scootaloo", "Babs Seed",
+                            "Diamond Tiara", "Silver Spoon"], tournament_id)
+    report_matches(tournament_id, [(ids[4], ids[0]), (ids[1], ids[2]),
+                                   (ids[3], None)])
+    report_matches(tournament_id, [(ids[4], ids[1]), (ids[2], ids[3]),
+                                   (ids[0], None)])
+    ranked = ranked_standings(tournament_id)
+    if [row[0] for row in ranked] != [ids[4], ids[1], ids[2], ids[0],
+                                      ids[3]]:
+        raise ValueError("Players with as many wins should be ranked by"
+                         " tiebreaks.")
+    if ranked[0][4:7] != (2, 2, 2):
+        raise ValueError("Tiebreaks should be computed from the matches of"
+                         " the tournament.")
+    outsider = register_player("Lightning Dust")
+    report_match(tournament_id, outsider, ids[0])
+    ranked = ranked_standings(tournament_id)
+    if ranked is None or outsider in [row[0] for row in ranked]:
+        raise ValueError("Matches against players outside the tournament"
+                         " should be left out of the tiebreaks.")
+    print "17. Standings are ranked with tiebreaks."
+
+def test_streaming_export(tournament_id):
+    delete_matches(tournament_id)
+    delete_tournament_players(tournament_id)
+    ids = register_players(["Lightning Dust", "Soarin", "Spitfire",
+                            "Fleetfoot", "Wind Rider"], tournament_id)
+    # A bye and a pairing played twice, which match_history leaves out.
+    results = [(ids[0], ids[1]), (ids[2], ids[3]), (ids[4], None),
+               (ids[1], ids[2]), (ids[1], ids[0])]
+    report_matches(tournament_id, results)
+    if list(iter_standings(tournament_id, itersize=2)) != \
+            player_standings(tournament_id):
+        raise ValueError("iter_standings() should yield the standings.")
+    if list(iter_match_history(tournament_id, itersize=2)) != results:
+        raise ValueError("iter_match_history() should yield every match, in"
+                         " the order reported.")
+    out = StringIO()
+    if export.export_standings(tournament_id, out) != 5 or \
+            len(out.getvalue().splitlines()) != 6:
+        raise ValueError("The CSV export should have a header and a line"
+                         " per player.")
+    out = StringIO()
+    export.export_match_history(tournament_id, out, 'jsonl')
+    exported = [json.loads(line) for line in out.getvalue().splitlines()]
+    if [(m['winner_id'], m['loser_id']) for m in exported] != results:
+        raise ValueError("The JSON lines export should have every match.")
+    print "21. Standings and matches are streamed and exported."
+
+def test_report_many_matches(tournament_id):
+    delete_matches(tournament_id)
+    delete_tournament_players(tournament_id)
+    for name in ("Starlight Glimmer", "Trixie", "Sunset Shimmer",
+                 "Tempest Shadow", "Discord"):
+        register_player_in_tournament(tournament_id, register_player(name))
+    standings = player_standings(tournament_id)
+    [id1, id2, id3, id4, id5] = [row[0] for row in standings]
+    match_ids = report_matches(tournament_id,
+                               [(id1, id2), (id3, id4), (id5, None)])
+    if len(match_ids) != 3 or len(set(match_ids)) != 3:
+        raise ValueError("report_matches should return one id per match.")
+    for (i, n, w, m) in player_standings(tournament_id):
+        if m != 1:
+            raise ValueError("Each player should have one match recorded.")
+        if i in (id1, id3, id5) and w != 1:
+            raise ValueError("Each match winner should have one win recorded.")
+        elif i in (id2, id4) and w != 0:
+            raise ValueError("Each match loser should have zero"
+                             " wins recorded.")
+    if players_with_bye_games(tournament_id) != [id5]:
+        raise ValueError("A bye reported in bulk should be recorded.")
+    print "11. Many matches can be reported at once."
+
+def test_register_many_players(tournament_id):
+    delete_matches(tournament_id)
+    delete_tournament_players(tournament_id)
+    names = ["Princess Celestia", "Princess Luna", "Tab\tand\\slash"]
+    ids = register_players(names, tournament_id)
+    if len(ids) != 3 or count_players(tournament_id) != 3:
+        raise ValueError("register_players should register every player.")
+    registered = dict((row[0], row[1])
+                      for row in player_standings(tournament_id))
+    if [registered[i] for i in ids] != names:
+        raise ValueError("register_players should return the ids in the"
+                         " order of the names.")
+    print "12. Many players can be registered at once."
+
+def test_register_after_matches(tournament_id):
+    delete_matches(tournament_id)
+    delete_tournament_players(tournament_id)
+    ids = register_players(["Moondancer", "Minuette"], tournament_id)
+    late = register_player("Lemon Hearts")
+    report_matches(tournament_id, [(late, ids[0]), (ids[1], late),
+                                   (late, None)])
+    register_player_in_tournament(tournament_id, late)
+    standings = dict((row[0], row[2:]) for row in
+                     player_standings(tournament_id))
+    if standings[late] != (2, 3):
+        raise ValueError("Results reported before a player registered"
+                         " should count in the standings.")
+    if standings[ids[0]] != (0, 1) or standings[ids[1]] != (1, 1):
+        raise ValueError("Registering a player should not change the"
+                         " standings of the others.")
+    print "13. Players registered late keep the results they already have."
+
+def test_pairing_data(tournament_id):
+    delete_matches(tournament_id)
+    delete_tournament_players(tournament_id)
+    ids = register_players(["Rainbow Dash", "Scootaloo", "Sweetie Belle",
+                            "Gilda", "Derpy"], tournament_id)
+    report_matches(tournament_id, [(ids[1], ids[0]), (ids[3], ids[2]),
+                                   (ids[4], None)])
+    standings, history, byes = pairing_data(tournament_id)
+    if standings != player_standings(tournament_id):
+        raise ValueError("pairing_data should return the standings.")
+    if set(frozenset(p) for p in history) != \
+            set(frozenset(p) for p in match_history(tournament_id)):
+        raise ValueError("pairing_data should return the match history.")
+    if byes != players_with_bye_games(tournament_id):
+        raise ValueError("pairing_data should return the players with byes.")
+
+    class FailingStore(MemoryTournamentStore):
+        """Store whose pairing data cannot be read."""
+
+        def pairing_data(self, tournament_id):
+            return None
+
+    if FailingStore().swiss_pairings(tournament_id) is not None:
+        raise ValueError("swiss_pairings should return None when the pairing"
+                         " data cannot be read.")
+    print "14. Pairing data is read in a single query."
+
+
+def test_cached_standings(tournament_id):
+    delete_matches(tournament_id)
+    delete_tournament_players(tournament_id)
+    store = TournamentStore(cache=TournamentCache())
+    [id1, id2] = store.register_players(["Cheerilee", "Mayor Mare"],
+                                        tournament_id)
+    store.player_standings(tournament_id)
+    store.player_standings(tournament_id)
+    if store.cache.stats()['hits'] != 1:
+        raise ValueError("Standings should be served from the cache.")
+    store.report_match(tournament_id, id1, id2)
+    standings = store.player_standings(tournament_id)
+    if standings != player_standings(tournament_id) or standings[0][2] != 1:
+        raise ValueError("Reporting a match should refresh the cache.")
+    store.close()
+    print "15. Cached standings are refreshed when a match is reported."
+
+
+def test_change_notifications(tournament_id):
+    delete_matches(tournament_id)
+    delete_tournament_players(tournament_id)
+    from listener import TournamentListener
+    changed = []
+    listener = TournamentListener(callbacks=[changed.append])
+    listener.listen()
+    [id1, id2] = register_players(["Maud Pie", "Limestone Pie"],
+                                  tournament_id)
+    report_match(tournament_id, id1, id2)
+    deadline = time.time() + 5
+    while len(changed) < 2 and time.time() < deadline:
+        listener.poll(0.1)
+    listener.stop()
+    if changed != [tournament_id, tournament_id]:
+        raise ValueError("Writes should notify the tournament they changed.")
+    print "16. Writes notify listeners of the tournament they changed."
+
+
+def load_matches(curs, tournaments, players, matches):
+    """Fills the database with `matches` matches spread over `tournaments`
+    tournaments of `players` players each."""
+    curs.execute("""
+        INSERT INTO tournament(name)
+            SELECT 'Explain' FROM generate_series(1, %(t)s);
+        INSERT INTO player(fullname)
+            SELECT 'Explain' FROM generate_series(1, %(t)s * %(p)s);
+        """, {'t': tournaments, 'p': players})
+    curs.execute("""
+        SELECT
+            (SELECT max(id) FROM tournament) - %(t)s + 1,
+            (SELECT max(id) FROM player) - %(t)s * %(p)s + 1,
+            (SELECT COALESCE(max(id), 0) FROM matches) + 1;
+        """, {'t': tournaments, 'p': players})
+    t0, p0, m0 = curs.fetchone()
+    curs.execute("""
+        INSERT INTO tournament_players
+            SELECT %(t0)s + g / %(p)s, %(p0)s + g
+            FROM generate_series(0, %(t)s * %(p)s - 1) g;
+        INSERT INTO tournament_standings(t_id, p_id)
+            SELECT t_id, p_id FROM tournament_players WHERE t_id >= %(t0)s;
+        INSERT INTO matches
+            SELECT %(m0)s + g,
+                   %(p0)s + (g %% %(t)s) * %(p)s + (g / %(t)s) %% %(p)s,
+                   %(p0)s + (g %% %(t)s) * %(p)s + (g / %(t)s + 1) %% %(p)s
+            FROM generate_series(0, %(m)s - 1) g;
+        INSERT INTO tournament_matches
+            SELECT %(t0)s + g %% %(t)s, %(m0)s + g
+            FROM generate_series(0, %(m)s - 1) g;
+        ANALYZE;
+        """, {'t0': t0, 'p0': p0, 'm0': m0, 't': tournaments, 'p': players,
+              'm': matches})
+
+
+def test_queries_use_indexes(tournament_id):
+    import psycopg2.extensions
+
+    statements = []
+
+    class RecordingCursor(psycopg2.extensions.cursor):
+        """Cursor that keeps every statement it runs, with the arguments."""
+
+        def execute(self, sql, args=None):
+            statements.append(self.mogrify(sql, args))
+            return super(RecordingCursor, self).execute(sql, args)
+
+    class RecordingStore(TournamentStore):
+        """Store whose connections record their statements."""
+
+        def getconn(self):
+            db = TournamentStore.getconn(self)
+            db.cursor_factory = RecordingCursor
+            return db
+
+    delete_matches(tournament_id)
+    delete_tournament_players(tournament_id)
+    store = RecordingStore()
+    ids = store.register_players(["Big Mac", "Granny Smith", "Apple Bloom",
+                                  "Braeburn", "Zecora"], tournament_id)
+    store.register_player_in_tournament(tournament_id,
+                                        store.register_player("Spitfire"))
+    store.open_round(tournament_id)
+    store.report_match(tournament_id, ids[0], ids[1])
+    store.report_matches(tournament_id, [(ids[2], ids[3]), (ids[4], None)])
+    store.count_players(tournament_id)
+    store.player_standings(tournament_id)
+    store.match_history(tournament_id)
+    list(store.iter_match_history(tournament_id))
+    store.players_with_bye_games(tournament_id)
+    store.swiss_pairings(tournament_id)
+    store.pair_all([tournament_id], workers=1)
+    store.ranked_standings(tournament_id)
+    store.current_round(tournament_id)
+    store.round_results(tournament_id, 1)
+    store.unpaired_players(tournament_id, 1)
+    store.close_round(tournament_id)
+    store.rounds(tournament_id)
+    store.standings_at(tournament_id, 1)
+    store.delete_matches(tournament_id)
+    store.delete_tournament_players(tournament_id)
+    store.delete_tournament(store.register_tournament("Explain"))
+    store.close()
+
+    # Explain the recorded statements against a million matches, in a
+    # transaction that is rolled back afterwards.
+    big_tables = ('matches', 'tournament_matches', 'tournament_players',
+                  'tournament_standings', 'player')
+    db = connect()
+    try:
+        curs = db.cursor()
+        load_matches(curs, 1000, 20, 1000000)
+        for executed in statements:
+            for statement in executed.split(';'):
+                if not statement.strip():
+                    continue
+                curs.execute("EXPLAIN " + statement)
+                plan = "\n".join(row[0] for row in curs.fetchall())
+                for table in big_tables:
+                    if "Seq Scan on %s " % table in plan + " ":
+                        raise ValueError(
+                            "Query should use an index on %s:\n%s\n%s" % (
+                                table, statement.strip(), plan))
+    finally:
+        db.rollback()
+        db.close()
+    print "27. Queries use indexes with a million matches in the database."
+
 if __name__ == '__main__':
+    # Run against PostgreSQL, unless another storage backend is picked.
+    # Tests of what only the PostgreSQL store offers are then skipped.
+    postgres = True
+    if '--memory' in sys.argv:
+        use_store(MemoryTournamentStore())
+        postgres = False
+    elif '--sqlite' in sys.argv:
+        use_store(SQLiteTournamentStore())
+        postgres = False
 
     # Set up tournaments
     print os.linesep, '-' * 50, os.linesep, "Setting up", os.linesep, '-' * 50
@@ -245,6 +772,18 @@ if __name__ == '__main__':
     test_report_matches_uneven(t1_id)
     test_pairings(t1_id)
     test_pairings_uneven(t1_id)
+    test_report_many_matches(t1_id)
+    test_register_many_players(t1_id)
+    test_register_after_matches(t1_id)
+    test_pairing_data(t1_id)
+    if postgres:
+        test_cached_standings(t1_id)
+        test_change_notifications(t1_id)
+    test_ranked_standings(t1_id)
+    test_incremental_pairings(t1_id)
+    test_rounds(t1_id)
+    test_standings_snapshots(t1_id)
+    test_streaming_export(t1_id)
 
     print os.linesep, '-' * 50, os.linesep, "Testing Tournament %s" % t2_id,\
         os.linesep, '-' * 50
@@ -259,6 +798,31 @@ if __name__ == '__main__':
     test_report_matches_uneven(t2_id)
     test_pairings(t2_id)
     test_pairings_uneven(t2_id)
+    test_report_many_matches(t2_id)
+    test_register_many_players(t2_id)
+    test_register_after_matches(t2_id)
+    test_pairing_data(t2_id)
+    if postgres:
+        test_cached_standings(t2_id)
+        test_change_notifications(t2_id)
+    test_ranked_standings(t2_id)
+    test_streaming_export(t2_id)
+
+    print os.linesep, '-' * 50, os.linesep, "Testing both tournaments",\
+        os.linesep, '-' * 50
+    test_standings_per_tournament(t1_id, t2_id)
+    test_pair_all(t1_id, t2_id)
+    test_delete_tournament(t1_id)
+    if postgres:
+        test_metrics(t1_id)
+        # A second server streaming from this one, or by default this
+        # server again, read-only.
+        replica = DSN + " options='-c default_transaction_read_only=on'"
+        if '--replica' in sys.argv:
+            replica = sys.argv[sys.argv.index('--replica') + 1]
+        test_replicas(t1_id, replica)
+    if postgres and '--explain' in sys.argv:
+        test_queries_use_indexes(t1_id)
 
     # Cleanup tournament players
     delete_tournament_players(t1_id)